@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+from db import db, upsert_increment
+from models import Expense, ExpenseRollup
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+TOP_EXPENSES = 5
+
+def rollup_key(date, category, payer):
+    return date.strftime('%Y-%m'), date.weekday(), category or '', payer
+
+def apply_rollup(list_id, key, amount, count, sign=1):
+    month, weekday, category, payer = key
+    db.session.execute(upsert_increment(
+        ExpenseRollup, ['list_id', 'month', 'weekday', 'category', 'payer'], ['total', 'count']
+    ), [{
+        'list_id': list_id, 'month': month, 'weekday': weekday, 'category': category, 'payer': payer,
+        'total': sign * amount, 'count': sign * count
+    }])
+
+def rollup_expense(expense, sign=1):
+    """Add (or with sign=-1 remove) one expense to the (list, month, weekday, category, payer) rollup."""
+    if expense.date is None:
+        return
+    apply_rollup(expense.list_id, rollup_key(expense.date, expense.category, expense.payer), expense.amount, 1, sign)
+
+def group_rollups(expenses):
+    """Sum (date, category, payer, amount) tuples into {rollup key: [total, count]}."""
+    groups = {}
+    for date, category, payer, amount in expenses:
+        if date is None:
+            continue
+        group = groups.setdefault(rollup_key(date, category, payer), [0.0, 0])
+        group[0] += amount
+        group[1] += 1
+    return groups
+
+def rollup_expense_batch(list_id, expenses, sign=1):
+    """Rollup bookkeeping for expenses inserted (or with sign=-1 removed) in bulk; expenses are dicts of column values."""
+    groups = group_rollups(
+        (expense['date'], expense['category'], expense['payer'], expense['amount']) for expense in expenses
+    )
+    # Keys in a fixed order, like apply_deltas, so concurrent imports lock rows consistently
+    for key, (total, count) in sorted(groups.items()):
+        apply_rollup(list_id, key, total, count, sign)
+
+def rebuild_list_rollups(list_id):
+    ExpenseRollup.query.filter_by(list_id=list_id).delete(synchronize_session=False)
+    groups = group_rollups(db.session.query(
+        Expense.date, Expense.category, Expense.payer, Expense.amount
+    ).filter(Expense.list_id == list_id))
+    rows = [
+        {
+            'list_id': list_id, 'month': month, 'weekday': weekday, 'category': category,
+            'payer': payer, 'total': total, 'count': count
+        }
+        for (month, weekday, category, payer), (total, count) in groups.items()
+    ]
+    if rows:
+        db.session.execute(db.insert(ExpenseRollup), rows)
+
+def month_start(date):
+    return datetime(date.year, date.month, 1)
+
+def next_month(date):
+    return (month_start(date) + timedelta(days=32)).replace(day=1)
+
+def split_range(start, end):
+    """
+    Split the half-open date range [start, end) into whole months served by
+    the rollup table and the partial edge ranges read from expenses.
+    Returns ((first_month, last_month) or None, [edge ranges]).
+    """
+    full_start = start if start == month_start(start) else next_month(start)
+    full_end = month_start(end)
+    if full_start >= full_end:
+        return None, [(start, end)]
+
+    edges = []
+    if start < full_start:
+        edges.append((start, full_start))
+    if full_end < end:
+        edges.append((full_end, end))
+    last_month = full_end - timedelta(days=1)
+    return (full_start.strftime('%Y-%m'), last_month.strftime('%Y-%m')), edges
+
+def list_analytics(list_id, start=None, end=None, category=None, payer=None):
+    """
+    Spending aggregates for a list, optionally limited to the inclusive date
+    range [start, end] and to one category and/or payer.
+    Whole months come from the rollup table with GROUP BY queries; only the
+    partial months at the edges of a date range read individual expenses.
+    """
+    filters = [ExpenseRollup.list_id == list_id, ExpenseRollup.count > 0]
+    expense_filters = [Expense.list_id == list_id]
+    if category is not None:
+        filters.append(ExpenseRollup.category == category)
+        expense_filters.append(db.func.coalesce(Expense.category, '') == category)
+    if payer is not None:
+        filters.append(ExpenseRollup.payer == payer)
+        expense_filters.append(Expense.payer == payer)
+
+    edges = []
+    if start or end:
+        start = start or datetime.min.replace(year=1970)
+        end = end + timedelta(days=1) if end else datetime.utcnow() + timedelta(days=1)
+        expense_filters.extend([Expense.date >= start, Expense.date < end])
+        months, edges = split_range(start, end)
+        if months:
+            filters.append(ExpenseRollup.month.between(*months))
+        else:
+            filters.append(db.false())
+
+    by_month, by_category, by_payer, by_weekday = {}, {}, {}, {}
+    totals = [0.0, 0]
+    for dimension, target in (
+        (ExpenseRollup.month, by_month),
+        (ExpenseRollup.category, by_category),
+        (ExpenseRollup.payer, by_payer),
+        (ExpenseRollup.weekday, by_weekday),
+    ):
+        rows = db.session.query(
+            dimension, db.func.sum(ExpenseRollup.total), db.func.sum(ExpenseRollup.count)
+        ).filter(*filters).group_by(dimension)
+        for value, total, count in rows:
+            target[value] = total
+            if dimension is ExpenseRollup.month:
+                totals[0] += total
+                totals[1] += count
+
+    for edge_start, edge_end in edges:
+        edge_rows = db.session.query(
+            Expense.date, Expense.category, Expense.payer, Expense.amount
+        ).filter(*expense_filters, Expense.date >= edge_start, Expense.date < edge_end)
+        for (month, weekday, row_category, row_payer), (total, count) in group_rollups(edge_rows).items():
+            by_month[month] = by_month.get(month, 0) + total
+            by_category[row_category] = by_category.get(row_category, 0) + total
+            by_payer[row_payer] = by_payer.get(row_payer, 0) + total
+            by_weekday[weekday] = by_weekday.get(weekday, 0) + total
+            totals[0] += total
+            totals[1] += count
+
+    top_expenses = Expense.query.filter(*expense_filters).order_by(
+        Expense.amount.desc(), Expense.id.desc()
+    ).limit(TOP_EXPENSES).all()
+
+    available = db.session.query(ExpenseRollup.category, ExpenseRollup.payer).filter(
+        ExpenseRollup.list_id == list_id, ExpenseRollup.count > 0
+    ).distinct().all()
+
+    total_spent, expense_count = totals
+    return {
+        'total_spent': round(total_spent, 2),
+        'expense_count': expense_count,
+        'average_expense': round(total_spent / expense_count, 2) if expense_count else 0,
+        'max_expense': top_expenses[0].amount if top_expenses else 0,
+        'monthly': [{'month': month, 'amount': round(total, 2)} for month, total in sorted(by_month.items())],
+        'categories': [{'name': name, 'value': round(total, 2)} for name, total in by_category.items()],
+        'payers': [{'payer': name, 'value': round(total, 2)} for name, total in by_payer.items()],
+        'day_of_week': [{'day': day, 'total': round(by_weekday.get(i, 0), 2)} for i, day in enumerate(WEEKDAYS)],
+        'top_expenses': [expense.as_dict() for expense in top_expenses],
+        'available_categories': sorted({row_category for row_category, _ in available}),
+        'available_payers': sorted({row_payer for _, row_payer in available})
+    }
@@ -1,24 +1,78 @@
 import os
-from flask import Flask, request, jsonify, send_from_directory
+import click
+from flask import Flask, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_socketio import SocketIO
-from db import db
-from models import User, Expense, Payer, Category, DeletedExpense, ExpenseList, ListParticipant, ListShareRequest, Changelog
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from db import db, init_db
+from models import User, Expense, Payer, Category, DeletedExpense, ExpenseList, ListParticipant, ListShareRequest, Changelog, Settlement, ListClosing, ListTombstone
+from ledger import record_expense, unrecord_expense, record_settlement, unrecord_settlement, get_net_balances, get_net_balances_as_of, settle_debts, ledger_list_ids, rebuild_list_balances, verify_balances
+from migrations import run_migrations
+from pagination import list_response, listing_variant, page_args, wants_ndjson, encode_cursor, NDJSON_MIMETYPE, DEFAULT_PAGE_SIZE
+from conditional import version_etag, conditional_response
+from broadcasts import DebtBroadcaster, list_room
+from debt_cache import DebtCache, bump_list_version, get_list_version, get_list_versions
+from membership import MembershipIndex
+from trash import TrashArchive, TrashPurger, archived_expense, serialize_archived_entry, sort_key as archive_sort_key
+from changelog_archive import ChangelogArchive, ChangelogArchiver, parse_bounds
+from checkpoints import CheckpointJob, checkpoint_list, invalidate_checkpoints
+from settlements import parse_settlement, settle_list
+from list_deletion import ListReclaimer, delete_list_rows, exceeds_threshold, tombstone_list
+from imports import read_import_rows, import_expenses
+from batch import BatchError, apply_batch
+from search import SEARCH_ORDERS, search_terms, search_expenses, decode_search_cursor, rebuild_search_index
+from analytics import list_analytics, rebuild_list_rollups, month_start
+from listings import expense_rows, deleted_expense_rows, serialize_expense_row, serialize_deleted_expense_row
+from json_provider import FastJSONProvider
+from metrics import registry, init_metrics, CallbackMetric, PROMETHEUS_MIMETYPE, SOCKET_EMITS, DEBT_RECOMPUTATIONS
 from sqlalchemy.exc import SQLAlchemyError
 
 app = Flask(__name__, static_folder='../frontend/build', static_url_path='/')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///expenses.db'
-db.init_app(app)
+# Encodes responses with orjson when it is installed
+app.json = FastJSONProvider(app)
+# Seconds to wait after a list change so that bursts of edits share one debt broadcast
+app.config['DEBT_BROADCAST_WINDOW'] = float(os.environ.get('DEBT_BROADCAST_WINDOW', 0.2))
+# Background workers that recompute and emit debts after list changes
+app.config['DEBT_BROADCAST_WORKERS'] = int(os.environ.get('DEBT_BROADCAST_WORKERS', 2))
+# Number of settled debt results kept in memory
+app.config['DEBT_CACHE_SIZE'] = int(os.environ.get('DEBT_CACHE_SIZE', 1024))
+# Number of users whose accessible lists are kept in memory
+app.config['MEMBERSHIP_CACHE_SIZE'] = int(os.environ.get('MEMBERSHIP_CACHE_SIZE', 10000))
+# Days an expense stays in the trash before it is moved to the archive; 0 keeps it forever
+app.config['TRASH_RETENTION_DAYS'] = int(os.environ.get('TRASH_RETENTION_DAYS', 30))
+# Seconds between runs of the trash purge job
+app.config['TRASH_PURGE_INTERVAL'] = float(os.environ.get('TRASH_PURGE_INTERVAL', 3600))
+# Directory holding the compressed per-list archives of expired trash
+app.config['TRASH_ARCHIVE_DIR'] = os.environ.get('TRASH_ARCHIVE_DIR', os.path.join(app.instance_path, 'trash-archive'))
+# Days a changelog entry stays in the changelog table before it is archived; 0 never archives
+app.config['CHANGELOG_ARCHIVE_DAYS'] = int(os.environ.get('CHANGELOG_ARCHIVE_DAYS', 90))
+# Seconds between runs of the changelog archival job
+app.config['CHANGELOG_ARCHIVE_INTERVAL'] = float(os.environ.get('CHANGELOG_ARCHIVE_INTERVAL', 3600))
+# Directory holding the compressed monthly changelog segments
+app.config['CHANGELOG_ARCHIVE_DIR'] = os.environ.get('CHANGELOG_ARCHIVE_DIR', os.path.join(app.instance_path, 'changelog-archive'))
+# Seconds between runs of the monthly balance checkpoint job; 0 disables it
+app.config['CHECKPOINT_INTERVAL'] = float(os.environ.get('CHECKPOINT_INTERVAL', 86400))
+# Lists with more rows than this, counting their expenses, participant rows, changelog,
+# trash, rollups and the like, are tombstoned on delete and reclaimed in the background
+app.config['LIST_DELETE_THRESHOLD'] = int(os.environ.get('LIST_DELETE_THRESHOLD', 20000))
+# Rows the list reclaimer deletes per transaction
+app.config['LIST_DELETE_CHUNK_SIZE'] = int(os.environ.get('LIST_DELETE_CHUNK_SIZE', 1000))
+# Seconds between runs of the list reclaimer; 0 disables it
+app.config['LIST_RECLAIM_INTERVAL'] = float(os.environ.get('LIST_RECLAIM_INTERVAL', 60))
+# Requests slower than this many milliseconds are logged with their SQL; 0 disables the log
+app.config['SLOW_REQUEST_MS'] = float(os.environ.get('SLOW_REQUEST_MS', 500))
+# DATABASE_URL, pool sizes and SQLite pragmas come from the environment, see db.py
+init_db(app)
+init_metrics(app, db, slow_request_ms=app.config['SLOW_REQUEST_MS'])
 
 CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000", "https://aleksi.pro"],
         "supports_credentials": True,
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "expose_headers": ["Content-Range", "X-Content-Range"]
+        "allow_headers": ["Content-Type", "Authorization", "If-None-Match"],
+        "expose_headers": ["Content-Range", "X-Content-Range", "X-Next-Cursor", "ETag"]
     }
 })
 
@@ -96,122 +150,227 @@ def handle_preflight():
         response.headers.add("Access-Control-Allow-Credentials", "true")
         return response
     
-def calculate_debts_internal(username=None, list_id=None):
+membership = MembershipIndex(maxsize=app.config['MEMBERSHIP_CACHE_SIZE'])
+
+def accessible_list_ids(username):
+    """Sorted ids of lists created by or shared with the user."""
+    return sorted(membership.lists_for(username))
+
+def has_list_access(username, list_id):
+    return int(list_id) in membership.lists_for(username)
+
+def live_list(list_id):
+    """
+    The list, or None when it does not exist or is tombstoned. Writes to a
+    tombstoned list would race the reclaimer deleting its rows.
+    """
+    expense_list = db.session.get(ExpenseList, list_id)
+    return expense_list if expense_list is not None and expense_list.deleted_at is None else None
+
+def unknown_usernames(usernames):
+    """
+    The given usernames without an account, in order. Rows naming them
+    would fail the users foreign keys, so callers reject them up front.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    if not usernames:
+        return []
+    known = set(db.session.scalars(db.select(User.username).where(User.username.in_(usernames))))
+    return [username for username in usernames if username not in known]
+
+debt_cache = DebtCache(maxsize=app.config['DEBT_CACHE_SIZE'])
+
+def calculate_list_debts(list_id, version=None):
+    # Balances are kept up to date by the ledger on every expense write,
+    # so only the settlement step runs here, and only once per list version
+    if version is None:
+        version = get_list_version(list_id)
+    key = (int(list_id), version)
+
+    def compute():
+        DEBT_RECOMPUTATIONS.inc(scope='list')
+        return settle_debts(get_net_balances([list_id]))
+    return debt_cache.get_or_compute(key, compute)
+
+def calculate_debts_internal(username=None, list_id=None, versions=None):
+    """
+    Settled debts of one list, or of every list username can access.
+    versions, the (list_id, version) pairs of those lists, can be passed
+    in when the caller has already read them.
+    """
     if not username:
         return {}
-        
-    if list_id:
-        expenses = Expense.query.filter_by(list_id=list_id).all()
-    else:
-        accessible_lists = db.session.query(ExpenseList.id).filter(
-            db.or_(
-                ExpenseList.created_by == username,
-                ExpenseList.id.in_(
-                    db.session.query(ListParticipant.list_id)
-                    .filter(ListParticipant.username == username)
-                )
-            )
-        )
-        expenses = Expense.query.filter(Expense.list_id.in_(accessible_lists)).all()
 
-    if not expenses:
-        return {}
-    
-    # Calculate net balance for each participant based on expenses they're part of
-    net_balances = {}
-    
-    for expense in expenses:
-        if not expense.payer or not expense.participants:
-            continue
-            
-        payer = expense.payer
-        participants = expense.participants.split(',')
-        participants = [p for p in participants if p and ':' in p]
-        
-        if not participants:
-            continue
-            
-        # Calculate share per participant for this expense
-        share = expense.amount / len(participants)
-        
-        # Initialize payer's balance if not exists
-        if payer not in net_balances:
-            net_balances[payer] = 0
-            
-        # Add full amount to payer's balance
-        net_balances[payer] += expense.amount
-        
-        # Subtract shares from participants' balances
-        for participant in participants:
-            if participant not in net_balances:
-                net_balances[participant] = 0
-            net_balances[participant] -= share
-
-    # Calculate debts based on net balances
-    debts = {}
-    
-    # Convert net balances to list and sort
-    sorted_participants = sorted(net_balances.items(), key=lambda x: x[1])
-    
-    i = 0  # index for debtors (negative balance)
-    j = len(sorted_participants) - 1  # index for creditors (positive balance)
-    
-    while i < j:
-        debtor = sorted_participants[i]
-        creditor = sorted_participants[j]
-        
-        if debtor[1] >= 0:  # No longer a debtor
-            i += 1
-            continue
-            
-        if creditor[1] <= 0:  # No longer a creditor
-            j -= 1
-            continue
-            
-        # Calculate the debt amount
-        debt_amount = min(abs(debtor[1]), creditor[1])
-        
-        # Add the debt to the result
-        if debt_amount > 0:
-            if debtor[0] not in debts:
-                debts[debtor[0]] = {}
-            debts[debtor[0]][creditor[0]] = round(debt_amount, 2)
-        
-        # Update balances
-        sorted_participants[i] = (debtor[0], debtor[1] + debt_amount)
-        sorted_participants[j] = (creditor[0], creditor[1] - debt_amount)
-        
-        # Move indices if balances are settled
-        if abs(sorted_participants[i][1]) < 0.01:
-            i += 1
-        if abs(sorted_participants[j][1]) < 0.01:
-            j -= 1
+    if list_id:
+        return calculate_list_debts(list_id, dict(versions or ()).get(list_id))
+    if versions is None:
+        versions = get_list_versions(accessible_list_ids(username))
+
+    def compute():
+        DEBT_RECOMPUTATIONS.inc(scope='all_lists')
+        return settle_debts(get_net_balances([list_id for list_id, _ in versions]))
+    return debt_cache.get_or_compute(('all', versions), compute)
+
+def calculate_debts_as_of(versions, as_of):
+    """Debts over the expenses dated before as_of in the lists of versions, (list_id, version) pairs."""
+    def compute():
+        DEBT_RECOMPUTATIONS.inc(scope='as_of')
+        return settle_debts(get_net_balances_as_of([list_id for list_id, _ in versions], as_of))
+    return debt_cache.get_or_compute(('as_of', versions, as_of), compute)
+
+debt_broadcaster = DebtBroadcaster(
+    socketio, app, calculate_list_debts,
+    window=app.config['DEBT_BROADCAST_WINDOW'],
+    workers=app.config['DEBT_BROADCAST_WORKERS']
+)
+
+trash_archive = TrashArchive(app.config['TRASH_ARCHIVE_DIR'])
+trash_purger = TrashPurger(
+    socketio, app, trash_archive,
+    retention_days=app.config['TRASH_RETENTION_DAYS'],
+    interval=app.config['TRASH_PURGE_INTERVAL']
+)
+
+changelog_archive = ChangelogArchive(app.config['CHANGELOG_ARCHIVE_DIR'])
+changelog_archiver = ChangelogArchiver(
+    socketio, app, changelog_archive,
+    archive_days=app.config['CHANGELOG_ARCHIVE_DAYS'],
+    interval=app.config['CHANGELOG_ARCHIVE_INTERVAL']
+)
+
+checkpoint_job = CheckpointJob(socketio, app, interval=app.config['CHECKPOINT_INTERVAL'])
+
+list_reclaimer = ListReclaimer(
+    socketio, app, archives=(trash_archive, changelog_archive),
+    chunk_size=app.config['LIST_DELETE_CHUNK_SIZE'],
+    interval=app.config['LIST_RECLAIM_INTERVAL']
+)
 
-    return debts
+@app.before_request
+def start_background_jobs():
+    trash_purger.ensure_started()
+    changelog_archiver.ensure_started()
+    checkpoint_job.ensure_started()
+    list_reclaimer.ensure_started()
 
 @app.route('/calculate-debts', methods=['GET'])
 def calculate_debts():
     username = request.args.get('username')
-    list_id = request.args.get('list_id')
+    list_id = request.args.get('list_id', type=int)
     if not username:
         return jsonify({"error": "Username required"}), 400
-    # Use the existing calculate_debts_internal function
-    debts = calculate_debts_internal(username, list_id)
-    # Emit update through socket
-    socketio.emit(f'expensesUpdated_{username}_{list_id}', debts)
-    return jsonify(debts)
+    try:
+        # Debts at the end of the as_of day, i.e. before the next one starts
+        as_of = request.args.get('as_of')
+        as_of = datetime.strptime(as_of, '%Y-%m-%d') + timedelta(days=1) if as_of else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD."}), 400
+    if list_id:
+        versions = get_list_versions([list_id])
+    else:
+        versions = get_list_versions(accessible_list_ids(username))
+    if as_of:
+        return conditional_response(
+            version_etag('calculate-debts', versions, as_of),
+            lambda: jsonify(calculate_debts_as_of(versions, as_of))
+        )
+    # The versions that tag the response also key the cached debts
+    return conditional_response(
+        version_etag('calculate-debts', versions),
+        lambda: jsonify(calculate_debts_internal(username, list_id, versions))
+    )
+
+@app.route('/debt-cache/stats', methods=['GET'])
+def debt_cache_stats():
+    return jsonify(debt_cache.stats())
+
+@app.route('/debt-broadcasts/stats', methods=['GET'])
+def debt_broadcast_stats():
+    return jsonify(debt_broadcaster.stats())
+
+@app.route('/trash/stats', methods=['GET'])
+def trash_stats():
+    return jsonify(trash_purger.stats())
+
+@app.route('/changelog/stats', methods=['GET'])
+def changelog_archive_stats():
+    return jsonify(changelog_archiver.stats())
+
+@app.route('/checkpoints/stats', methods=['GET'])
+def checkpoint_stats():
+    return jsonify(checkpoint_job.stats())
+
+@app.route('/list-deletions/stats', methods=['GET'])
+def list_deletion_stats():
+    return jsonify(list_reclaimer.stats())
+
+@app.route('/membership/stats', methods=['GET'])
+def membership_stats():
+    return jsonify(membership.stats())
+
+for name, documentation, stats, field, metric_type in [
+    ('debt_cache_hits_total', 'Debt cache hits.', debt_cache.stats, 'hits', 'counter'),
+    ('debt_cache_misses_total', 'Debt cache misses.', debt_cache.stats, 'misses', 'counter'),
+    ('debt_cache_entries', 'Settled debt results held in memory.', debt_cache.stats, 'size', 'gauge'),
+    ('membership_cache_hits_total', 'Membership index hits.', membership.stats, 'hits', 'counter'),
+    ('membership_cache_misses_total', 'Membership index loads.', membership.stats, 'misses', 'counter'),
+    ('trash_archived_total', 'Expired trash rows moved to the archive.', trash_purger.stats, 'archived', 'counter'),
+    ('balance_checkpoints_created_total', 'Monthly balance checkpoints created.', checkpoint_job.stats, 'created', 'counter'),
+    ('list_reclaim_pending', 'Tombstoned lists waiting to be reclaimed.', list_reclaimer.stats, 'pending', 'gauge'),
+    ('list_reclaim_deleted_rows_total', 'Rows of tombstoned lists deleted.', list_reclaimer.stats, 'deleted_rows', 'counter'),
+    ('debt_broadcast_queue_depth', 'Lists waiting for a debt broadcast.', debt_broadcaster.stats, 'queue_depth', 'gauge'),
+    ('debt_broadcast_running', 'Debt broadcasts being computed.', debt_broadcaster.stats, 'running', 'gauge'),
+    ('debt_broadcasts_completed_total', 'Debt broadcasts emitted.', debt_broadcaster.stats, 'completed', 'counter'),
+    ('debt_broadcasts_failed_total', 'Debt broadcasts that raised.', debt_broadcaster.stats, 'failed', 'counter'),
+]:
+    registry.register(CallbackMetric(
+        name, documentation, lambda stats=stats, field=field: stats()[field], type=metric_type
+    ))
+# Read directly: changelog_archiver.stats() counts segments in the database
+registry.register(CallbackMetric(
+    'changelog_archived_total', 'Changelog entries moved to archive segments.',
+    lambda: changelog_archiver.archived, type='counter'
+))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return app.response_class(registry.render(), content_type=PROMETHEUS_MIMETYPE)
 
 @socketio.on('connect')
 def handle_connect():
     username = request.args.get('username')
     if username:
         debts = calculate_debts_internal(username)
-        socketio.emit(f'expensesUpdated_{username}', debts)
+        # Only the connecting client needs its own totals
+        emit(f'expensesUpdated_{username}', debts)
+        SOCKET_EMITS.inc(event='expensesUpdated_<username>')
+
+@socketio.on('joinList')
+def handle_join_list(data):
+    try:
+        list_id = int(data.get('list_id'))
+    except (TypeError, ValueError):
+        return
+    username = data.get('username')
+    if not username or not has_list_access(username, list_id):
+        return
+    join_room(list_room(list_id))
+    emit('expensesUpdated', {'list_id': list_id, 'debts': calculate_list_debts(list_id)})
+    SOCKET_EMITS.inc(event='expensesUpdated')
+
+@socketio.on('leaveList')
+def handle_leave_list(data):
+    try:
+        list_id = int(data.get('list_id'))
+    except (TypeError, ValueError):
+        return
+    leave_room(list_room(list_id))
 
 def log_action(list_id, action, username, details=None):
+    # Added to the caller's session so the entry commits atomically with
+    # the change it records; callers commit once afterwards
     changelog_entry = Changelog(list_id=list_id, action=action, username=username, details=details)
     db.session.add(changelog_entry)
-    db.session.commit()
 
 @app.route('/add-expense', methods=['POST'])
 def add_expense():
@@ -220,6 +379,10 @@ def add_expense():
         # Ensure payer has proper prefix
         if ':' not in data['payer']:
             data['payer'] = f"{data['payerType']}:{data['payer']}"
+        if unknown_usernames([data['username']]):
+            return jsonify({"error": "User not found"}), 404
+        if not live_list(data['list_id']):
+            return jsonify({"error": "List not found"}), 404
             
         # Create the expense with full identifiers
         new_expense = Expense(
@@ -233,14 +396,13 @@ def add_expense():
             list_id=data['list_id']
         )
         db.session.add(new_expense)
+        record_expense(new_expense)
+        bump_list_version(new_expense.list_id)
+        log_action(new_expense.list_id, f"User: {new_expense.username} | Added new expense \"{new_expense.description}\" ({new_expense.amount}€)", new_expense.username)
         db.session.commit()
         expense_dict = new_expense.as_dict()
         expense_dict['participants'] = data.get('participants', [])
-        # Update debts calculation with list_id
-        debts = calculate_debts_internal(data['username'], data['list_id'])
-        socketio.emit(f'expensesUpdated_{data["username"]}_{data["list_id"]}', debts)
-        
-        log_action(new_expense.list_id, f"User: {new_expense.username} | Added new expense \"{new_expense.description}\" ({new_expense.amount}€)", new_expense.username)
+        debt_broadcaster.schedule(new_expense.list_id)
         return jsonify(expense_dict), 201
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -253,36 +415,29 @@ def add_expense():
 @app.route('/expenses', methods=['GET'])
 def get_expenses():
     username = request.args.get('username')
-    list_id = request.args.get('list_id')
+    list_id = request.args.get('list_id', type=int)
     if not username:
         return jsonify({"error": "Username required"}), 400
     if list_id:
         # First check if user has access to this list
-        access = db.or_(
-            ExpenseList.created_by == username,
-            ListParticipant.username == username
-        )
-        list_access = db.session.query(ExpenseList).filter(
-            ExpenseList.id == list_id,
-            access
-        ).join(ListParticipant, isouter=True).first()
-        if not list_access:
+        if not has_list_access(username, list_id):
             return jsonify({"error": "No access to this list"}), 403
         # Get all expenses for the list, regardless of who created them
-        expenses = Expense.query.filter_by(list_id=list_id).all()
+        query = expense_rows(Expense.list_id == list_id)
+        versions = get_list_versions([list_id])
     else:
         # Get expenses from all lists user has access to
-        accessible_lists = db.session.query(ExpenseList.id).filter(
-            db.or_(
-                ExpenseList.created_by == username,
-                ExpenseList.id.in_(
-                    db.session.query(ListParticipant.list_id)
-                    .filter(ListParticipant.username == username)
-                )
-            )
-        )
-        expenses = Expense.query.filter(Expense.list_id.in_(accessible_lists)).all()
-    return jsonify([expense.as_dict() for expense in expenses])
+        list_ids = accessible_list_ids(username)
+        query = expense_rows(Expense.list_id.in_(list_ids))
+        versions = get_list_versions(list_ids)
+    # Expenses closed by a settle-all are history; only list them on request
+    include_closed = request.args.get('include_closed') == 'true'
+    if not include_closed:
+        query = query.filter(Expense.closing_id.is_(None))
+    return conditional_response(
+        version_etag('expenses', versions, listing_variant(), include_closed),
+        lambda: list_response(query, Expense.date, Expense.id, serialize_expense_row)
+    )
 
 @app.route('/')
 def index():
@@ -307,8 +462,8 @@ def expenses_by_date():
         end_date = datetime.strptime(end_date, '%Y-%m-%d')
     except ValueError:
         return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD."}), 400
-    expenses = Expense.query.filter(Expense.date >= start_date, Expense.date <= end_date).all()
-    return jsonify([expense.as_dict() for expense in expenses])
+    expenses = expense_rows(Expense.date >= start_date, Expense.date <= end_date)
+    return jsonify([serialize_expense_row(row) for row in expenses])
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -320,6 +475,10 @@ def delete_expense(id):
         expense = Expense.query.get(id)
         if not expense:
             return jsonify({"error": "Expense not found"}), 404
+        if expense.closing_id is not None:
+            return jsonify({"error": "Expense has been settled and can no longer be deleted"}), 409
+        if not live_list(expense.list_id):
+            return jsonify({"error": "List not found"}), 404
             
         deleted = DeletedExpense(
             original_id=expense.id,
@@ -334,10 +493,12 @@ def delete_expense(id):
             list_id=expense.list_id
         )
         db.session.add(deleted)
+        unrecord_expense(expense)
+        bump_list_version(expense.list_id)
         db.session.delete(expense)
-        db.session.commit()
-        
         log_action(expense.list_id, f"User: {expense.username} | Deleted expense \"{expense.description}\" ({expense.amount}€)", expense.username)
+        db.session.commit()
+        debt_broadcaster.schedule(expense.list_id)
         return jsonify({"message": "Expense moved to trash"}), 200
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -407,7 +568,7 @@ def login():
 def get_categories():
     try:
         username = request.args.get('username')
-        list_id = request.args.get('list_id')
+        list_id = request.args.get('list_id', type=int)
         if not username:
             return jsonify({"error": "Username required"}), 400
         query = Category.query.filter_by(username=username)
@@ -424,6 +585,8 @@ def get_categories():
 def add_category():
     try:
         data = request.get_json()
+        if data.get('list_id') is not None and not live_list(data['list_id']):
+            return jsonify({"error": "List not found"}), 404
         new_category = Category(
             name=data['name'],
             username=data['username'],
@@ -476,32 +639,47 @@ def delete_category(id):
 @app.route('/trash', methods=['GET'])
 def get_trash():
     username = request.args.get('username')
-    list_id = request.args.get('list_id')
+    list_id = request.args.get('list_id', type=int)
     if not username:
         return jsonify({"error": "Username required"}), 400
-    query = DeletedExpense.query.filter_by(username=username)
+    if request.args.get('archived') == 'true':
+        if not list_id:
+            return jsonify({"error": "list_id required for archived trash"}), 400
+        try:
+            limit, cursor = page_args()
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        entries, more = trash_archive.entries(list_id, username, cursor, limit or DEFAULT_PAGE_SIZE)
+        response = jsonify([serialize_archived_entry(entry) for entry in entries])
+        if more:
+            response.headers['X-Next-Cursor'] = encode_cursor(*archive_sort_key(entries[-1]))
+        return response
+
+    query = deleted_expense_rows(DeletedExpense.username == username)
     if list_id:
-        query = query.filter_by(list_id=list_id)
-        
-    deleted = query.all()
-    return jsonify([{
-        'id': d.id,
-        'original_id': d.original_id,
-        'payer': d.payer,
-        'amount': d.amount,
-        'description': d.description,
-        'category': d.category,
-        'date': d.date.strftime('%Y-%m-%d'),
-        'deleted_at': d.deleted_at.strftime('%Y-%m-%d %H:%M:%S'),
-        'participants': d.participants.split(',') if d.participants else []
-    } for d in deleted])
+        query = query.filter(DeletedExpense.list_id == list_id)
+    return list_response(query, DeletedExpense.deleted_at, DeletedExpense.id, serialize_deleted_expense_row)
 
 @app.route('/restore/<int:id>', methods=['POST'])
 def restore_expense(id):
     try:
-        deleted = DeletedExpense.query.get(id)
+        archived = None
+        if request.args.get('archived') == 'true':
+            # Expired trash lives in the list's archive file, not the table.
+            # Purged ids can be handed out again, so deleted_at picks the row
+            list_id = request.args.get('list_id', type=int)
+            try:
+                deleted_at = datetime.fromisoformat(request.args.get('deleted_at', ''))
+            except ValueError:
+                return jsonify({"error": "deleted_at required for archived trash"}), 400
+            archived = trash_archive.find(list_id, id, deleted_at) if list_id else None
+            deleted = archived_expense(archived) if archived else None
+        else:
+            deleted = DeletedExpense.query.get(id)
         if not deleted:
             return jsonify({"error": "Expense not found"}), 404
+        if not live_list(deleted.list_id):
+            return jsonify({"error": "List not found"}), 404
         expense = Expense(
             payer=deleted.payer,
             amount=deleted.amount,
@@ -513,10 +691,15 @@ def restore_expense(id):
             list_id=deleted.list_id
         )
         db.session.add(expense)
-        db.session.delete(deleted)
-        db.session.commit()
-        
+        record_expense(expense)
+        bump_list_version(expense.list_id)
+        if not archived:
+            db.session.delete(deleted)
         log_action(expense.list_id, f"User: {expense.username} | Restored expense \"{expense.description}\" ({expense.amount}€)", expense.username)
+        db.session.commit()
+        if archived:
+            trash_archive.remove(expense.list_id, archived)
+        debt_broadcaster.schedule(expense.list_id)
         return jsonify(expense.as_dict()), 200
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -534,13 +717,7 @@ def get_lists():
             return jsonify({'error': 'Username required'}), 400
         # Get lists where user is either creator or participant
         lists = ExpenseList.query.filter(
-            db.or_(
-                ExpenseList.created_by == username,
-                ExpenseList.id.in_(
-                    db.session.query(ListParticipant.list_id)
-                    .filter(ListParticipant.username == username)
-                )
-            )
+            ExpenseList.id.in_(accessible_list_ids(username))
         ).all()
         return jsonify([list.as_dict() for list in lists]), 200
     except Exception as e:
@@ -582,6 +759,11 @@ def create_list():
 
         if not processed_participants:
             return jsonify({"error": "List must have at least one participant"}), 400
+        if unknown_usernames([creator]):
+            return jsonify({"error": "User not found"}), 404
+        unknown = unknown_usernames(data.get('sharedWith', []))
+        if unknown:
+            return jsonify({"error": f"Unknown users: {', '.join(unknown)}"}), 400
 
         new_list = ExpenseList(
             name=data['name'],
@@ -610,9 +792,9 @@ def create_list():
                     message=f'Added you while creating the list "{data["name"]}"'
                 )
                 db.session.add(share_request)
-        db.session.commit()
-        
         log_action(new_list.id, f"User: {creator} | Created new list \"{new_list.name}\"", creator)
+        db.session.commit()
+        membership.invalidate_user(creator)
         return jsonify(new_list.as_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -629,12 +811,18 @@ def handle_lists_options():
 def update_list(list_id):
     try:
         data = request.get_json()
-        expense_list = ExpenseList.query.get_or_404(list_id)
+        expense_list = live_list(list_id)
+        if not expense_list:
+            return jsonify({"error": "List not found"}), 404
 
         # Validate that there's at least one participant or shared user
         if not data.get('participants') and not data.get('sharedWith'):
             return jsonify({"error": "List must have at least one participant or shared user"}), 400
 
+        unknown = unknown_usernames(data.get('sharedWith', []))
+        if unknown:
+            return jsonify({"error": f"Unknown users: {', '.join(unknown)}"}), 400
+
         # Update list name and non-registered participants
         old_name = expense_list.name
         expense_list.name = data['name']
@@ -663,9 +851,9 @@ def update_list(list_id):
                 )
                 db.session.add(share_request)
 
-        db.session.commit()
-        
+        bump_list_version(list_id)
         log_action(list_id, f"User: {expense_list.created_by} | Updated list name: \"{old_name}\" → \"{expense_list.name}\"", expense_list.created_by)
+        db.session.commit()
         return jsonify(expense_list.as_dict())
 
     except SQLAlchemyError as e:
@@ -678,40 +866,329 @@ def update_list(list_id):
 
 @app.route('/lists/<int:list_id>', methods=['DELETE'])
 def delete_list(list_id):
+    username = request.args.get('username')
     try:
-        # Get the list first
-        expense_list = ExpenseList.query.get_or_404(list_id)
+        expense_list = live_list(list_id)
+        if not expense_list:
+            return jsonify({"error": "List not found"}), 404
 
-        # Delete related records one by one with error checking
-        try:
-            # Delete participants
-            ListParticipant.query.filter_by(list_id=list_id).delete()
-            # Delete expenses (only if list_id column exists)
-            if hasattr(Expense, 'list_id'):
-                Expense.query.filter_by(list_id=list_id).delete()
-            # Finally delete the list
-            db.session.delete(expense_list)
+        if exceeds_threshold(list_id, app.config['LIST_DELETE_THRESHOLD']):
+            # Too large to delete inside a request: hide it now and let the
+            # reclaimer delete its rows in chunks
+            tombstone = tombstone_list(expense_list, username)
             db.session.commit()
-            log_action(list_id, f"User: {expense_list.created_by} | Deleted list \"{expense_list.name}\"", expense_list.created_by)
-            return jsonify({"message": "List deleted successfully"}), 200
-            
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({"error": f"Error during deletion: {str(e)}"}), 500
+            membership.invalidate_list(list_id)
+            return jsonify({"message": "List deleted; its data is being removed", "deletion": tombstone.as_dict()}), 200
+
+        # The list's changelog goes with it; a "Deleted list" entry could
+        # not reference the list any more and no endpoint could read it
+        delete_list_rows(list_id)
+        db.session.commit()
+        membership.invalidate_list(list_id)
+        trash_archive.remove_list(list_id)
+        changelog_archive.remove_list(list_id)
+        return jsonify({"message": "List deleted successfully"}), 200
     except SQLAlchemyError as e:
         db.session.rollback()
         print(f"Database error in delete_list endpoint: {str(e)}")
         return jsonify({"error": "Database error occurred"}), 500
     except Exception as e:
-        return jsonify({"error": f"List not found or error occurred: {str(e)}"}), 404
+        db.session.rollback()
+        return jsonify({"error": f"Error during deletion: {str(e)}"}), 500
+
+@app.route('/lists/<int:list_id>/deletion', methods=['GET'])
+def get_list_deletion(list_id):
+    tombstone = ListTombstone.query.filter(ListTombstone.list_id == list_id).order_by(ListTombstone.id.desc()).first()
+    if not tombstone:
+        return jsonify({"error": "No deletion in progress for this list"}), 404
+    return jsonify(tombstone.as_dict())
+
+@app.route('/lists/<int:list_id>/import', methods=['POST'])
+def import_list_expenses(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    expense_list = live_list(list_id)
+    if not expense_list:
+        return jsonify({"error": "List not found"}), 404
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+
+    try:
+        imported, total, errors = import_expenses(expense_list, username, read_import_rows(request))
+        if imported:
+            bump_list_version(list_id)
+            log_action(
+                list_id,
+                f"User: {username} | Imported {imported} expenses ({round(total, 2)}€)",
+                username,
+                details={'imported': imported, 'failed': len(errors)}
+            )
+        db.session.commit()
+
+        if imported:
+            # One recompute and broadcast for the whole import
+            debt_broadcaster.schedule(list_id)
+        return jsonify({
+            'imported': imported,
+            'failed': len(errors),
+            'errors': errors
+        }), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Database error in import_list_expenses endpoint: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/lists/<int:list_id>/expenses/batch', methods=['POST'])
+def batch_expenses(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    expense_list = live_list(list_id)
+    if not expense_list:
+        return jsonify({"error": "List not found"}), 404
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+
+    try:
+        result = apply_batch(expense_list, username, request.get_json(silent=True))
+        counts = {op: len(ids) for op, ids in result.items()}
+        if any(counts.values()):
+            bump_list_version(list_id)
+            summary = ', '.join(f"{op} {count}" for op, count in counts.items() if count)
+            log_action(list_id, f"User: {username} | Batch edit of expenses: {summary}", username, details=result)
+        db.session.commit()
+
+        if any(counts.values()):
+            # One recompute and broadcast for the whole batch
+            debt_broadcaster.schedule(list_id)
+        ids = result['added'] + result['updated'] + result['restored']
+        expenses = {row.id: serialize_expense_row(row) for row in expense_rows(Expense.id.in_(ids))} if ids else {}
+        return jsonify({
+            'added': [expenses[expense_id] for expense_id in result['added']],
+            'updated': [expenses[expense_id] for expense_id in result['updated']],
+            'deleted': result['deleted'],
+            'restored': [expenses[expense_id] for expense_id in result['restored']]
+        }), 200
+    except BatchError as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "errors": e.errors}), 400
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Database error in batch_expenses endpoint: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+
+@app.route('/lists/<int:list_id>/expenses/search', methods=['GET'])
+def search_list_expenses(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+    terms = search_terms(request.args.get('q'))
+    if not terms:
+        return jsonify({"error": "q must contain at least one word"}), 400
+    order = request.args.get('order', SEARCH_ORDERS[0])
+    if order not in SEARCH_ORDERS:
+        return jsonify({"error": f"order must be one of {', '.join(SEARCH_ORDERS)}"}), 400
+
+    try:
+        limit, cursor = page_args(decode=decode_search_cursor)
+        filters = []
+        start = request.args.get('start')
+        end = request.args.get('end')
+        if start:
+            filters.append(Expense.date >= datetime.strptime(start, '%Y-%m-%d'))
+        if end:
+            # The end date is inclusive
+            filters.append(Expense.date < datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1))
+        if request.args.get('min_amount'):
+            filters.append(Expense.amount >= float(request.args.get('min_amount')))
+        if request.args.get('max_amount'):
+            filters.append(Expense.amount <= float(request.args.get('max_amount')))
+        if request.args.get('category'):
+            filters.append(Expense.category == request.args.get('category'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        rows, next_cursor = search_expenses(list_id, terms, filters, limit or DEFAULT_PAGE_SIZE, cursor, order)
+        response = jsonify([serialize_expense_row(row[:-1]) for row in rows])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    return conditional_response(
+        version_etag('search', list_id, get_list_version(list_id), sorted(request.args.items())),
+        build
+    )
+
+@app.route('/lists/<int:list_id>/analytics', methods=['GET'])
+def get_list_analytics(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.strptime(start, '%Y-%m-%d') if start else None
+        end = datetime.strptime(end, '%Y-%m-%d') if end else None
+    except ValueError:
+        return jsonify({"error": "Invalid date format. Please use YYYY-MM-DD."}), 400
+
+    try:
+        return jsonify(list_analytics(
+            list_id,
+            start=start,
+            end=end,
+            category=request.args.get('category') or None,
+            payer=request.args.get('payer') or None
+        )), 200
+    except SQLAlchemyError as e:
+        print(f"Database error in get_list_analytics endpoint: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+
+@app.route('/lists/<int:list_id>/settlements', methods=['GET'])
+def get_settlements(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+    include_closed = request.args.get('include_closed') == 'true'
+
+    def build():
+        query = Settlement.query.filter(Settlement.list_id == list_id)
+        if not include_closed:
+            query = query.filter(Settlement.closing_id.is_(None))
+        settlements = query.order_by(Settlement.date.desc(), Settlement.id.desc())
+        return jsonify([settlement.as_dict() for settlement in settlements])
+
+    return conditional_response(
+        version_etag('settlements', list_id, get_list_version(list_id), include_closed),
+        build
+    )
+
+@app.route('/lists/<int:list_id>/settlements', methods=['POST'])
+def add_settlement(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+    expense_list = live_list(list_id)
+    if not expense_list:
+        return jsonify({"error": "List not found"}), 404
+
+    try:
+        settlement = parse_settlement(request.get_json(), expense_list, username)
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        db.session.add(settlement)
+        record_settlement(settlement)
+        bump_list_version(list_id)
+        log_action(list_id, f"User: {username} | Recorded payment {settlement.from_participant} → {settlement.to_participant} ({settlement.amount}€)", username)
+        db.session.commit()
+        debt_broadcaster.schedule(list_id)
+        return jsonify(settlement.as_dict()), 201
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Database error in add_settlement endpoint: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/settlements/<int:id>', methods=['DELETE'])
+def delete_settlement(id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    try:
+        settlement = Settlement.query.get(id)
+        if not settlement:
+            return jsonify({"error": "Settlement not found"}), 404
+        if not has_list_access(username, settlement.list_id):
+            return jsonify({"error": "No access to this list"}), 403
+        if settlement.closing_id is not None:
+            return jsonify({"error": "Settlement has been closed and can no longer be deleted"}), 409
+        unrecord_settlement(settlement)
+        bump_list_version(settlement.list_id)
+        db.session.delete(settlement)
+        log_action(settlement.list_id, f"User: {username} | Deleted payment {settlement.from_participant} → {settlement.to_participant} ({settlement.amount}€)", username)
+        db.session.commit()
+        debt_broadcaster.schedule(settlement.list_id)
+        return jsonify({"message": "Settlement deleted"}), 200
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Database error in delete_settlement endpoint: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/lists/<int:list_id>/settle-all', methods=['POST'])
+def settle_all(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+    if not live_list(list_id):
+        return jsonify({"error": "List not found"}), 404
+
+    try:
+        closing = settle_list(list_id, username)
+        if closing is None:
+            db.session.rollback()
+            return jsonify({"message": "Nothing to settle"}), 200
+        log_action(
+            list_id,
+            f"User: {username} | Settled all debts ({closing.settlement_count} payments, {closing.expense_count} expenses closed)",
+            username,
+            details={'closing_id': closing.id}
+        )
+        db.session.commit()
+        debt_broadcaster.schedule(list_id)
+        return jsonify(closing.as_dict()), 201
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        print(f"Database error in settle_all endpoint: {str(e)}")
+        return jsonify({"error": "Database error occurred"}), 500
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/lists/<int:list_id>/closings', methods=['GET'])
+def get_closings(list_id):
+    username = request.args.get('username')
+    if not username:
+        return jsonify({"error": "Username required"}), 400
+    if not has_list_access(username, list_id):
+        return jsonify({"error": "No access to this list"}), 403
+    closings = ListClosing.query.filter(ListClosing.list_id == list_id).order_by(ListClosing.id.desc())
+    return jsonify([closing.as_dict() for closing in closings])
 
 @app.route('/lists/<int:list_id>', methods=['GET'])
 def get_list(list_id):
     try:
-        expense_list = ExpenseList.query.get(list_id)
-        if not expense_list:
+        version = db.session.query(ExpenseList.version).filter(
+            ExpenseList.id == list_id, ExpenseList.deleted_at.is_(None)
+        ).scalar()
+        if version is None:
             return jsonify({'error': 'List not found'}), 404
-        return jsonify(expense_list.as_dict()), 200
+        return conditional_response(
+            version_etag('list', list_id, version),
+            lambda: jsonify(ExpenseList.query.get(list_id).as_dict())
+        )
     except Exception as e:
         print(f"Error in get_list endpoint: {str(e)}")
         return jsonify({'error': 'Failed to fetch list data'}), 500
@@ -734,10 +1211,11 @@ def share_list(list_id):
 
         if not from_username:
             return jsonify({'error': 'From username is required'}), 400
+        if not live_list(list_id):
+            return jsonify({'error': 'List not found'}), 404
 
-        # Check if user exists
-        user = User.query.filter_by(username=to_username).first()
-        if not user:
+        # Check if both users exist
+        if unknown_usernames([to_username, from_username]):
             return jsonify({'error': 'User not found'}), 404
 
         # Don't allow sharing with self
@@ -769,9 +1247,9 @@ def share_list(list_id):
             message=message
         )
         db.session.add(share_request)
-        db.session.commit()
-        
+        bump_list_version(list_id)
         log_action(list_id, f"User: {from_username} | Shared list with {to_username}", from_username)
+        db.session.commit()
         return jsonify({'message': 'Share request sent successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -783,7 +1261,9 @@ def get_share_requests():
     username = request.args.get('username')
     if not username:
         return jsonify({'error': 'Username required'}), 400
-    requests = ListShareRequest.query.filter_by(
+    requests = ListShareRequest.query.options(
+        db.joinedload(ListShareRequest.expense_list)
+    ).filter_by(
         to_user=username,
         status='pending'
     ).all()
@@ -814,23 +1294,13 @@ def respond_to_share_request(request_id):
                 if new_participant not in current_participants:
                     current_participants.append(new_participant)
                     expense_list.participants = ','.join(current_participants)
-
-            # Recalculate debts for the list and emit to all participants
-            list_participants = set()
-            list_participants.add(share_request.to_user)  # Add new participant
-            # Get all current participants
-            for p in ListParticipant.query.filter_by(list_id=share_request.list_id).all():
-                list_participants.add(p.username)
-            # Get list creator
-            expense_list = ExpenseList.query.get(share_request.list_id)
-            if expense_list:
-                list_participants.add(expense_list.created_by)
-            
-            # Calculate and emit debts for all participants
-            for username in list_participants:
-                debts = calculate_debts_internal(username, share_request.list_id)
-                socketio.emit(f'expensesUpdated_{username}_{share_request.list_id}', debts)
+            bump_list_version(share_request.list_id)
         db.session.commit()
+        if accept:
+            membership.invalidate_list(share_request.list_id)
+            membership.invalidate_user(share_request.to_user)
+            # One recompute and one room broadcast reaches every list member
+            debt_broadcaster.schedule(share_request.list_id)
         return jsonify({
             'message': f'Share request {"accepted" if accept else "rejected"} successfully'
         }), 200
@@ -857,6 +1327,10 @@ def update_expense(id):
     try:
         data = request.get_json()
         expense = Expense.query.get_or_404(id)
+        if expense.closing_id is not None:
+            return jsonify({"error": "Expense has been settled and can no longer be edited"}), 409
+        if not live_list(expense.list_id):
+            return jsonify({"error": "List not found"}), 404
         
         # Ensure payer has proper prefix
         if ':' not in data['payer']:
@@ -867,6 +1341,8 @@ def update_expense(id):
         old_amount = expense.amount
         old_category = expense.category
         old_payer = expense.payer
+        # Take the old contribution out of the list balances and rollups
+        unrecord_expense(expense)
 
         # Update expense fields
         expense.payer = data['payer']
@@ -876,15 +1352,8 @@ def update_expense(id):
         expense.date = datetime.strptime(data['date'], '%Y-%m-%d')
         expense.participants = ','.join(data['participants'])
 
-        db.session.commit()
-        
-        # Return the updated expense with proper format
-        expense_dict = expense.as_dict()
-        expense_dict['participants'] = data['participants']  # Use the processed participants
-        
-        # Recalculate debts and emit update
-        debts = calculate_debts_internal(data['username'], data['list_id'])
-        socketio.emit(f'expensesUpdated_{data["username"]}_{data["list_id"]}', debts)
+        record_expense(expense)
+        bump_list_version(expense.list_id)
         
         changes = []
         if old_description != expense.description:
@@ -898,6 +1367,13 @@ def update_expense(id):
         
         change_text = " | ".join(changes)
         log_action(expense.list_id, f"User: {expense.username} | Updated expense (ID: {expense.id}) | {change_text}", expense.username)
+        db.session.commit()
+        
+        # Return the updated expense with proper format
+        expense_dict = expense.as_dict()
+        expense_dict['participants'] = data['participants']  # Use the processed participants
+        
+        debt_broadcaster.schedule(expense.list_id)
         return jsonify(expense_dict), 200
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -910,13 +1386,32 @@ def update_expense(id):
 
 @app.route('/changelog/<int:list_id>', methods=['GET'])
 def get_changelog(list_id):
-    changelog_entries = Changelog.query.filter_by(list_id=list_id).order_by(Changelog.timestamp.desc()).all()
-    return jsonify([{
-        "id": entry.id,
-        "action": entry.action,
-        "timestamp": entry.timestamp,
-        "username": entry.username
-    } for entry in changelog_entries]), 200
+    try:
+        limit, cursor = page_args()
+        start, end = parse_bounds(request.args.get('from'), request.args.get('to'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def build():
+        # Archiving moves entries without changing the merged result, so
+        # the list version still identifies it
+        entries, more = changelog_archive.entries(list_id, start, end, cursor, limit or DEFAULT_PAGE_SIZE)
+        if wants_ndjson():
+            def generate():
+                for entry in entries:
+                    yield app.json.dumps(entry) + '\n'
+
+            response = app.response_class(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+        else:
+            response = jsonify(entries)
+        if more:
+            response.headers['X-Next-Cursor'] = encode_cursor(entries[-1]['timestamp'], entries[-1]['id'])
+        return response
+
+    return conditional_response(
+        version_etag('changelog', list_id, get_list_version(list_id), listing_variant(), start, end),
+        build
+    )
 
 @app.route('/remove-user/<int:list_id>/<username>', methods=['DELETE'])
 def remove_user_from_list(list_id, username):
@@ -925,9 +1420,11 @@ def remove_user_from_list(list_id, username):
         if not participant:
             return jsonify({"error": "User not found in list"}), 404
         db.session.delete(participant)
-        db.session.commit()
-        
+        bump_list_version(list_id)
         log_action(list_id, f"User: {participant.username} | Removed {username} from list", participant.username)
+        db.session.commit()
+        membership.invalidate_list(list_id)
+        membership.invalidate_user(username)
         return jsonify({"message": "User removed from list successfully"}), 200
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -937,11 +1434,82 @@ def remove_user_from_list(list_id, username):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+@app.cli.command('rebuild-balances')
+@click.option('--list-id', type=int, help='Only rebuild this list.')
+def rebuild_balances_command(list_id):
+    """Recompute stored list balances and analytics rollups from the expense history."""
+    list_ids = [list_id] if list_id else ledger_list_ids()
+    for current_list_id in list_ids:
+        rebuild_list_balances(current_list_id)
+        rebuild_list_rollups(current_list_id)
+        # Running servers cache debts per list version
+        bump_list_version(current_list_id)
+    db.session.commit()
+    click.echo(f"Rebuilt balances for {len(list_ids)} list(s)")
+
+@app.cli.command('purge-trash')
+def purge_trash_command():
+    """Move trash older than TRASH_RETENTION_DAYS into the archive."""
+    if trash_purger.retention_days <= 0:
+        raise click.ClickException("TRASH_RETENTION_DAYS is 0; trash is kept forever")
+    moved = trash_purger.purge()
+    click.echo(f"Archived {moved} expired trash row(s) to {trash_archive.directory}")
+
+@app.cli.command('archive-changelog')
+def archive_changelog_command():
+    """Move changelog entries older than CHANGELOG_ARCHIVE_DAYS into archive segments."""
+    if changelog_archiver.archive_days <= 0:
+        raise click.ClickException("CHANGELOG_ARCHIVE_DAYS is 0; the changelog is never archived")
+    moved = changelog_archiver.archive_expired()
+    click.echo(f"Archived {moved} changelog entries to {changelog_archive.directory}")
+
+@app.cli.command('rebuild-checkpoints')
+@click.option('--list-id', type=int, help='Only rebuild this list.')
+def rebuild_checkpoints_command(list_id):
+    """Drop and recreate the monthly balance checkpoints."""
+    list_ids = [list_id] if list_id else ledger_list_ids()
+    until = month_start(datetime.utcnow())
+    created = 0
+    for current_list_id in list_ids:
+        invalidate_checkpoints(current_list_id)
+        created += checkpoint_list(current_list_id, until)
+    db.session.commit()
+    click.echo(f"Created {created} checkpoint(s) for {len(list_ids)} list(s)")
+
+@app.cli.command('reclaim-lists')
+def reclaim_lists_command():
+    """Delete the remaining rows of every tombstoned list now."""
+    reclaimed = list_reclaimer.reclaim_all()
+    click.echo(f"Reclaimed {reclaimed} list(s)")
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Recreate the full-text expense search index from the expenses table."""
+    rebuild_search_index()
+    db.session.commit()
+    click.echo("Rebuilt the expense search index")
+
+@app.cli.command('verify-balances')
+@click.option('--list-id', type=int, help='Only verify this list.')
+def verify_balances_command(list_id):
+    """Check stored list balances against the expense history."""
+    list_ids = [list_id] if list_id else ledger_list_ids()
+    drift = verify_balances(list_ids)
+    for drifted_list_id, participants in sorted(drift.items()):
+        for participant, (stored, expected) in sorted(participants.items()):
+            click.echo(f"List {drifted_list_id}: {participant} stored {stored:.2f}, expected {expected:.2f}")
+    if drift:
+        raise click.ClickException(f"{len(drift)} of {len(list_ids)} list(s) drifted; run rebuild-balances")
+    click.echo(f"Balances consistent for {len(list_ids)} list(s)")
+
 if __name__ == '__main__':
     with app.app_context():
         try:
             db.create_all()
             print("Database tables created successfully")
+            run_migrations()
         except Exception as e:
+            # Serving on a half-migrated schema would fail later and less clearly
             print(f"Error creating database tables: {str(e)}")
+            raise SystemExit(1)
     socketio.run(app, debug=True, port=5000)
\ No newline at end of file
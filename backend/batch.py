@@ -0,0 +1,162 @@
+from datetime import datetime
+from db import db
+from models import Expense, DeletedExpense
+from ledger import record_expense_changes
+from imports import ImportRowError, participant_lookup, validate_row
+
+# Operations accepted in one batch request
+MAX_BATCH_OPERATIONS = 1000
+BATCH_OPERATIONS = ('add', 'update', 'delete', 'restore')
+EXPENSE_FIELDS = ('payer', 'amount', 'description', 'category', 'date', 'username', 'participants', 'list_id')
+# An update replaces the expense like /update-expense does, so every field
+# it sets must be given; a missing one would silently be reset
+UPDATE_FIELDS = ('payer', 'amount', 'description', 'category', 'date', 'participants')
+
+class BatchError(ValueError):
+    """Raised with every invalid operation of a batch, as [{'index', 'error'}] dicts."""
+
+    def __init__(self, errors):
+        super().__init__('Invalid batch')
+        self.errors = errors
+
+def target_id(operation):
+    try:
+        return int(operation.get('id'))
+    except (TypeError, ValueError):
+        raise ImportRowError(f"Invalid id: {operation.get('id')}")
+
+def missing_update_fields(operation):
+    missing = [field for field in UPDATE_FIELDS if operation.get(field) is None]
+    # validate_row dates an undated row today, which would move the expense
+    if 'date' not in missing and not str(operation['date']).strip():
+        missing.append('date')
+    return missing
+
+def parse_operations(expense_list, username, operations):
+    """
+    Validate a batch without touching the database beyond reading the rows
+    it targets. Returns {op: [(index, id, values)]}; raises BatchError
+    listing every invalid operation.
+    """
+    if not isinstance(operations, list):
+        raise BatchError([{'index': None, 'error': 'Expected a JSON array of operations'}])
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise BatchError([{'index': None, 'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}])
+
+    lookup = participant_lookup(expense_list)
+    parsed = {op: [] for op in BATCH_OPERATIONS}
+    errors = []
+    seen = set()
+    for index, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+                raise ImportRowError(f"op must be one of {', '.join(BATCH_OPERATIONS)}")
+            op = operation['op']
+            expense_id = target_id(operation) if op != 'add' else None
+            missing = missing_update_fields(operation) if op == 'update' else None
+            if missing:
+                raise ImportRowError(f"Missing fields for update: {', '.join(missing)}")
+            values = validate_row(operation, expense_list, lookup, username) if op in ('add', 'update') else None
+            if expense_id is not None:
+                key = (op == 'restore', expense_id)
+                if key in seen:
+                    raise ImportRowError(f"Expense {expense_id} is targeted by more than one operation")
+                seen.add(key)
+            parsed[op].append((index, expense_id, values))
+        except ImportRowError as e:
+            errors.append({'index': index, 'error': str(e)})
+
+    changed = {expense_id: index for op in ('update', 'delete') for index, expense_id, _ in parsed[op]}
+    if changed:
+        closed = dict(db.session.query(Expense.id, Expense.closing_id).filter(
+            Expense.id.in_(changed), Expense.list_id == expense_list.id
+        ))
+        for expense_id, index in changed.items():
+            if expense_id not in closed:
+                errors.append({'index': index, 'error': f"Expense {expense_id} not found in this list"})
+            elif closed[expense_id] is not None:
+                errors.append({'index': index, 'error': f"Expense {expense_id} has been settled and can no longer be changed"})
+    restored = {expense_id: index for index, expense_id, _ in parsed['restore']}
+    if restored:
+        found = set(db.session.scalars(db.select(DeletedExpense.id).where(
+            DeletedExpense.id.in_(restored), DeletedExpense.list_id == expense_list.id
+        )))
+        for expense_id, index in restored.items():
+            if expense_id not in found:
+                errors.append({'index': index, 'error': f"Deleted expense {expense_id} not found in this list"})
+
+    if errors:
+        raise BatchError(sorted(errors, key=lambda error: error['index']))
+    return parsed
+
+def current_values(model, ids):
+    """{id: column values} of Expense or DeletedExpense rows, read without loading ORM objects."""
+    columns = [model.id] + [getattr(model, field) for field in EXPENSE_FIELDS]
+    return {
+        row[0]: dict(zip(EXPENSE_FIELDS, row[1:]))
+        for row in db.session.query(*columns).filter(model.id.in_(ids))
+    } if ids else {}
+
+def insert_expenses(rows):
+    if not rows:
+        return []
+    return db.session.scalars(db.insert(Expense).returning(Expense.id, sort_by_parameter_order=True), rows).all()
+
+def apply_batch(expense_list, username, operations):
+    """
+    Apply a mixed batch of add/update/delete/restore operations to a list
+    within the caller's transaction, with one bulk statement per kind of
+    change and a single ledger update. Nothing is applied unless every
+    operation is valid. Returns the affected expense ids per operation.
+    """
+    parsed = parse_operations(expense_list, username, operations)
+    list_id = expense_list.id
+
+    update_ids = [expense_id for _, expense_id, _ in parsed['update']]
+    delete_ids = [expense_id for _, expense_id, _ in parsed['delete']]
+    restore_ids = [expense_id for _, expense_id, _ in parsed['restore']]
+    old = current_values(Expense, update_ids + delete_ids)
+    trashed = current_values(DeletedExpense, restore_ids)
+
+    added_rows = [values for _, _, values in parsed['add']]
+    restored_rows = [trashed[expense_id] for expense_id in restore_ids]
+    new_ids = insert_expenses(added_rows + restored_rows)
+    added_ids, restored_new_ids = new_ids[:len(added_rows)], new_ids[len(added_rows):]
+
+    # The creator and list of an updated expense stay as they were
+    updates = [
+        dict(values, id=expense_id, username=old[expense_id]['username'], list_id=list_id)
+        for _, expense_id, values in parsed['update']
+    ]
+    if updates:
+        db.session.execute(db.update(Expense), updates)
+
+    removed = [dict(old[expense_id], id=expense_id) for expense_id in update_ids + delete_ids]
+    added = (
+        [dict(row, id=expense_id) for row, expense_id in zip(added_rows + restored_rows, new_ids)]
+        + updates
+    )
+    record_expense_changes(list_id, removed, added)
+
+    if delete_ids:
+        deleted_at = datetime.utcnow()
+        db.session.execute(db.insert(DeletedExpense), [
+            dict(old[expense_id], original_id=expense_id, deleted_at=deleted_at)
+            for expense_id in delete_ids
+        ])
+        db.session.execute(
+            db.delete(Expense).where(Expense.id.in_(delete_ids)),
+            execution_options={'synchronize_session': False}
+        )
+    if restore_ids:
+        db.session.execute(
+            db.delete(DeletedExpense).where(DeletedExpense.id.in_(restore_ids)),
+            execution_options={'synchronize_session': False}
+        )
+
+    return {
+        'added': added_ids,
+        'updated': update_ids,
+        'deleted': delete_ids,
+        'restored': restored_new_ids
+    }
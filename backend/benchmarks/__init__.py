@@ -0,0 +1,13 @@
+import os
+
+# Settings that switch off the app's periodic jobs
+BACKGROUND_JOB_SETTINGS = ('TRASH_RETENTION_DAYS', 'CHANGELOG_ARCHIVE_DAYS', 'CHECKPOINT_INTERVAL', 'LIST_RECLAIM_INTERVAL')
+
+def disable_background_jobs():
+    """
+    Keep the trash purge, changelog archiver, checkpoint job and list
+    reclaimer from running; call before importing app. Seeded trash and
+    changelog entries are backdated, and the jobs would move them mid-run.
+    """
+    for name in BACKGROUND_JOB_SETTINGS:
+        os.environ[name] = '0'
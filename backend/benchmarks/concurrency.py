@@ -0,0 +1,171 @@
+"""
+Measure mixed read/write throughput under concurrent clients.
+
+Each mode runs in its own process with its own database settings: SQLite
+with a rollback journal (journal_mode=DELETE, synchronous=FULL, no mmap),
+SQLite with the WAL settings the app uses by default, and optionally a
+PostgreSQL database. Worker threads then issue a random mix of expense,
+debt and analytics reads and /add-expense writes through the Flask test
+client; throughput, latency percentiles and failed requests are printed
+per mode.
+
+    cd backend && python -m benchmarks.concurrency --threads 8 --operations 200
+    cd backend && python -m benchmarks.concurrency --postgres-url postgresql://localhost/expenses_bench
+
+The PostgreSQL database is dropped and recreated, so point it at a
+scratch database.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SQLITE_MODES = {
+    'sqlite rollback journal': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_MMAP_SIZE': '0',
+    },
+    'sqlite wal': {},
+}
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def read_request(rng, username, list_id):
+    return rng.choice([
+        f'/expenses?username={username}&list_id={list_id}&limit=100',
+        f'/calculate-debts?username={username}&list_id={list_id}',
+        f'/lists/{list_id}/analytics?username={username}',
+    ])
+
+def worker(app, lists, operations, write_ratio, seed, results):
+    rng = random.Random(seed)
+    client = app.test_client()
+    latencies = {'read': [], 'write': []}
+    errors = 0
+    for _ in range(operations):
+        list_id, username, participants = rng.choice(lists)
+        start = time.perf_counter()
+        if rng.random() < write_ratio:
+            kind = 'write'
+            response = client.post('/add-expense', json={
+                'payer': rng.choice(participants),
+                'amount': round(rng.uniform(1, 200), 2),
+                'description': 'Concurrent',
+                'category': 'Food',
+                'date': '2024-01-01',
+                'username': username,
+                'participants': participants,
+                'list_id': list_id
+            })
+        else:
+            kind = 'read'
+            response = client.get(read_request(rng, username, list_id))
+        latencies[kind].append(time.perf_counter() - start)
+        if response.status_code >= 500:
+            errors += 1
+    results.append((latencies, errors))
+
+def run_mode(args):
+    """Seed the configured database and run the workload; returns a result dict."""
+    import app as app_module
+    from app import app, db
+    from models import ExpenseList
+    from migrations import run_migrations
+    from benchmarks.seed import seed_database
+
+    # Debt broadcasts run in background tasks and are not part of the request path
+    app_module.debt_broadcaster.schedule = lambda list_id: None
+
+    with app.app_context():
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+        db.session.commit()
+        db.create_all()
+        run_migrations()
+        summary = seed_database(users=8, lists=args.lists, expenses_per_list=args.expenses_per_list)
+        lists = [
+            (expense_list.id, expense_list.created_by, expense_list.participants.split(','))
+            for expense_list in ExpenseList.query.filter(ExpenseList.id.in_(summary['list_ids']))
+        ]
+        dialect = db.engine.dialect.name
+
+    results = []
+    threads = [
+        threading.Thread(target=worker, args=(app, lists, args.operations, args.write_ratio, i, results))
+        for i in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    reads = [latency for latencies, _ in results for latency in latencies['read']]
+    writes = [latency for latencies, _ in results for latency in latencies['write']]
+    return {
+        'dialect': dialect,
+        'ops_per_second': (len(reads) + len(writes)) / elapsed,
+        'read_p50': percentile(reads, 0.5),
+        'read_p95': percentile(reads, 0.95),
+        'write_p50': percentile(writes, 0.5),
+        'write_p95': percentile(writes, 0.95),
+        'errors': sum(errors for _, errors in results),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200, help='requests per thread')
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--lists', type=int, default=4)
+    parser.add_argument('--expenses-per-list', type=int, default=500)
+    parser.add_argument('--postgres-url', help='also run against this (scratch) PostgreSQL database')
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args)))
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='concurrency-')
+    modes = [
+        (name, dict(settings, DATABASE_URL=f"sqlite:///{os.path.join(workdir, f'mode{i}.db')}"))
+        for i, (name, settings) in enumerate(SQLITE_MODES.items())
+    ]
+    if args.postgres_url:
+        modes.append(('postgresql', {'DATABASE_URL': args.postgres_url}))
+
+    forwarded = [
+        '--threads', str(args.threads), '--operations', str(args.operations),
+        '--write-ratio', str(args.write_ratio), '--lists', str(args.lists),
+        '--expenses-per-list', str(args.expenses_per_list),
+    ]
+    print(f"{'mode':<26}{'ops/s':>10}{'read p50':>12}{'read p95':>12}{'write p50':>12}{'write p95':>12}{'errors':>8}")
+    for name, settings in modes:
+        # The engine is configured when the app is imported, so every mode gets a fresh process
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.concurrency', '--run-mode', name] + forwarded,
+            env=dict(os.environ, **settings), capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(
+            f"{name:<26}{result['ops_per_second']:>10.1f}"
+            f"{result['read_p50'] * 1000:>10.1f}ms{result['read_p95'] * 1000:>10.1f}ms"
+            f"{result['write_p50'] * 1000:>10.1f}ms{result['write_p95'] * 1000:>10.1f}ms"
+            f"{result['errors']:>8}"
+        )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
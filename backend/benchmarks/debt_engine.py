@@ -0,0 +1,87 @@
+"""
+Compare the pure Python and NumPy net-balance folds.
+
+Generates synthetic expense rows in memory, folds them with both engines,
+checks that the settled debts are identical and prints the timings.
+
+    cd backend && python -m benchmarks.debt_engine --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+import sys
+import time
+
+import debt_engine
+from ledger import settle_debts
+from benchmarks.seed import split_participants
+
+def synthetic_rows(count, lists=50, participants_per_list=8, seed=42):
+    rng = random.Random(seed)
+    members = {
+        list_id: [f'registered:user{list_id}_{i}' for i in range(participants_per_list // 2)] +
+                 [f'nonRegistered:guest{list_id}_{i}' for i in range(participants_per_list - participants_per_list // 2)]
+        for list_id in range(lists)
+    }
+    rows = []
+    for _ in range(count):
+        list_id = rng.randrange(lists)
+        people = members[list_id]
+        rows.append((
+            list_id,
+            rng.choice(people),
+            round(rng.uniform(1, 300), 2),
+            ','.join(split_participants(rng, people))
+        ))
+    return rows
+
+def timed(func, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def same_settlement(left, right):
+    """
+    Settled debts of both folds match. Amounts may differ by a cent where
+    the summation order moves a balance across a rounding boundary.
+    """
+    if left.keys() != right.keys():
+        return False
+    for group in left:
+        left_debts = settle_debts(left[group])
+        right_debts = settle_debts(right[group])
+        if left_debts.keys() != right_debts.keys():
+            return False
+        for debtor, creditors in left_debts.items():
+            if creditors.keys() != right_debts[debtor].keys():
+                return False
+            if any(abs(amount - right_debts[debtor][creditor]) > 0.011 for creditor, amount in creditors.items()):
+                return False
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if debt_engine.np is None:
+        print('numpy is not installed; nothing to compare')
+        return 1
+
+    print(f"{'expenses':>10} {'python':>10} {'numpy':>10} {'speedup':>8}")
+    for size in args.sizes:
+        rows = synthetic_rows(size)
+        python_time, python_result = timed(debt_engine.fold_net_balances_python, rows, args.repeat)
+        numpy_time, numpy_result = timed(debt_engine.fold_net_balances_numpy, rows, args.repeat)
+        if not same_settlement(python_result, numpy_result):
+            print(f'Settlement mismatch at {size} expenses')
+            return 1
+        print(f'{size:>10} {python_time * 1000:>8.1f}ms {numpy_time * 1000:>8.1f}ms {python_time / numpy_time:>7.1f}x')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Compare ORM and column-projection serialization of large listings.
+
+Seeds one list with --expenses rows in a throwaway SQLite database and
+times three ways of producing the /expenses payload: ORM instances with
+as_dict() and the stdlib encoder (the previous path), projected column
+tuples with the stdlib encoder, and projected tuples with the app's JSON
+provider (orjson when installed). It then times the full GET /expenses
+request with the provider using orjson and the stdlib.
+
+    cd backend && python -m benchmarks.listings --expenses 100000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--expenses', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='listings-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'listings.db')}"
+
+    from app import app, db
+    from models import Expense, ExpenseList
+    from migrations import run_migrations
+    from json_provider import FastJSONProvider, orjson
+    from listings import expense_rows, serialize_expense_row
+    from benchmarks.seed import seed_database
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        summary = seed_database(users=4, lists=1, expenses_per_list=args.expenses)
+        list_id = summary['list_ids'][0]
+        username = db.session.get(ExpenseList, list_id).created_by
+
+        def orm_stdlib():
+            db.session.expunge_all()
+            return json.dumps([expense.as_dict() for expense in Expense.query.filter_by(list_id=list_id)])
+
+        def projection_stdlib():
+            return json.dumps([serialize_expense_row(row) for row in expense_rows(Expense.list_id == list_id)])
+
+        def projection_provider():
+            return app.json.dumps([serialize_expense_row(row) for row in expense_rows(Expense.list_id == list_id)])
+
+        timings = []
+        for name, func in [
+            ('ORM + as_dict + stdlib json', orm_stdlib),
+            ('projection + stdlib json', projection_stdlib),
+            ('projection + JSON provider', projection_provider),
+        ]:
+            elapsed, payload = best_of(func, args.repeat)
+            timings.append((name, elapsed))
+            if name == 'ORM + as_dict + stdlib json':
+                expected = sorted(json.loads(payload), key=lambda row: row['id'])
+            elif sorted(json.loads(payload), key=lambda row: row['id']) != expected:
+                raise SystemExit(f'{name} produced a different payload')
+
+    client = app.test_client()
+    url = f'/expenses?username={username}&list_id={list_id}'
+    modes = [('GET /expenses, stdlib provider', False)]
+    if orjson is not None:
+        modes.append(('GET /expenses, orjson provider', True))
+    for name, use_orjson in modes:
+        FastJSONProvider.use_orjson = use_orjson
+        elapsed, response = best_of(lambda: client.get(url), args.repeat)
+        assert response.status_code == 200
+        timings.append((name, elapsed))
+
+    print(f"{args.expenses} expenses, best of {args.repeat}")
+    baseline = timings[0][1]
+    for name, elapsed in timings:
+        print(f'{name:<34}{elapsed * 1000:>10.1f} ms{baseline / elapsed:>8.2f}x')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Check that the queries behind the hot endpoints are index-backed.
+
+Seeds a throwaway SQLite database, calls each endpoint through the Flask
+test client while recording the SQL it runs, and prints EXPLAIN QUERY PLAN
+for every statement. Exits non-zero if any of them falls back to a full
+table scan.
+
+    cd backend && python -m benchmarks.query_plans
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+from benchmarks import disable_background_jobs
+
+# Plan lines look like "SCAN expenses" (or "SCAN TABLE expenses" on older
+# SQLite); subqueries and temp b-trees are reported differently, and a
+# full-text MATCH shows as a scan of the virtual table through its index
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?!\w| VIRTUAL TABLE INDEX)')
+
+def endpoint_requests(summary):
+    username = summary['users'][0]
+    list_id = summary['list_ids'][0]
+    return [
+        ('get_expenses', f'/expenses?username={username}&list_id={list_id}'),
+        ('get_expenses (all lists)', f'/expenses?username={username}'),
+        ('get_changelog', f'/changelog/{list_id}'),
+        ('get_changelog (range)', f'/changelog/{list_id}?from=2023-01-01&to=2023-06-30&limit=50'),
+        ('get_share_requests', f'/share-requests?username={username}'),
+        ('get_trash', f'/trash?username={username}&list_id={list_id}'),
+        ('get_trash (all lists)', f'/trash?username={username}'),
+        ('get_trash (page)', f'/trash?username={username}&list_id={list_id}&limit=50'),
+        ('get_trash (all lists, page)', f'/trash?username={username}&limit=50'),
+        ('payers', f'/payers?username={username}'),
+        ('get_categories', f'/categories?username={username}&list_id={list_id}'),
+        ('get_lists', f'/lists?username={username}'),
+        ('calculate_debts', f'/calculate-debts?username={username}&list_id={list_id}'),
+        ('calculate_debts (all lists)', f'/calculate-debts?username={username}'),
+        ('calculate_debts (as of)', f'/calculate-debts?username={username}&list_id={list_id}&as_of=2023-06-15'),
+        ('get_expenses (include closed)', f'/expenses?username={username}&list_id={list_id}&include_closed=true'),
+        ('get_settlements', f'/lists/{list_id}/settlements?username={username}'),
+        ('get_closings', f'/lists/{list_id}/closings?username={username}'),
+        ('search_expenses', f'/lists/{list_id}/expenses/search?username={username}&q=dinn'),
+        ('search_expenses (filtered)', f'/lists/{list_id}/expenses/search?username={username}&q=groceries&start=2022-03-01&min_amount=10&limit=20'),
+        ('search_expenses (recently_added)', f'/lists/{list_id}/expenses/search?username={username}&q=groc&order=recently_added'),
+        ('expenses_by_date', '/expenses-by-date?start=2023-01-01&end=2023-01-31'),
+        ('list_analytics', f'/lists/{list_id}/analytics?username={username}&start=2023-01-15&end=2023-03-20'),
+        ('list_analytics (category)', f'/lists/{list_id}/analytics?username={username}&category=Food'),
+    ]
+
+def full_scans(plan):
+    return [detail for detail in plan if FULL_SCAN.match(detail)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lists', type=int, default=200)
+    parser.add_argument('--expenses-per-list', type=int, default=300)
+    parser.add_argument('--verbose', action='store_true', help='print the plan of every statement')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='query-plans-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+    # Checkpoints are created explicitly below
+    disable_background_jobs()
+
+    from sqlalchemy import event, text
+    from app import app, db, checkpoint_job
+    from migrations import run_migrations
+    from benchmarks.seed import seed_database
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        summary = seed_database(lists=args.lists, expenses_per_list=args.expenses_per_list)
+        checkpoint_job.checkpoint_all()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        client = app.test_client()
+        failures = []
+        for name, url in endpoint_requests(summary):
+            statements.clear()
+            response = client.get(url)
+            if response.status_code != 200:
+                failures.append(f'{name}: HTTP {response.status_code}')
+                continue
+
+            for statement, parameters in list(statements):
+                with db.engine.connect() as connection:
+                    plan = [row[-1] for row in connection.exec_driver_sql(
+                        f'EXPLAIN QUERY PLAN {statement}', parameters
+                    )]
+                scans = full_scans(plan)
+                status = 'FULL SCAN' if scans else 'ok'
+                print(f'[{status}] {name}: {" ".join(statement.split())[:120]}')
+                if args.verbose or scans:
+                    for detail in plan:
+                        print(f'    {detail}')
+                if scans:
+                    failures.append(f'{name}: {", ".join(scans)}')
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    if failures:
+        print(f'\n{len(failures)} statement(s) regressed to a full scan:')
+        for failure in failures:
+            print(f'  {failure}')
+        return 1
+    print('\nAll endpoint queries are index-backed')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Time full-text expense search against downloading and filtering a list.
+
+Seeds one list with --expenses rows in a throwaway SQLite database, gives
+a few of them a rare word in their description, and times
+GET /lists/<id>/expenses/search for a rare term, a prefix of a common
+one (most recently added first, the default, and by relevance) and a
+filtered query, next to the previous approach of fetching the whole list
+from /expenses and filtering it on the client.
+
+    cd backend && python -m benchmarks.search --expenses 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks import disable_background_jobs
+
+RARE_WORD = 'anniversary'
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--expenses', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-listing', action='store_true', help='do not time the full /expenses download')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='search-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'search.db')}"
+    os.environ['SLOW_REQUEST_MS'] = '0'
+    disable_background_jobs()
+
+    from app import app, db
+    from models import Expense, ExpenseList
+    from migrations import run_migrations
+    from benchmarks.seed import seed_database
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        summary = seed_database(users=4, lists=1, expenses_per_list=args.expenses, trash_ratio=0)
+        list_id = summary['list_ids'][0]
+        username = db.session.get(ExpenseList, list_id).created_by
+        # Updates go through the search triggers like any other write
+        Expense.query.filter(Expense.list_id == list_id, Expense.id % 50000 == 7).update(
+            {Expense.description: f'{RARE_WORD} dinner'}, synchronize_session=False
+        )
+        db.session.commit()
+
+    client = app.test_client()
+    search = f'/lists/{list_id}/expenses/search?username={username}&limit=50'
+    requests = [
+        (f'search "{RARE_WORD}"', f'{search}&q={RARE_WORD}', None),
+        ('search prefix "groc"', f'{search}&q=groc', None),
+        ('search prefix "groc", relevance', f'{search}&q=groc&order=relevance', None),
+        ('search "taxi", filtered', f'{search}&q=taxi&category=Transport&min_amount=20&start=2022-06-01', None),
+    ]
+    if not args.skip_listing:
+        requests.append((
+            f'/expenses + filter "{RARE_WORD}"',
+            f'/expenses?username={username}&list_id={list_id}',
+            lambda rows: [row for row in rows if RARE_WORD in (row['description'] or '').lower()]
+        ))
+
+    print(f"{args.expenses} expenses, best of {args.repeat}")
+    for name, url, client_filter in requests:
+        def run(url=url, client_filter=client_filter):
+            response = client.get(url)
+            assert response.status_code == 200, response.status_code
+            rows = response.get_json()
+            return client_filter(rows) if client_filter else rows
+        elapsed, rows = best_of(run, args.repeat)
+        print(f'{name:<40}{elapsed * 1000:>10.1f} ms{len(rows):>8} rows')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
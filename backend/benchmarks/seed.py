@@ -0,0 +1,128 @@
+import random
+from datetime import datetime, timedelta
+from db import db
+from models import User, Expense, Payer, Category, DeletedExpense, ExpenseList, ListParticipant, ListShareRequest, Changelog
+from ledger import rebuild_list_balances
+from analytics import rebuild_list_rollups
+
+CATEGORIES = ['Food', 'Rent', 'Travel', 'Utilities', 'Fun', 'Groceries', 'Transport', 'Other']
+DESCRIPTIONS = ['Dinner', 'Taxi', 'Groceries', 'Hotel', 'Tickets', 'Coffee', 'Electricity bill', 'Drinks', 'Fuel', 'Snacks']
+# Generated rows inserted per statement, so large lists are seeded in bounded memory
+SEED_BATCH_SIZE = 10000
+
+def split_participants(rng, participants):
+    """
+    Participants of one synthetic expense. Like the expense form, which
+    preselects everyone in list order, most expenses are split between the
+    whole list and the rest between a subset in the same order.
+    """
+    if rng.random() < 0.7:
+        return participants
+    chosen = set(rng.sample(participants, rng.randint(1, len(participants))))
+    return [p for p in participants if p in chosen]
+
+def insert_rows(expenses, changelog, deleted):
+    """Insert and clear the generated rows collected so far."""
+    if expenses:
+        db.session.execute(db.insert(Expense), expenses)
+        db.session.execute(db.insert(Changelog), changelog)
+    if deleted:
+        db.session.execute(db.insert(DeletedExpense), deleted)
+    for rows in (expenses, changelog, deleted):
+        rows.clear()
+
+def seed_database(users=20, lists=10, expenses_per_list=1000, seed=42, start=datetime(2022, 1, 1),
+                  members_per_list=3, max_guests=3, trash_ratio=0.05):
+    """
+    Fill the current database with deterministic synthetic data and return
+    a summary of what was created.
+    Every list gets a creator, members_per_list shared members with their
+    ListParticipant rows and 1..max_guests non-registered participants;
+    expenses are split between the whole list or a subset of it, and come
+    with matching changelog, trash (trash_ratio of them), payer, category
+    and share request rows.
+    """
+    rng = random.Random(seed)
+    usernames = [f'user{i}' for i in range(users)]
+    db.session.execute(db.insert(User), [
+        {'username': username, 'password': 'benchmark'} for username in usernames
+    ])
+
+    list_ids = []
+    for list_index in range(lists):
+        creator = usernames[list_index % users]
+        members = rng.sample([u for u in usernames if u != creator], min(members_per_list, users - 1))
+        guests = [f'guest{list_index}_{i}' for i in range(rng.randint(1, max_guests))]
+        participants = [f'registered:{u}' for u in [creator] + members] + [f'nonRegistered:{g}' for g in guests]
+
+        expense_list = ExpenseList(
+            name=f'List {list_index}',
+            created_by=creator,
+            participants=','.join(participants)
+        )
+        db.session.add(expense_list)
+        db.session.flush()
+        list_ids.append(expense_list.id)
+
+        db.session.execute(db.insert(ListParticipant), [
+            {'list_id': expense_list.id, 'username': username, 'role': 'owner' if username == creator else 'member'}
+            for username in [creator] + members
+        ])
+        db.session.execute(db.insert(ListShareRequest), [
+            {
+                'list_id': expense_list.id,
+                'from_user': creator,
+                'to_user': rng.choice(usernames),
+                'status': rng.choice(['pending', 'accepted', 'rejected']),
+                'message': 'Join my list'
+            }
+            for _ in range(3)
+        ])
+        db.session.execute(db.insert(Category), [
+            {'name': name, 'username': creator, 'list_id': expense_list.id} for name in CATEGORIES
+        ])
+
+        expenses = []
+        deleted = []
+        changelog = []
+        for i in range(expenses_per_list):
+            if len(expenses) >= SEED_BATCH_SIZE:
+                insert_rows(expenses, changelog, deleted)
+            split = split_participants(rng, participants)
+            row = {
+                'payer': rng.choice(participants),
+                'amount': round(rng.uniform(1, 300), 2),
+                'description': rng.choice(DESCRIPTIONS),
+                'category': rng.choice(CATEGORIES),
+                'date': start + timedelta(days=rng.randint(0, 3 * 365), minutes=i),
+                'username': rng.choice([creator] + members),
+                'participants': ','.join(split),
+                'list_id': expense_list.id
+            }
+            expenses.append(row)
+            changelog.append({
+                'list_id': expense_list.id,
+                'action': f"User: {row['username']} | Added new expense \"{row['description']}\" ({row['amount']}€)",
+                'username': row['username'],
+                'timestamp': row['date']
+            })
+            if rng.random() < trash_ratio:
+                deleted.append(dict(row, original_id=None, deleted_at=row['date'] + timedelta(days=1)))
+
+        insert_rows(expenses, changelog, deleted)
+
+    db.session.execute(db.insert(Payer), [
+        {'name': f'Payer {i}', 'username': username}
+        for username in usernames for i in range(3)
+    ])
+
+    for list_id in list_ids:
+        rebuild_list_balances(list_id)
+        rebuild_list_rollups(list_id)
+    db.session.commit()
+
+    return {
+        'users': usernames,
+        'list_ids': list_ids,
+        'expenses': lists * expenses_per_list
+    }
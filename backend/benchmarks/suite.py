@@ -0,0 +1,250 @@
+"""
+Run the benchmark suite and optionally compare it against a baseline.
+
+For every data scale a throwaway database is seeded with
+benchmarks.seed, then microbenchmarks (debt calculation, the debt engine,
+process_participants and the serializers) and endpoint benchmarks through
+the Flask test client are timed. Results are written as JSON; with
+--baseline, every benchmark whose median got slower by more than
+--threshold is flagged and the exit status is 1.
+
+    cd backend && python -m benchmarks.suite --output results.json
+    cd backend && python -m benchmarks.suite --scales small --baseline results.json
+    cd backend && python -m benchmarks.suite --input new.json --baseline old.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks import disable_background_jobs
+
+SCALES = {
+    'small': {'users': 10, 'lists': 5, 'expenses_per_list': 200},
+    'medium': {'users': 20, 'lists': 20, 'expenses_per_list': 1000},
+    'large': {'users': 50, 'lists': 20, 'expenses_per_list': 10000, 'members_per_list': 6},
+}
+
+def measure(func, repeat, setup=None):
+    """Run func repeat times after one warm-up call; timings in milliseconds."""
+    timings = []
+    for run in range(repeat + 1):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        if run:
+            timings.append(elapsed)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'min_ms': round(timings[0], 3),
+        'runs': repeat
+    }
+
+def participant_inputs(count=1000, seed=42):
+    rng = random.Random(seed)
+    return [
+        [f'guest{i}_{j}' for j in range(rng.randint(1, 4))] + [f'registered:user{i}']
+        for i in range(count)
+    ]
+
+def micro_benchmarks(app_module, summary, repeat):
+    from app import db
+    from models import Expense, ExpenseList, DeletedExpense, ListShareRequest
+    from listings import expense_rows, serialize_expense_row
+    from ledger import settle_debts
+    import debt_engine
+
+    list_id = summary['list_ids'][0]
+    username = db.session.get(ExpenseList, list_id).created_by
+    cache = app_module.debt_cache
+    expenses = Expense.query.filter_by(list_id=list_id).all()
+    expense_tuples = expense_rows(Expense.list_id == list_id).all()
+    lists = ExpenseList.query.all()
+    deleted = DeletedExpense.query.all()
+    share_requests = ListShareRequest.query.options(db.joinedload(ListShareRequest.expense_list)).all()
+    ledger_rows = db.session.query(
+        Expense.list_id, Expense.payer, Expense.amount, Expense.participants
+    ).all()
+    net_balances = app_module.get_net_balances(summary['list_ids'])
+
+    return {
+        'calculate_debts_internal (list, cold)': measure(
+            lambda: app_module.calculate_debts_internal(username, list_id), repeat, setup=cache.clear),
+        'calculate_debts_internal (list, cached)': measure(
+            lambda: app_module.calculate_debts_internal(username, list_id), repeat),
+        'calculate_debts_internal (all lists, cold)': measure(
+            lambda: app_module.calculate_debts_internal(username), repeat, setup=cache.clear),
+        'fold_net_balances (all expenses)': measure(
+            lambda: debt_engine.fold_net_balances(ledger_rows), repeat),
+        'settle_debts (all lists)': measure(lambda: settle_debts(net_balances), repeat),
+        'Expense.as_dict (one list)': measure(lambda: [e.as_dict() for e in expenses], repeat),
+        'serialize_expense_row (one list)': measure(
+            lambda: [serialize_expense_row(row) for row in expense_tuples], repeat),
+        'ExpenseList.as_dict (all lists)': measure(lambda: [l.as_dict() for l in lists], repeat),
+        'DeletedExpense.as_dict (all trash)': measure(lambda: [d.as_dict() for d in deleted], repeat),
+        'ListShareRequest.as_dict (all requests)': measure(
+            lambda: [r.as_dict() for r in share_requests], repeat),
+    }
+
+def endpoint_benchmarks(app, summary, repeat):
+    from app import db
+    from models import ExpenseList
+    from benchmarks.query_plans import endpoint_requests
+
+    client = app.test_client()
+    results = {}
+    for name, url in endpoint_requests(summary):
+        def get(url=url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise SystemExit(f'GET {url} returned {response.status_code}')
+        results[f'GET {name}'] = measure(get, repeat)
+
+    with app.app_context():
+        expense_list = db.session.get(ExpenseList, summary['list_ids'][0])
+        list_id, username, participants = expense_list.id, expense_list.created_by, expense_list.participants.split(',')
+
+    def add_expense():
+        response = client.post('/add-expense', json={
+            'payer': participants[0],
+            'amount': 12.5,
+            'description': 'Benchmark',
+            'category': 'Food',
+            'date': '2024-01-01',
+            'username': username,
+            'participants': participants,
+            'list_id': list_id
+        })
+        if response.status_code != 201:
+            raise SystemExit(f'POST /add-expense returned {response.status_code}')
+    results['POST add_expense'] = measure(add_expense, repeat)
+    return results
+
+def run_suite(args):
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        workdir = tempfile.mkdtemp(prefix='benchmark-suite-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'suite.db')}"
+    disable_background_jobs()
+
+    import app as app_module
+    from app import app, db, process_participants
+    from migrations import run_migrations
+    from benchmarks.seed import seed_database
+
+    # Debt broadcasts run in background tasks and are not part of the measured paths
+    app_module.debt_broadcaster.schedule = lambda list_id: None
+
+    inputs = participant_inputs()
+    results = {
+        'process_participants (1000 lists)': measure(
+            lambda: [process_participants(names, 'creator') for names in inputs], args.repeat)
+    }
+
+    for scale in args.scales:
+        with app.app_context():
+            db.drop_all()
+            db.session.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+            db.session.commit()
+            db.create_all()
+            run_migrations()
+            summary = seed_database(seed=args.seed, **SCALES[scale])
+            # The seed writes memberships directly, behind the index's back
+            app_module.membership.clear()
+            print(f"Seeded {scale}: {summary['expenses']} expenses in {len(summary['list_ids'])} lists", file=sys.stderr)
+            for name, result in micro_benchmarks(app_module, summary, args.repeat).items():
+                results[f'{scale}/{name}'] = result
+            dialect = db.engine.dialect.name
+        for name, result in endpoint_benchmarks(app, summary, args.repeat).items():
+            results[f'{scale}/{name}'] = result
+
+    return {'meta': run_metadata(args, dialect), 'results': results}
+
+def run_metadata(args, dialect):
+    import sqlalchemy
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'dialect': dialect,
+        'scales': {scale: SCALES[scale] for scale in args.scales},
+        'repeat': args.repeat,
+        'seed': args.seed
+    }
+
+def compare(baseline, current, threshold):
+    """Print median changes for benchmarks in both runs; return the regressed names."""
+    regressions = []
+    print(f"{'benchmark':<64}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before = baseline['results'][name]['median_ms']
+        after = current['results'][name]['median_ms']
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<64}{before:>10.2f}ms{after:>10.2f}ms{change:>+9.0%}{flag}')
+    return regressions
+
+def print_results(results):
+    print(f"{'benchmark':<64}{'median':>12}{'p95':>12}")
+    for name, result in results['results'].items():
+        print(f"{name:<64}{result['median_ms']:>10.2f}ms{result['p95_ms']:>10.2f}ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs per benchmark')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='scratch database to use instead of a temporary SQLite file; it is wiped')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--input', help='load results from this JSON file instead of running the suite')
+    parser.add_argument('--baseline', help='compare against the results in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='slowdown that counts as a regression (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    if args.input:
+        with open(args.input) as f:
+            results = json.load(f)
+    else:
+        results = run_suite(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        print_results(results)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(baseline, results, args.threshold)
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}')
+        return 1
+    print('No regressions')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
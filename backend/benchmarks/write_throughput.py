@@ -0,0 +1,97 @@
+"""
+Measure throughput of the expense write endpoints.
+
+Runs add, update and delete requests through the Flask test client against
+a file-backed SQLite database, once with changelog entries committed in the
+same transaction as the change (current behaviour) and once with the
+previous extra commit per log_action emulated, and prints requests per
+second for both.
+
+    cd backend && python -m benchmarks.write_throughput --requests 300
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+def run_writes(client, list_id, participants, count):
+    """Issue count add, update and delete requests; return seconds per phase."""
+    timings = {}
+    payload = {
+        'payer': participants[0],
+        'amount': 12.5,
+        'description': 'Benchmark',
+        'category': 'Food',
+        'date': '2024-01-01',
+        'username': 'user0',
+        'participants': participants,
+        'list_id': list_id
+    }
+
+    ids = []
+    start = time.perf_counter()
+    for _ in range(count):
+        ids.append(client.post('/add-expense', json=payload).get_json()['id'])
+    timings['add-expense'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for expense_id in ids:
+        client.put(f'/update-expense/{expense_id}', json=dict(payload, amount=20, description='Updated'))
+    timings['update-expense'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for expense_id in ids:
+        client.delete(f'/delete-expense/{expense_id}')
+    timings['delete-expense'] = time.perf_counter() - start
+    return timings
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300, help='requests per endpoint and mode')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='write-throughput-')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'writes.db')}"
+
+    import app as app_module
+    from app import app, db
+    from migrations import run_migrations
+    from benchmarks.seed import seed_database
+
+    # Debt broadcasts run in background tasks and are not part of the write path
+    app_module.debt_broadcaster.schedule = lambda list_id: None
+    grouped_log_action = app_module.log_action
+
+    def log_action_with_own_commit(*args, **kwargs):
+        grouped_log_action(*args, **kwargs)
+        db.session.commit()
+
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        summary = seed_database(users=4, lists=2, expenses_per_list=0)
+        lists = {
+            list_id: db.session.get(app_module.ExpenseList, list_id).participants.split(',')
+            for list_id in summary['list_ids']
+        }
+
+    client = app.test_client()
+    modes = [
+        ('separate changelog commit', log_action_with_own_commit),
+        ('single transaction', grouped_log_action),
+    ]
+    results = {}
+    for (mode, log_action), (list_id, participants) in zip(modes, lists.items()):
+        app_module.log_action = log_action
+        results[mode] = run_writes(client, list_id, participants, args.requests)
+    app_module.log_action = grouped_log_action
+
+    print(f"{'endpoint':<16}" + ''.join(f'{mode:>28}' for mode, _ in modes))
+    for endpoint in results[modes[0][0]]:
+        row = ''.join(f'{args.requests / results[mode][endpoint]:>22.1f} req/s' for mode, _ in modes)
+        print(f'{endpoint:<16}{row}')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
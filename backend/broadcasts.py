@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from metrics import SOCKET_EMITS
+
+def list_room(list_id):
+    """Socket.IO room joined by every client viewing a list."""
+    return f'list_{list_id}'
+
+class DebtBroadcaster:
+    """
+    Recomputes and broadcasts list debts on a small pool of background workers.
+    schedule() only queues the list and returns, so requests respond right
+    after their commit. A queued list waits for a short window; further
+    changes to it while it is still queued collapse into the same job, which
+    computes the debts once and emits them once to the list's room. A list
+    is broadcast by one worker at a time, so a change that arrives while its
+    job runs is queued behind it and the newest debts are always emitted last.
+    """
+
+    def __init__(self, socketio, app, compute_debts, window=0.2, workers=2):
+        self.socketio = socketio
+        self.app = app
+        self.compute_debts = compute_debts
+        self.window = window
+        self.workers = workers
+        # list_id -> time the job was first queued, in queue order
+        self._pending = OrderedDict()
+        # Lists whose job a worker is running
+        self._in_flight = set()
+        self._condition = threading.Condition()
+        self._started = False
+        self._running = 0
+        self._scheduled = 0
+        self._coalesced = 0
+        self._completed = 0
+        self._failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._run_total = 0.0
+
+    def schedule(self, list_id):
+        list_id = int(list_id)
+        with self._condition:
+            if list_id in self._pending:
+                self._coalesced += 1
+                return
+            self._pending[list_id] = time.monotonic()
+            self._scheduled += 1
+            self._condition.notify()
+            start_workers = not self._started
+            self._started = True
+        if start_workers:
+            for _ in range(self.workers):
+                self.socketio.start_background_task(self._work)
+
+    def _next_job(self):
+        """
+        Block until the oldest queued job of a list that is not already
+        being broadcast is due, then take it off the queue.
+        """
+        with self._condition:
+            while True:
+                job = next((
+                    (list_id, queued_at) for list_id, queued_at in self._pending.items()
+                    if list_id not in self._in_flight
+                ), None)
+                if job is None:
+                    self._condition.wait()
+                    continue
+                list_id, queued_at = job
+                delay = queued_at + self.window - time.monotonic()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                del self._pending[list_id]
+                self._in_flight.add(list_id)
+                self._running += 1
+                return list_id, queued_at
+
+    def _work(self):
+        while True:
+            list_id, queued_at = self._next_job()
+            started_at = time.monotonic()
+            succeeded = self.broadcast(list_id)
+            finished_at = time.monotonic()
+            with self._condition:
+                self._running -= 1
+                self._in_flight.discard(list_id)
+                # A job for the same list may have been queued meanwhile
+                self._condition.notify()
+                if succeeded:
+                    self._completed += 1
+                else:
+                    self._failed += 1
+                latency = finished_at - queued_at
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+                self._run_total += finished_at - started_at
+
+    def broadcast(self, list_id):
+        try:
+            with self.app.app_context():
+                debts = self.compute_debts(list_id)
+            self.socketio.emit('expensesUpdated', {'list_id': list_id, 'debts': debts}, to=list_room(list_id))
+            SOCKET_EMITS.inc(event='expensesUpdated')
+            return True
+        except Exception as e:
+            print(f"Error broadcasting debts for list {list_id}: {str(e)}")
+            return False
+
+    def stats(self):
+        """
+        Queue and job counters. Latency runs from the first schedule() of a
+        job to the end of its emit, so it includes the coalescing window.
+        """
+        with self._condition:
+            finished = self._completed + self._failed
+            return {
+                'workers': self.workers,
+                'queue_depth': len(self._pending),
+                'running': self._running,
+                'scheduled': self._scheduled,
+                'coalesced': self._coalesced,
+                'completed': self._completed,
+                'failed': self._failed,
+                'avg_latency_ms': round(self._latency_total / finished * 1000, 2) if finished else 0,
+                'max_latency_ms': round(self._latency_max * 1000, 2),
+                'avg_run_ms': round(self._run_total / finished * 1000, 2) if finished else 0
+            }
@@ -0,0 +1,216 @@
+import gzip
+import heapq
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from db import db
+from jobs import BackgroundJob
+from models import Changelog, ChangelogSegment
+from listings import changelog_rows, serialize_changelog_row
+from pagination import keyset_page, DEFAULT_PAGE_SIZE
+
+# Changelog rows moved into segments per transaction
+ARCHIVE_BATCH_SIZE = 1000
+
+def archive_entry(entry):
+    """JSON-ready copy of a Changelog row."""
+    return {
+        'id': entry.id,
+        'list_id': entry.list_id,
+        'action': entry.action,
+        'timestamp': entry.timestamp.isoformat(),
+        'username': entry.username,
+        'details': entry.details
+    }
+
+def serialize_archived_entry(entry):
+    """Same shape as serialize_changelog_row."""
+    return {
+        'id': entry['id'],
+        'action': entry['action'],
+        'timestamp': datetime.fromisoformat(entry['timestamp']),
+        'username': entry['username']
+    }
+
+def parse_bounds(start, end):
+    """
+    Turn the from/to query parameters, ISO dates or datetimes, into a
+    half-open [start, end) range. A bare date as `to` includes that whole
+    day. Raises ValueError for malformed values.
+    """
+    start = datetime.fromisoformat(start) if start else None
+    if end:
+        parsed = datetime.fromisoformat(end)
+        end = parsed + (timedelta(days=1) if len(end) == 10 else timedelta(microseconds=1))
+    return start, end or None
+
+def sort_key(entry):
+    return entry['timestamp'] or datetime.min, entry['id']
+
+def in_range(entry, start, end, cursor):
+    timestamp = entry['timestamp']
+    if start and timestamp < start:
+        return False
+    if end and timestamp >= end:
+        return False
+    return not cursor or sort_key(entry) < cursor
+
+class ChangelogArchive:
+    """
+    Archived changelog entries on disk, one gzip-compressed NDJSON segment
+    per list and calendar month. The ChangelogSegment table indexes the
+    segments by the time range they cover, so a range query only opens the
+    files that overlap it. Archiving appends a gzip member to a segment;
+    a row that was appended twice after a failed commit is read once.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def list_directory(self, list_id):
+        return os.path.join(self.directory, f'list-{list_id}')
+
+    def path(self, list_id, period):
+        return os.path.join(self.list_directory(list_id), f'{period}.ndjson.gz')
+
+    def append(self, list_id, period, entries):
+        with self._lock:
+            os.makedirs(self.list_directory(list_id), exist_ok=True)
+            with gzip.open(self.path(list_id, period), 'at', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + '\n')
+
+    def read(self, list_id, period):
+        path = self.path(list_id, period)
+        entries = {}
+        with self._lock:
+            if not os.path.exists(path):
+                return []
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry['id'], entry['timestamp']] = entry
+        return list(entries.values())
+
+    def remove_list(self, list_id):
+        with self._lock:
+            shutil.rmtree(self.list_directory(list_id), ignore_errors=True)
+
+    def entries(self, list_id, start=None, end=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        One page of a list's changelog entries in [start, end), newest
+        first, from the hot table and the overlapping segments, continuing
+        after cursor. Returns (entries, more) where more tells whether
+        entries were cut off at limit. The segments are merged in lazily,
+        so only those reaching into the page are opened.
+        """
+        criteria = [Changelog.list_id == list_id]
+        if start:
+            criteria.append(Changelog.timestamp >= start)
+        if end:
+            criteria.append(Changelog.timestamp < end)
+        query = keyset_page(changelog_rows(*criteria), Changelog.timestamp, Changelog.id, cursor)
+        hot = [serialize_changelog_row(row) for row in query.limit(limit + 1)]
+        # Once the hot table fills the page on its own, older segments cannot reach it
+        floor = sort_key(hot[limit])[0] if len(hot) > limit else None
+
+        archived = self._archived_entries(list_id, start, end, cursor, floor)
+        page = list(islice(heapq.merge(hot, archived, key=sort_key, reverse=True), limit + 1))
+        return page[:limit], len(page) > limit
+
+    def _archived_entries(self, list_id, start, end, cursor, floor):
+        """
+        Archived entries of the segments overlapping [start, end), newest
+        first. A list's monthly segments cover disjoint time ranges, so
+        reading them newest first and sorting each one keeps the whole
+        sequence in order.
+        """
+        segments = ChangelogSegment.query.filter(ChangelogSegment.list_id == list_id)
+        if start:
+            segments = segments.filter(ChangelogSegment.ends_at >= start)
+        if end:
+            segments = segments.filter(ChangelogSegment.starts_at < end)
+        if cursor:
+            segments = segments.filter(ChangelogSegment.starts_at <= cursor[0])
+        for segment in segments.order_by(ChangelogSegment.ends_at.desc()).all():
+            if floor and segment.ends_at < floor:
+                break
+            entries = (serialize_archived_entry(archived) for archived in self.read(list_id, segment.period))
+            yield from sorted(
+                (entry for entry in entries if in_range(entry, start, end, cursor)),
+                key=sort_key, reverse=True
+            )
+
+class ChangelogArchiver(BackgroundJob):
+    """
+    Moves changelog rows older than archive_days from the changelog table
+    into monthly archive segments, keeping the hot table small.
+    """
+
+    name = 'changelog archival'
+
+    def __init__(self, socketio, app, archive, archive_days=90, interval=3600):
+        super().__init__(socketio, app, interval)
+        self.archive = archive
+        self.archive_days = archive_days
+        self.runs = 0
+        self.archived = 0
+        self.last_run_at = None
+
+    def enabled(self):
+        return self.archive_days > 0
+
+    def run_once(self):
+        self.archive_expired()
+
+    def archive_expired(self, now=None):
+        """Archive every changelog row past the cutoff; returns how many were moved."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.archive_days)
+        moved = 0
+        while True:
+            rows = Changelog.query.filter(
+                Changelog.timestamp < cutoff
+            ).order_by(Changelog.timestamp, Changelog.id).limit(ARCHIVE_BATCH_SIZE).all()
+            if not rows:
+                break
+            segment_key = lambda row: (row.list_id, row.timestamp.strftime('%Y-%m'))
+            for (list_id, period), group in groupby(sorted(rows, key=segment_key), key=segment_key):
+                group = list(group)
+                self.archive.append(list_id, period, [archive_entry(row) for row in group])
+                self._index_segment(list_id, period, group)
+            Changelog.query.filter(
+                Changelog.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            moved += len(rows)
+        self.runs += 1
+        self.archived += moved
+        self.last_run_at = datetime.utcnow()
+        return moved
+
+    def _index_segment(self, list_id, period, rows):
+        first = min(row.timestamp for row in rows)
+        last = max(row.timestamp for row in rows)
+        segment = ChangelogSegment.query.filter_by(list_id=list_id, period=period).first()
+        if segment is None:
+            segment = ChangelogSegment(list_id=list_id, period=period, starts_at=first, ends_at=last, entry_count=0)
+            db.session.add(segment)
+        else:
+            segment.starts_at = min(segment.starts_at, first)
+            segment.ends_at = max(segment.ends_at, last)
+        segment.entry_count += len(rows)
+
+    def stats(self):
+        return {
+            'archive_days': self.archive_days,
+            'interval': self.interval,
+            'runs': self.runs,
+            'archived': self.archived,
+            'segments': ChangelogSegment.query.count(),
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None
+        }
@@ -0,0 +1,180 @@
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from jobs import BackgroundJob
+from models import Expense, ExpenseList, ExpenseParticipant, Settlement, BalanceCheckpoint
+from analytics import month_start, next_month
+
+def lock_list(list_id):
+    """
+    Hold the list's row lock until the transaction ends. A no-op update
+    rather than SELECT ... FOR UPDATE, which SQLite ignores: there it
+    begins the transaction and takes the database write lock instead.
+    """
+    ExpenseList.query.filter_by(id=list_id).update(
+        {ExpenseList.version: ExpenseList.version},
+        synchronize_session=False
+    )
+
+def invalidate_checkpoints(list_id, date=None):
+    """
+    Drop the checkpoints of a list that include an expense dated `date`,
+    i.e. those taken after it; with no date, drop all of them. Called from
+    the ledger inside the transaction that changes the expense, so the
+    checkpoint job rebuilds them from the remaining ones on its next run.
+    Takes the list's row lock first, as the job does, so the delete sees
+    any checkpoints the job committed while this write was in progress.
+    """
+    lock_list(list_id)
+    query = BalanceCheckpoint.query.filter(BalanceCheckpoint.list_id == list_id)
+    if date is not None:
+        query = query.filter(BalanceCheckpoint.as_of > date)
+    query.delete(synchronize_session=False)
+
+def expense_criteria(list_id, start, end):
+    criteria = [Expense.list_id == list_id, Expense.date < end]
+    if start is not None:
+        criteria.append(Expense.date >= start)
+    return criteria
+
+def balance_deltas(list_id, start, end):
+    """
+    Net balance change per participant from the expenses and settlements of
+    a list dated in [start, end), or before end when start is None. Each
+    expense_participants share is credited to the expense's payer and
+    debited from the participant; settlements count whether or not a
+    settle-all has closed them, as checkpoints cover the whole history.
+    """
+    rows = db.session.query(
+        Expense.payer, ExpenseParticipant.participant, ExpenseParticipant.share
+    ).join(
+        ExpenseParticipant, ExpenseParticipant.expense_id == Expense.id
+    ).filter(*expense_criteria(list_id, start, end))
+    deltas = {}
+    for payer, participant, share in rows:
+        deltas[payer] = deltas.get(payer, 0) + share
+        deltas[participant] = deltas.get(participant, 0) - share
+    settlement_criteria = [Settlement.list_id == list_id, Settlement.date < end]
+    if start is not None:
+        settlement_criteria.append(Settlement.date >= start)
+    settlements = db.session.query(
+        Settlement.from_participant, Settlement.to_participant, Settlement.amount
+    ).filter(*settlement_criteria)
+    for from_participant, to_participant, amount in settlements:
+        deltas[from_participant] = deltas.get(from_participant, 0) + amount
+        deltas[to_participant] = deltas.get(to_participant, 0) - amount
+    return deltas
+
+def add_balances(balances, deltas):
+    balances = dict(balances)
+    for participant, delta in deltas.items():
+        balances[participant] = balances.get(participant, 0) + delta
+    return balances
+
+def nearest_checkpoint(list_id, as_of):
+    """The latest checkpoint of a list taken no later than as_of, or None."""
+    return BalanceCheckpoint.query.filter(
+        BalanceCheckpoint.list_id == list_id,
+        BalanceCheckpoint.as_of <= as_of
+    ).order_by(BalanceCheckpoint.as_of.desc()).first()
+
+def balances_as_of(list_id, as_of):
+    """
+    Net balances of a list over the expenses dated before as_of: the
+    nearest earlier checkpoint plus the expenses between it and as_of, so
+    at most about a month of expenses is aggregated once checkpoints exist.
+    """
+    checkpoint = nearest_checkpoint(list_id, as_of)
+    if checkpoint is None:
+        return balance_deltas(list_id, None, as_of)
+    return add_balances(checkpoint.balances, balance_deltas(list_id, checkpoint.as_of, as_of))
+
+def checkpoint_list(list_id, until):
+    """
+    Create the missing monthly checkpoints of a list, at the start of every
+    month up to until, each from the one before it. Returns how many were
+    added to the session.
+    """
+    latest = BalanceCheckpoint.query.filter(
+        BalanceCheckpoint.list_id == list_id
+    ).order_by(BalanceCheckpoint.as_of.desc()).first()
+    if latest is not None:
+        previous, balances = latest.as_of, latest.balances
+        last_expense_id, expense_count = latest.last_expense_id, latest.expense_count
+    else:
+        first_date = min(filter(None, (
+            db.session.query(db.func.min(Expense.date)).filter(Expense.list_id == list_id).scalar(),
+            db.session.query(db.func.min(Settlement.date)).filter(Settlement.list_id == list_id).scalar()
+        )), default=None)
+        if first_date is None:
+            return 0
+        previous, balances, last_expense_id, expense_count = None, {}, None, 0
+
+    boundary = next_month(previous if previous is not None else first_date)
+    created = 0
+    while boundary <= until:
+        balances = add_balances(balances, balance_deltas(list_id, previous, boundary))
+        max_id, count = db.session.query(
+            db.func.max(Expense.id), db.func.count(Expense.id)
+        ).filter(*expense_criteria(list_id, previous, boundary)).one()
+        last_expense_id = max(filter(None, (last_expense_id, max_id)), default=None)
+        expense_count += count
+        db.session.add(BalanceCheckpoint(
+            list_id=list_id,
+            as_of=boundary,
+            last_expense_id=last_expense_id,
+            expense_count=expense_count,
+            balances=balances
+        ))
+        previous, boundary = boundary, next_month(boundary)
+        created += 1
+    return created
+
+class CheckpointJob(BackgroundJob):
+    """Keeps every list checkpointed up to the start of the current month."""
+
+    name = 'balance checkpoints'
+
+    def __init__(self, socketio, app, interval=86400):
+        super().__init__(socketio, app, interval)
+        self.runs = 0
+        self.created = 0
+        self.skipped = 0
+        self.last_run_at = None
+
+    def enabled(self):
+        return self.interval > 0
+
+    def run_once(self):
+        self.checkpoint_all()
+
+    def checkpoint_all(self, now=None):
+        """Checkpoint every list with expenses; returns how many checkpoints were created."""
+        until = month_start(now or datetime.utcnow())
+        created = 0
+        list_ids = [list_id for (list_id,) in db.session.query(Expense.list_id).distinct() if list_id is not None]
+        for list_id in sorted(list_ids):
+            try:
+                # Writers lock the list before dropping its checkpoints, so
+                # none can change what these are built from until they commit
+                lock_list(list_id)
+                count = checkpoint_list(list_id, until)
+                db.session.commit()
+                created += count
+            except SQLAlchemyError as e:
+                db.session.rollback()
+                self.skipped += 1
+                print(f"Error checkpointing list {list_id}: {str(e)}")
+        self.runs += 1
+        self.created += created
+        self.last_run_at = datetime.utcnow()
+        return created
+
+    def stats(self):
+        return {
+            'interval': self.interval,
+            'runs': self.runs,
+            'created': self.created,
+            'skipped': self.skipped,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None
+        }
@@ -0,0 +1,28 @@
+import hashlib
+from flask import current_app, request
+
+def version_etag(*parts):
+    """
+    Strong ETag for a representation built from list versions.
+    parts hold everything the payload depends on: the endpoint, the
+    (list_id, version) pairs it reads and any variant such as the
+    requested media type. Every list mutation bumps its version, so the
+    tag changes whenever the payload can.
+    """
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:32]
+
+def conditional_response(etag, build):
+    """
+    Answer 304 Not Modified if If-None-Match already names etag, without
+    calling build; otherwise build the response and tag it. Clients are
+    asked to revalidate on every use instead of caching heuristically.
+    """
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
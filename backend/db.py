@@ -1,4 +1,89 @@
+import os
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
 
+DEFAULT_DATABASE_URL = 'sqlite:///expenses.db'
+
+def database_url():
+    url = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Hosting providers still hand out postgres:// URLs, which SQLAlchemy rejects
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+def engine_options(url):
+    """
+    Connection pool settings for SQLALCHEMY_ENGINE_OPTIONS, read from
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE.
+    In-memory SQLite uses a single shared connection and takes no pool options.
+    """
+    url = make_url(url)
+    is_sqlite = url.get_backend_name() == 'sqlite'
+    if is_sqlite and url.database in (None, '', ':memory:'):
+        return {}
+
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+    if not is_sqlite:
+        # Server connections can be dropped by the server or a proxy while idle
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+        options['pool_pre_ping'] = True
+    return options
+
+def sqlite_pragmas():
+    """Pragmas applied to every new SQLite connection, overridable through SQLITE_* variables."""
+    return {
+        # WAL lets readers run alongside the single writer instead of waiting on it
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        # NORMAL only syncs at checkpoints in WAL mode; still safe against corruption
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        # Milliseconds a writer waits for the lock before failing with "database is locked"
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+        'foreign_keys': 'ON',
+    }
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+def upsert_increment(model, index_elements, increments):
+    """
+    INSERT ... ON CONFLICT DO UPDATE for the bound dialect (SQLite or
+    PostgreSQL) that adds the inserted values of the increments columns to
+    an existing row with the same index_elements.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(model)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: getattr(model, column) + getattr(statement.excluded, column) for column in increments}
+    )
+
+def init_db(app):
+    """Configure the engine from the environment and bind db to the app."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas()
+    db.init_app(app)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            pragmas = app.config['SQLITE_PRAGMAS']
+            event.listen(
+                db.engine, 'connect',
+                lambda dbapi_connection, connection_record: apply_sqlite_pragmas(dbapi_connection, pragmas)
+            )
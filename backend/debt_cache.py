@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+from db import db
+from models import ExpenseList
+
+def bump_list_version(list_id):
+    """
+    Mark a list as changed. Call inside the transaction of every mutation so
+    that the new version commits together with the change it describes.
+    """
+    ExpenseList.query.filter_by(id=list_id).update(
+        {ExpenseList.version: ExpenseList.version + 1},
+        synchronize_session=False
+    )
+
+def get_list_version(list_id):
+    return db.session.query(ExpenseList.version).filter(ExpenseList.id == list_id).scalar()
+
+def get_list_versions(list_ids):
+    """(list_id, version) pairs for the given lists, ordered by id."""
+    rows = db.session.query(ExpenseList.id, ExpenseList.version).filter(
+        ExpenseList.id.in_(list_ids)
+    ).order_by(ExpenseList.id)
+    return tuple((list_id, version) for list_id, version in rows)
+
+class DebtCache:
+    """
+    LRU cache of settled debts keyed by list version.
+    Keys embed the version of every list the result was computed from, so
+    entries never need explicit invalidation: a mutation bumps the version
+    and later lookups simply miss the stale entry until it is evicted.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize
+            }
@@ -0,0 +1,115 @@
+from operator import itemgetter
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; fall back to the pure Python fold
+    np = None
+
+# Above this many (group, participant) slots the sums are compacted with
+# np.unique instead of a dense bincount
+DENSE_KEY_LIMIT = 1 << 24
+
+def fold_net_balances_python(rows):
+    """
+    Reference fold: one dict update per payer and participant.
+    rows are (group, payer, amount, participants) tuples where participants
+    is the comma-joined string stored on Expense. Returns
+    {group: {participant: balance}}.
+    """
+    net_balances = {}
+    for group, payer, amount, participants in rows:
+        if not payer or not participants:
+            continue
+        participants = [p for p in participants.split(',') if p and ':' in p]
+        if not participants:
+            continue
+
+        share = amount / len(participants)
+        balances = net_balances.setdefault(group, {})
+        balances[payer] = balances.get(payer, 0) + amount
+        for participant in participants:
+            balances[participant] = balances.get(participant, 0) - share
+    return net_balances
+
+def fold_net_balances_numpy(rows):
+    """
+    Vectorized equivalent of fold_net_balances_python.
+    Groups, payers and participants are encoded as integer ids. Expenses of a list
+    share a handful of participant combinations, so each distinct
+    participants string is split only once into a CSR-style member table.
+    Shares, credits and debits are then computed on integer arrays and
+    summed per (group, participant) with a single weighted bincount.
+    """
+    rows = list(rows)
+    if not rows:
+        return {}
+    count = len(rows)
+    # Column access via itemgetter; zip(*rows) is much slower on large inputs
+    groups = list(map(itemgetter(0), rows))
+    payers = list(map(itemgetter(1), rows))
+    amounts = np.fromiter(map(itemgetter(2), rows), dtype=np.float64, count=count)
+    participants = list(map(itemgetter(3), rows))
+
+    names = {}
+    combo_index = {}
+    combo_members = []
+    combo_offsets = [0]
+    for combo in dict.fromkeys(participants):
+        combo_index[combo] = len(combo_index)
+        members = [p for p in combo.split(',') if p and ':' in p] if combo else []
+        combo_members.extend(names.setdefault(member, len(names)) for member in members)
+        combo_offsets.append(len(combo_members))
+    payer_index = {
+        payer: names.setdefault(payer, len(names)) if payer else -1
+        for payer in dict.fromkeys(payers)
+    }
+
+    group_list = list(dict.fromkeys(groups))
+    group_index = {group: i for i, group in enumerate(group_list)}
+
+    group_ids = np.fromiter(map(group_index.__getitem__, groups), dtype=np.int64, count=count)
+    combo_ids = np.fromiter(map(combo_index.__getitem__, participants), dtype=np.int64, count=count)
+    payer_ids = np.fromiter(map(payer_index.__getitem__, payers), dtype=np.int64, count=count)
+    combo_members = np.asarray(combo_members, dtype=np.int64)
+    combo_offsets = np.asarray(combo_offsets, dtype=np.int64)
+
+    # Expenses split only if they have a payer and at least one valid participant
+    sizes = np.diff(combo_offsets)[combo_ids]
+    splitting = np.flatnonzero((sizes > 0) & (payer_ids >= 0))
+    if not len(splitting):
+        return {}
+    split_sizes = sizes[splitting]
+    shares = amounts[splitting] / split_sizes
+
+    # Expand every splitting expense into one debit per member
+    debit_expense = np.repeat(np.arange(len(splitting)), split_sizes)
+    member_starts = np.repeat(combo_offsets[combo_ids[splitting]], split_sizes)
+    within = np.arange(len(debit_expense)) - np.repeat(np.cumsum(split_sizes) - split_sizes, split_sizes)
+    debit_members = combo_members[member_starts + within]
+
+    split_groups = group_ids[splitting]
+    keys = np.concatenate([
+        split_groups * len(names) + payer_ids[splitting],
+        split_groups[debit_expense] * len(names) + debit_members
+    ])
+    deltas = np.concatenate([amounts[splitting], -shares[debit_expense]])
+    if len(group_list) * len(names) <= DENSE_KEY_LIMIT:
+        totals = np.bincount(keys, weights=deltas, minlength=len(group_list) * len(names))
+        touched = np.bincount(keys, minlength=len(group_list) * len(names)) > 0
+        unique_keys = np.flatnonzero(touched)
+        totals = totals[unique_keys]
+    else:
+        unique_keys, key_ids = np.unique(keys, return_inverse=True)
+        totals = np.bincount(key_ids, weights=deltas)
+
+    name_list = list(names)
+    net_balances = {}
+    for key, total in zip(unique_keys.tolist(), totals.tolist()):
+        group, name_id = divmod(key, len(names))
+        net_balances.setdefault(group_list[group], {})[name_list[name_id]] = total
+    return net_balances
+
+def fold_net_balances(rows):
+    if np is None:
+        return fold_net_balances_python(rows)
+    return fold_net_balances_numpy(rows)
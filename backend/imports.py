@@ -0,0 +1,136 @@
+import csv
+import io
+import math
+from datetime import datetime
+from db import db
+from models import Expense
+from ledger import record_expense_batch
+
+# Rows inserted per executemany round trip
+IMPORT_BATCH_SIZE = 500
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+
+class ImportRowError(ValueError):
+    pass
+
+def read_import_rows(request):
+    """
+    Yield (row_number, row) pairs from a CSV or JSON import body.
+    CSV bodies are read from the request stream one line at a time and need
+    a header row; JSON bodies are an array of objects shaped like the
+    /add-expense payload. Raises ValueError if the body is neither.
+    """
+    if request.mimetype in CSV_MIMETYPES:
+        reader = csv.DictReader(io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''))
+        if not reader.fieldnames:
+            raise ValueError("CSV body must start with a header row")
+        # Row 1 is the header
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, {key.strip().lower(): value for key, value in row.items() if key}
+        return
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of expenses or a text/csv body")
+    for row_number, row in enumerate(data, start=1):
+        yield row_number, row
+
+def participant_lookup(expense_list):
+    """Map both prefixed and bare participant names of a list to the prefixed form."""
+    lookup = {}
+    for participant in (expense_list.participants or '').split(','):
+        if ':' in participant:
+            lookup[participant] = participant
+            lookup.setdefault(participant.split(':', 1)[1], participant)
+    return lookup
+
+def resolve_participant(name, lookup, kind=None):
+    name = name.strip()
+    if kind and ':' not in name:
+        name = f"{kind}:{name}"
+    if name not in lookup:
+        raise ImportRowError(f"Unknown participant: {name}")
+    return lookup[name]
+
+def validate_row(row, expense_list, lookup, username):
+    """Turn one import row into Expense column values or raise ImportRowError."""
+    if not isinstance(row, dict):
+        raise ImportRowError("Row must be an object")
+
+    payer = row.get('payer')
+    if not payer or not str(payer).strip():
+        raise ImportRowError("Missing payer")
+    payer = resolve_participant(str(payer), lookup, row.get('payerType') or row.get('payertype'))
+
+    if isinstance(row.get('amount'), bool):
+        raise ImportRowError(f"Invalid amount: {row.get('amount')}")
+    try:
+        amount = float(row.get('amount'))
+    except (TypeError, ValueError):
+        raise ImportRowError(f"Invalid amount: {row.get('amount')}")
+    if not math.isfinite(amount):
+        raise ImportRowError(f"Invalid amount: {row.get('amount')}")
+
+    participants = row.get('participants') or []
+    if isinstance(participants, str):
+        # CSV cells list participants separated by semicolons (or quoted commas)
+        participants = participants.replace(';', ',').split(',')
+    elif not isinstance(participants, list):
+        raise ImportRowError("participants must be a list of names")
+    participants = [resolve_participant(str(p), lookup) for p in participants if str(p).strip()]
+    if not participants:
+        raise ImportRowError("Missing participants")
+
+    date = row.get('date')
+    if date:
+        try:
+            date = datetime.strptime(str(date).strip(), '%Y-%m-%d')
+        except ValueError:
+            raise ImportRowError(f"Invalid date: {date}. Please use YYYY-MM-DD.")
+    else:
+        date = datetime.utcnow()
+
+    return {
+        'payer': payer,
+        'amount': amount,
+        'description': str(row.get('description') or '')[:200],
+        'category': str(row.get('category') or '')[:100],
+        'date': date,
+        'username': username,
+        'participants': ','.join(participants),
+        'list_id': expense_list.id
+    }
+
+def insert_batch(list_id, batch):
+    ids = db.session.scalars(db.insert(Expense).returning(Expense.id, sort_by_parameter_order=True), batch).all()
+    record_expense_batch(list_id, [dict(row, id=expense_id) for row, expense_id in zip(batch, ids)])
+
+def import_expenses(expense_list, username, rows):
+    """
+    Validate and insert import rows into a list within the caller's
+    transaction. Invalid rows are reported and skipped, valid ones are
+    inserted in executemany batches together with their ledger updates.
+    Returns (imported_count, imported_total, errors).
+    """
+    lookup = participant_lookup(expense_list)
+    imported = 0
+    total = 0.0
+    errors = []
+    batch = []
+
+    for row_number, row in rows:
+        try:
+            values = validate_row(row, expense_list, lookup, username)
+        except ImportRowError as e:
+            errors.append({'row': row_number, 'error': str(e)})
+            continue
+        batch.append(values)
+        imported += 1
+        total += values['amount']
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            insert_batch(expense_list.id, batch)
+            batch = []
+
+    if batch:
+        insert_batch(expense_list.id, batch)
+    return imported, total, errors
@@ -0,0 +1,44 @@
+import threading
+from abc import ABC, abstractmethod
+
+class BackgroundJob(ABC):
+    """
+    Periodic maintenance task. ensure_started() launches it once, on a
+    Socket.IO background task; it calls run_once() inside an app context
+    right away and then every interval seconds. Subclasses implement
+    run_once() and may override enabled().
+    """
+
+    name = 'background job'
+
+    def __init__(self, socketio, app, interval=3600):
+        self.socketio = socketio
+        self.app = app
+        self.interval = interval
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def enabled(self):
+        return True
+
+    def ensure_started(self):
+        if self._started or not self.enabled():
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+        self.socketio.start_background_task(self._run)
+
+    def _run(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.run_once()
+            except Exception as e:
+                print(f"Error in {self.name}: {str(e)}")
+            self.socketio.sleep(self.interval)
+
+    @abstractmethod
+    def run_once(self):
+        """One pass of the job, run inside an app context."""
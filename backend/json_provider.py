@@ -0,0 +1,31 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used without it
+    orjson = None
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that encodes with orjson when it is installed and
+    falls back to the standard library otherwise.
+    Output matches DefaultJSONProvider: keys are sorted and datetimes are
+    handed to its default() so they keep the HTTP date format. Only
+    non-ASCII characters differ, as orjson writes them as UTF-8 instead of
+    \\u escapes.
+    """
+
+    use_orjson = orjson is not None
+
+    def dumps(self, obj, **kwargs):
+        if not self.use_orjson or set(kwargs) - {'indent', 'separators'}:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if not self.use_orjson or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
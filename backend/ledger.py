@@ -0,0 +1,363 @@
+from db import db, upsert_increment
+from models import Expense, ExpenseParticipant, ListBalance, Settlement, ListClosing
+from debt_engine import fold_net_balances
+from analytics import rollup_expense, rollup_expense_batch
+from checkpoints import invalidate_checkpoints, balances_as_of, add_balances
+
+# Balances closer to zero than this are float residue from deltas that
+# cancelled out (e.g. an expense added and then deleted), not real debts.
+BALANCE_EPSILON = 1e-9
+# Expenses read per round trip when rebuilding a list's participant rows
+REBUILD_BATCH_SIZE = 5000
+
+def valid_participants(participants):
+    """Prefixed participants of an expense, from a list or a comma-joined string."""
+    if not participants:
+        return []
+    if isinstance(participants, str):
+        participants = participants.split(',')
+    return [p for p in participants if p and ':' in p]
+
+def expense_deltas(payer, amount, participants):
+    """
+    Net-balance change caused by a single expense.
+    The payer is credited the full amount and every valid (prefixed)
+    participant is debited an equal share. Expenses without a payer or
+    without valid participants do not affect balances.
+    """
+    participants = valid_participants(participants)
+    if not payer or not participants:
+        return {}
+
+    share = amount / len(participants)
+    deltas = {payer: amount}
+    for participant in participants:
+        deltas[participant] = deltas.get(participant, 0) - share
+    return deltas
+
+def apply_deltas(list_id, deltas, sign=1):
+    """
+    Add deltas to the stored balances of a list. Runs inside the caller's
+    session so the ledger commits (or rolls back) together with the expense.
+    Rows are upserted in participant order so that concurrent writers on a
+    server database lock them in the same order instead of deadlocking.
+    """
+    rows = [
+        {'list_id': list_id, 'participant': participant, 'balance': sign * delta}
+        for participant, delta in sorted(deltas.items())
+    ]
+    if rows:
+        db.session.execute(upsert_increment(ListBalance, ['list_id', 'participant'], ['balance']), rows)
+
+def participant_rows(expense_id, list_id, payer, amount, participants):
+    """expense_participants rows for one expense; empty if it does not split."""
+    participants = valid_participants(participants)
+    if not payer or not participants:
+        return []
+    share = amount / len(participants)
+    return [
+        {'expense_id': expense_id, 'list_id': list_id, 'participant': participant, 'share': share}
+        for participant in participants
+    ]
+
+def record_expense(expense):
+    """
+    Add an expense to the list ledger: its participant rows, its balance
+    deltas and its analytics rollup. Also used after an update, once the
+    previous contribution has been taken out with unrecord_expense.
+    """
+    if expense.id is None:
+        db.session.flush()
+    ExpenseParticipant.query.filter_by(expense_id=expense.id).delete(synchronize_session=False)
+    rows = participant_rows(expense.id, expense.list_id, expense.payer, expense.amount, expense.participants)
+    if rows:
+        db.session.execute(db.insert(ExpenseParticipant), rows)
+    apply_deltas(expense.list_id, expense_deltas(expense.payer, expense.amount, expense.participants))
+    rollup_expense(expense)
+    invalidate_checkpoints(expense.list_id, expense.date)
+
+def record_expense_batch(list_id, expenses):
+    """
+    Ledger bookkeeping for expenses inserted in bulk: one executemany for
+    all their participant rows and a single summed delta per participant.
+    expenses are dicts with id, payer, amount, participants, date and category.
+    """
+    rows = []
+    deltas = {}
+    for expense in expenses:
+        rows.extend(participant_rows(expense['id'], list_id, expense['payer'], expense['amount'], expense['participants']))
+        for participant, delta in expense_deltas(expense['payer'], expense['amount'], expense['participants']).items():
+            deltas[participant] = deltas.get(participant, 0) + delta
+    if rows:
+        db.session.execute(db.insert(ExpenseParticipant), rows)
+    apply_deltas(list_id, deltas)
+    rollup_expense_batch(list_id, expenses)
+    dates = [expense['date'] for expense in expenses]
+    invalidate_checkpoints(list_id, None if None in dates else min(dates, default=None))
+
+def record_expense_changes(list_id, removed, added):
+    """
+    Ledger bookkeeping for a batch of changes to a list's expenses: the
+    contributions of removed are taken out and those of added put in, with
+    one delete and one executemany for the participant rows, a single
+    summed delta per participant and one rollup update per key. Both are
+    dicts of column values with an id; an updated expense is in both, with
+    its old and its new values.
+    """
+    removed_ids = [expense['id'] for expense in removed]
+    if removed_ids:
+        ExpenseParticipant.query.filter(
+            ExpenseParticipant.expense_id.in_(removed_ids)
+        ).delete(synchronize_session=False)
+    rows = []
+    deltas = {}
+    for expenses, sign in ((removed, -1), (added, 1)):
+        for expense in expenses:
+            for participant, delta in expense_deltas(expense['payer'], expense['amount'], expense['participants']).items():
+                deltas[participant] = deltas.get(participant, 0) + sign * delta
+    for expense in added:
+        rows.extend(participant_rows(expense['id'], list_id, expense['payer'], expense['amount'], expense['participants']))
+    if rows:
+        db.session.execute(db.insert(ExpenseParticipant), rows)
+    apply_deltas(list_id, deltas)
+    rollup_expense_batch(list_id, removed, sign=-1)
+    rollup_expense_batch(list_id, added)
+    dates = [expense['date'] for expense in removed + added]
+    if dates:
+        invalidate_checkpoints(list_id, None if None in dates else min(dates))
+
+def unrecord_expense(expense):
+    ExpenseParticipant.query.filter_by(expense_id=expense.id).delete(synchronize_session=False)
+    apply_deltas(expense.list_id, expense_deltas(expense.payer, expense.amount, expense.participants), sign=-1)
+    rollup_expense(expense, sign=-1)
+    invalidate_checkpoints(expense.list_id, expense.date)
+
+def settlement_deltas(from_participant, to_participant, amount):
+    """A settlement credits the payer and debits the receiver, like an expense with one participant."""
+    return expense_deltas(from_participant, amount, [to_participant])
+
+def record_settlement(settlement, sign=1):
+    """Add a settlement payment to the list balances, or take it out with sign=-1."""
+    apply_deltas(
+        settlement.list_id,
+        settlement_deltas(settlement.from_participant, settlement.to_participant, settlement.amount),
+        sign=sign
+    )
+    invalidate_checkpoints(settlement.list_id, settlement.date)
+
+def unrecord_settlement(settlement):
+    record_settlement(settlement, sign=-1)
+
+def latest_closings(list_ids):
+    """{list_id: ListClosing} with the most recent settle-all of each list that has one."""
+    closings = {}
+    for closing in ListClosing.query.filter(ListClosing.list_id.in_(list_ids)).order_by(ListClosing.list_id, ListClosing.id):
+        closings[closing.list_id] = closing
+    return closings
+
+def get_net_balances(list_ids):
+    """
+    Net balance per participant summed over the given lists.
+    list_ids may be a list of ids or a subquery selecting them.
+    """
+    rows = db.session.query(
+        ListBalance.participant,
+        db.func.sum(ListBalance.balance)
+    ).filter(
+        ListBalance.list_id.in_(list_ids)
+    ).group_by(ListBalance.participant)
+
+    return {
+        participant: balance
+        for participant, balance in rows
+        if abs(balance) > BALANCE_EPSILON
+    }
+
+def get_net_balances_as_of(list_ids, as_of):
+    """Net balance per participant over the expenses dated before as_of, summed over the given lists."""
+    totals = {}
+    for list_id in list_ids:
+        for participant, balance in balances_as_of(list_id, as_of).items():
+            totals[participant] = totals.get(participant, 0) + balance
+    return {
+        participant: balance
+        for participant, balance in totals.items()
+        if abs(balance) > BALANCE_EPSILON
+    }
+
+def settle_debts(net_balances):
+    """
+    Turn net balances into a {debtor: {creditor: amount}} mapping by
+    repeatedly matching the largest debtor with the largest creditor.
+    """
+    debts = {}
+
+    # Convert net balances to list and sort
+    sorted_participants = sorted(net_balances.items(), key=lambda x: x[1])
+
+    i = 0  # index for debtors (negative balance)
+    j = len(sorted_participants) - 1  # index for creditors (positive balance)
+
+    while i < j:
+        debtor = sorted_participants[i]
+        creditor = sorted_participants[j]
+
+        if debtor[1] >= 0:  # No longer a debtor
+            i += 1
+            continue
+
+        if creditor[1] <= 0:  # No longer a creditor
+            j -= 1
+            continue
+
+        # Calculate the debt amount
+        debt_amount = min(abs(debtor[1]), creditor[1])
+
+        # Add the debt to the result; sub-cent residue is not a payment
+        if round(debt_amount, 2) > 0:
+            if debtor[0] not in debts:
+                debts[debtor[0]] = {}
+            debts[debtor[0]][creditor[0]] = round(debt_amount, 2)
+
+        # Update balances
+        sorted_participants[i] = (debtor[0], debtor[1] + debt_amount)
+        sorted_participants[j] = (creditor[0], creditor[1] - debt_amount)
+
+        # Move indices if balances are settled
+        if abs(sorted_participants[i][1]) < 0.01:
+            i += 1
+        if abs(sorted_participants[j][1]) < 0.01:
+            j -= 1
+
+    return debts
+
+def aggregate_net_balances(list_ids):
+    """
+    Net balance per (list, participant) of the open expenses, those not
+    closed by a settle-all, computed inside the database from
+    expense_participants: payers are credited the shares of their expenses
+    and participants debited theirs, summed in a single GROUP BY.
+    This is the slow path the ledger replaces; it is only used to rebuild
+    the stored balances.
+    """
+    open_expenses = db.and_(
+        ExpenseParticipant.list_id.in_(list_ids),
+        Expense.closing_id.is_(None)
+    )
+    debits = db.select(
+        ExpenseParticipant.list_id,
+        ExpenseParticipant.participant,
+        (-ExpenseParticipant.share).label('delta')
+    ).join(
+        Expense, Expense.id == ExpenseParticipant.expense_id
+    ).where(open_expenses)
+    credits = db.select(
+        ExpenseParticipant.list_id,
+        Expense.payer,
+        ExpenseParticipant.share
+    ).join(
+        Expense, Expense.id == ExpenseParticipant.expense_id
+    ).where(open_expenses)
+    movements = db.union_all(debits, credits).subquery()
+
+    rows = db.session.execute(
+        db.select(
+            movements.c.list_id,
+            movements.c.participant,
+            db.func.sum(movements.c.delta)
+        ).group_by(movements.c.list_id, movements.c.participant)
+    )
+    net_balances = {}
+    for list_id, participant, balance in rows:
+        net_balances.setdefault(list_id, {})[participant] = balance
+    return net_balances
+
+def open_settlement_rows(list_ids):
+    """Open settlements as (list_id, payer, amount, participants) rows for fold_net_balances."""
+    return db.session.query(
+        Settlement.list_id, Settlement.from_participant, Settlement.amount, Settlement.to_participant
+    ).filter(Settlement.list_id.in_(list_ids), Settlement.closing_id.is_(None)).all()
+
+def recompute_net_balances(list_id):
+    """
+    Balances of a list from its latest settle-all snapshot plus the open
+    period: the expenses and settlements recorded since. Closed history is
+    not read again.
+    """
+    closing = latest_closings([list_id]).get(list_id)
+    balances = dict(closing.balances) if closing else {}
+    balances = add_balances(balances, aggregate_net_balances([list_id]).get(list_id, {}))
+    return add_balances(balances, fold_net_balances(open_settlement_rows([list_id])).get(list_id, {}))
+
+def rebuild_expense_participants(list_id):
+    """
+    Re-derive the expense_participants rows of a list from
+    Expense.participants, reading the expenses and inserting their rows in
+    batches so memory use does not grow with the size of the list.
+    """
+    ExpenseParticipant.query.filter_by(list_id=list_id).delete(synchronize_session=False)
+    expenses = db.session.query(
+        Expense.id, Expense.payer, Expense.amount, Expense.participants
+    ).filter(Expense.list_id == list_id).order_by(Expense.id)
+
+    last_id = None
+    while True:
+        page = expenses.filter(Expense.id > last_id) if last_id is not None else expenses
+        batch = page.limit(REBUILD_BATCH_SIZE).all()
+        rows = []
+        for expense_id, payer, amount, participants in batch:
+            rows.extend(participant_rows(expense_id, list_id, payer, amount, participants))
+        if rows:
+            db.session.execute(db.insert(ExpenseParticipant), rows)
+        if len(batch) < REBUILD_BATCH_SIZE:
+            break
+        last_id = batch[-1].id
+
+def ledger_list_ids():
+    """Ids of every list that has expenses or stored balances."""
+    expense_lists = {list_id for (list_id,) in db.session.query(Expense.list_id).distinct()}
+    balance_lists = {list_id for (list_id,) in db.session.query(ListBalance.list_id).distinct()}
+    return sorted(expense_lists | balance_lists)
+
+def rebuild_list_balances(list_id):
+    """Replace the participant rows and stored balances of a list with a full recomputation."""
+    rebuild_expense_participants(list_id)
+    # Checkpoints were built from the rows being replaced
+    invalidate_checkpoints(list_id)
+    ListBalance.query.filter_by(list_id=list_id).delete()
+    for participant, balance in recompute_net_balances(list_id).items():
+        db.session.add(ListBalance(list_id=list_id, participant=participant, balance=balance))
+    db.session.flush()
+
+def verify_balances(list_ids, tolerance=0.01):
+    """
+    Compare stored balances against a fold of the raw expense history of
+    the given lists since their latest settle-all, added to its snapshot.
+    The fold reads Expense.participants directly, so drift in either
+    list_balances or expense_participants is detected.
+    Returns {list_id: {participant: (stored, expected)}} for every list
+    with a participant that drifted by more than the tolerance; an empty
+    dict means the ledger is consistent.
+    """
+    stored = {}
+    for list_id, participant, balance in db.session.query(
+        ListBalance.list_id, ListBalance.participant, ListBalance.balance
+    ).filter(ListBalance.list_id.in_(list_ids)):
+        stored.setdefault(list_id, {})[participant] = balance
+
+    expected = fold_net_balances(db.session.query(
+        Expense.list_id, Expense.payer, Expense.amount, Expense.participants
+    ).filter(Expense.list_id.in_(list_ids), Expense.closing_id.is_(None)).all() + open_settlement_rows(list_ids))
+    for list_id, closing in latest_closings(list_ids).items():
+        expected[list_id] = add_balances(closing.balances, expected.get(list_id, {}))
+
+    drift = {}
+    for list_id in list_ids:
+        stored_balances = stored.get(list_id, {})
+        expected_balances = expected.get(list_id, {})
+        for participant in set(stored_balances) | set(expected_balances):
+            stored_balance = stored_balances.get(participant, 0)
+            expected_balance = expected_balances.get(participant, 0)
+            if abs(stored_balance - expected_balance) > tolerance:
+                drift.setdefault(list_id, {})[participant] = (stored_balance, expected_balance)
+    return drift
@@ -0,0 +1,159 @@
+from datetime import datetime
+from sqlalchemy.exc import SQLAlchemyError
+from db import db
+from jobs import BackgroundJob
+from models import (
+    Expense, ExpenseList, ExpenseParticipant, Settlement, ListClosing, ListBalance, ExpenseRollup,
+    BalanceCheckpoint, ChangelogSegment, Changelog, DeletedExpense, Category, ListShareRequest,
+    ListDeletionRequest, ListDeletionApproval, ListParticipant, ListTombstone
+)
+from debt_cache import bump_list_version
+
+# Tables holding rows of a list, each before the tables its rows reference,
+# so every delete satisfies the foreign keys whether or not they cascade
+LIST_ROWS = (
+    ExpenseParticipant, Expense, Settlement, ListClosing, ListBalance, ExpenseRollup,
+    BalanceCheckpoint, ChangelogSegment, Changelog, DeletedExpense, Category,
+    ListShareRequest, ListDeletionApproval, ListDeletionRequest, ListParticipant
+)
+
+def list_criterion(model, list_id):
+    if model is ListDeletionApproval:
+        return ListDeletionApproval.request_id.in_(
+            db.select(ListDeletionRequest.id).where(ListDeletionRequest.list_id == list_id)
+        )
+    return model.list_id == list_id
+
+def delete_rows(model, list_id, limit=None):
+    """Delete the list's rows of one table, at most limit of them; returns how many went."""
+    criterion = list_criterion(model, list_id)
+    if limit:
+        criterion = model.id.in_(db.select(model.id).where(criterion).limit(limit))
+    result = db.session.execute(
+        db.delete(model).where(criterion),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+def count_list_rows(list_id):
+    return sum(
+        db.session.query(db.func.count(model.id)).filter(list_criterion(model, list_id)).scalar()
+        for model in LIST_ROWS
+    )
+
+def exceeds_threshold(list_id, threshold):
+    """
+    Whether the list has more than threshold rows across LIST_ROWS, so a
+    list with few expenses but a long changelog or a full trash counts as
+    large too. Each table is counted no further than the rows still left
+    under the threshold.
+    """
+    remaining = threshold
+    for model in LIST_ROWS:
+        remaining -= db.session.query(model.id).filter(list_criterion(model, list_id)).limit(remaining + 1).count()
+        if remaining < 0:
+            return True
+    return False
+
+def delete_list_rows(list_id):
+    """Set-based delete of a list and everything in it, one statement per table, in the caller's transaction."""
+    for model in LIST_ROWS:
+        delete_rows(model, list_id)
+    db.session.execute(
+        db.delete(ExpenseList).where(ExpenseList.id == list_id),
+        execution_options={'synchronize_session': False}
+    )
+
+def tombstone_list(expense_list, username=None):
+    """
+    Hide a list right away and leave its rows to the reclaimer. Removing
+    the participant rows and share requests takes the list out of every
+    member's access; the rest is reclaimed in chunks. Runs in the
+    caller's session and returns the tombstone.
+    """
+    expense_list.deleted_at = datetime.utcnow()
+    bump_list_version(expense_list.id)
+    for model in (ListParticipant, ListShareRequest):
+        delete_rows(model, expense_list.id)
+    tombstone = ListTombstone(list_id=expense_list.id, list_name=expense_list.name, requested_by=username)
+    db.session.add(tombstone)
+    return tombstone
+
+class ListReclaimer(BackgroundJob):
+    """
+    Deletes the rows of tombstoned lists in chunks of chunk_size, each in
+    its own transaction so writers are never locked out for long, and
+    records progress on the tombstone. The list row itself goes last,
+    together with anything written to the list while it was reclaimed.
+    """
+
+    name = 'list reclaim'
+
+    def __init__(self, socketio, app, archives=(), chunk_size=1000, interval=60):
+        super().__init__(socketio, app, interval)
+        self.archives = archives
+        self.chunk_size = chunk_size
+        self.runs = 0
+        self.reclaimed = 0
+        self.deleted = 0
+        self.last_run_at = None
+
+    def enabled(self):
+        return self.interval > 0
+
+    def run_once(self):
+        self.reclaim_all()
+
+    def reclaim_all(self):
+        """Reclaim every pending tombstone; returns how many lists were finished."""
+        finished = 0
+        tombstones = ListTombstone.query.filter(
+            ListTombstone.completed_at.is_(None)
+        ).order_by(ListTombstone.requested_at, ListTombstone.id).all()
+        for tombstone in tombstones:
+            try:
+                self.reclaim(tombstone)
+                finished += 1
+            except SQLAlchemyError as e:
+                # Chunks already committed stay deleted; the next run resumes
+                db.session.rollback()
+                print(f"Error reclaiming list {tombstone.list_id}: {str(e)}")
+        self.runs += 1
+        self.last_run_at = datetime.utcnow()
+        return finished
+
+    def reclaim(self, tombstone):
+        list_id = tombstone.list_id
+        if tombstone.total_rows is None:
+            tombstone.total_rows = count_list_rows(list_id)
+            db.session.commit()
+        for model in LIST_ROWS:
+            while True:
+                deleted = delete_rows(model, list_id, self.chunk_size)
+                tombstone.deleted_rows += deleted
+                db.session.commit()
+                self.deleted += deleted
+                if deleted < self.chunk_size:
+                    break
+                # Let request handlers run between chunks
+                self.socketio.sleep(0)
+        delete_list_rows(list_id)
+        tombstone.completed_at = datetime.utcnow()
+        db.session.commit()
+        for archive in self.archives:
+            archive.remove_list(list_id)
+        self.reclaimed += 1
+
+    def pending(self):
+        return ListTombstone.query.filter(ListTombstone.completed_at.is_(None)).count()
+
+    def stats(self):
+        return {
+            'chunk_size': self.chunk_size,
+            'interval': self.interval,
+            'runs': self.runs,
+            'reclaimed': self.reclaimed,
+            'deleted_rows': self.deleted,
+            'pending': self.pending(),
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None
+        }
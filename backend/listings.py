@@ -0,0 +1,70 @@
+from db import db
+from models import Expense, DeletedExpense, Changelog, parse_participants
+
+# Read-only listings select plain column tuples instead of ORM instances:
+# no identity map, no change tracking and no per-row attribute
+# instrumentation. The serializers produce the same dicts as as_dict().
+
+EXPENSE_COLUMNS = (
+    Expense.id, Expense.payer, Expense.amount, Expense.description, Expense.category,
+    Expense.date, Expense.participants, Expense.list_id, Expense.username, Expense.closing_id
+)
+
+DELETED_EXPENSE_COLUMNS = (
+    DeletedExpense.id, DeletedExpense.original_id, DeletedExpense.payer, DeletedExpense.amount,
+    DeletedExpense.description, DeletedExpense.category, DeletedExpense.date,
+    DeletedExpense.deleted_at, DeletedExpense.participants
+)
+
+CHANGELOG_COLUMNS = (Changelog.id, Changelog.action, Changelog.timestamp, Changelog.username)
+
+def format_date(value):
+    # date().isoformat() is the '%Y-%m-%d' of as_dict() without strftime's format parsing
+    return value.date().isoformat()
+
+def expense_rows(*criteria):
+    return db.session.query(*EXPENSE_COLUMNS).filter(*criteria)
+
+def deleted_expense_rows(*criteria):
+    return db.session.query(*DELETED_EXPENSE_COLUMNS).filter(*criteria)
+
+def changelog_rows(*criteria):
+    return db.session.query(*CHANGELOG_COLUMNS).filter(*criteria)
+
+def serialize_expense_row(row):
+    expense_id, payer, amount, description, category, date, participants, list_id, username, closing_id = row
+    return {
+        'id': expense_id,
+        'payer': payer,
+        'amount': amount,
+        'description': description,
+        'category': category,
+        'date': format_date(date),
+        'participants': list(parse_participants(participants)),
+        'list_id': list_id,
+        'username': username,
+        'closing_id': closing_id
+    }
+
+def serialize_deleted_expense_row(row):
+    expense_id, original_id, payer, amount, description, category, date, deleted_at, participants = row
+    return {
+        'id': expense_id,
+        'original_id': original_id,
+        'payer': payer,
+        'amount': amount,
+        'description': description,
+        'category': category,
+        'date': format_date(date),
+        'deleted_at': deleted_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'participants': list(parse_participants(participants))
+    }
+
+def serialize_changelog_row(row):
+    entry_id, action, timestamp, username = row
+    return {
+        'id': entry_id,
+        'action': action,
+        'timestamp': timestamp,
+        'username': username
+    }
@@ -0,0 +1,98 @@
+import threading
+from collections import OrderedDict
+from db import db
+from models import ExpenseList, ListParticipant
+
+def accessible_list_ids(username):
+    """
+    Select the ids of lists created by or shared with the user.
+    Written as a UNION rather than an OR so that both branches can use
+    their indexes instead of scanning expense_lists. Tombstoned lists are
+    left out; tombstoning also removes their participant rows.
+    """
+    return db.union(
+        db.select(ExpenseList.id).where(ExpenseList.created_by == username, ExpenseList.deleted_at.is_(None)),
+        db.select(ListParticipant.list_id).where(ListParticipant.username == username)
+    )
+
+class MembershipIndex:
+    """
+    In-process index of user -> accessible list ids, with the reverse
+    list -> cached users so that a list's invalidation drops exactly the
+    entries that include it. Entries are loaded from the database on first
+    use and dropped by the endpoints that change membership, after their
+    commit: creating a list, accepting a share request, removing a user
+    and deleting a list. Unlike the debt cache it is not keyed by version,
+    so every process serving requests only sees its own invalidations.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lists_by_user = OrderedDict()
+        self._users_by_list = {}
+        # Bumped by every invalidation; a load that overlapped one is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def lists_for(self, username):
+        """Ids of the lists the user created or was shared."""
+        with self._lock:
+            if username in self._lists_by_user:
+                self._lists_by_user.move_to_end(username)
+                self.hits += 1
+                return self._lists_by_user[username]
+            self.misses += 1
+            generation = self._generation
+
+        list_ids = frozenset(db.session.execute(accessible_list_ids(username)).scalars())
+        with self._lock:
+            if generation == self._generation:
+                self._drop_user(username)
+                self._lists_by_user[username] = list_ids
+                for list_id in list_ids:
+                    self._users_by_list.setdefault(list_id, set()).add(username)
+                while len(self._lists_by_user) > self.maxsize:
+                    self._drop_user(next(iter(self._lists_by_user)))
+        return list_ids
+
+    def _drop_user(self, username):
+        """Remove a user's entry and its reverse links; the lock must be held."""
+        for list_id in self._lists_by_user.pop(username, ()):
+            users = self._users_by_list[list_id]
+            users.discard(username)
+            if not users:
+                del self._users_by_list[list_id]
+
+    def invalidate_user(self, username):
+        with self._lock:
+            self._generation += 1
+            self._drop_user(username)
+
+    def invalidate_list(self, list_id):
+        """
+        Drop every cached user entry that includes the list. Users gaining
+        access to it are not in the reverse index yet; callers invalidate
+        them with invalidate_user.
+        """
+        with self._lock:
+            self._generation += 1
+            for username in list(self._users_by_list.get(int(list_id), ())):
+                self._drop_user(username)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._lists_by_user.clear()
+            self._users_by_list.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'users': len(self._lists_by_user),
+                'lists': len(self._users_by_list),
+                'maxsize': self.maxsize
+            }
@@ -0,0 +1,210 @@
+import threading
+import time
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+# Statements kept per request for the slow-request log
+MAX_LOGGED_STATEMENTS = 50
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.type = 'counter'
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self.type = 'histogram'
+        # label values -> [per-bucket counts, sum, count]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + (('le', format_value(bound)),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+class CallbackMetric:
+    """Single-sample metric read from a callable at scrape time, e.g. a cache size."""
+
+    def __init__(self, name, documentation, read, type='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.read = read
+
+    def samples(self):
+        yield self.name, (), self.read()
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{format_labels(labels)} {format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ('method', 'route')
+))
+REQUESTS = registry.register(Counter(
+    'http_requests_total', 'Requests by route and status code.', ('method', 'route', 'status')
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    'http_request_db_queries', 'SQL statements executed per request.', ('method', 'route'),
+    buckets=QUERY_COUNT_BUCKETS
+))
+DB_QUERIES = registry.register(Counter(
+    'db_queries_total', 'SQL statements executed, by route or "background".', ('route',)
+))
+DB_TIME = registry.register(Counter(
+    'db_query_duration_seconds_total', 'Time spent executing SQL, by route or "background".', ('route',)
+))
+SLOW_REQUESTS = registry.register(Counter(
+    'http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS.', ('method', 'route')
+))
+SOCKET_EMITS = registry.register(Counter(
+    'socketio_emits_total', 'Socket.IO events emitted.', ('event',)
+))
+DEBT_RECOMPUTATIONS = registry.register(Counter(
+    'debt_recomputations_total', 'Debt settlements computed on a cache miss.', ('scope',)
+))
+
+def current_route():
+    if not has_request_context():
+        return 'background'
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+def init_metrics(app, db, slow_request_ms=0):
+    """
+    Install request hooks and SQL listeners that feed the registry.
+    Requests slower than slow_request_ms (0 disables the log) are printed
+    together with the SQL statements they executed.
+    """
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started_at = time.perf_counter()
+        g.metrics_queries = 0
+        g.metrics_db_time = 0.0
+        g.metrics_statements = []
+
+    @app.after_request
+    def record_request(response):
+        started_at = g.pop('metrics_started_at', None)
+        if started_at is None:
+            return response
+        elapsed = time.perf_counter() - started_at
+        method = request.method
+        route = current_route()
+        queries = g.get('metrics_queries', 0)
+
+        REQUEST_LATENCY.observe(elapsed, method=method, route=route)
+        REQUESTS.inc(method=method, route=route, status=response.status_code)
+        REQUEST_QUERIES.observe(queries, method=method, route=route)
+
+        if slow_request_ms and elapsed * 1000 >= slow_request_ms:
+            SLOW_REQUESTS.inc(method=method, route=route)
+            statements = g.get('metrics_statements', [])
+            print(
+                f"Slow request: {method} {request.full_path} took {elapsed * 1000:.1f}ms "
+                f"({queries} queries, {g.get('metrics_db_time', 0.0) * 1000:.1f}ms in the database)"
+            )
+            for statement, duration in statements:
+                print(f"  {duration * 1000:8.2f}ms  {' '.join(statement.split())}")
+            if queries > len(statements):
+                print(f"  ... {queries - len(statements)} more statements")
+        return response
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_started_at', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('metrics_query_started_at')
+        if not started:
+            return
+        duration = time.perf_counter() - started.pop()
+        route = current_route()
+        DB_QUERIES.inc(route=route)
+        DB_TIME.inc(duration, route=route)
+        if route != 'background' and 'metrics_queries' in g:
+            g.metrics_queries += 1
+            g.metrics_db_time += duration
+            if slow_request_ms and len(g.metrics_statements) < MAX_LOGGED_STATEMENTS:
+                g.metrics_statements.append((statement, duration))
+
+    def handle_error(exception_context):
+        # Failed statements never reach after_cursor_execute
+        conn = exception_context.connection
+        started = conn.info.get('metrics_query_started_at') if conn is not None else None
+        if started:
+            started.pop()
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(db.engine, 'handle_error', handle_error)
@@ -0,0 +1,143 @@
+from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.schema import AddConstraint
+from db import db
+from ledger import ledger_list_ids, rebuild_expense_participants, rebuild_list_balances
+from analytics import rebuild_list_rollups
+from search import rebuild_search_index
+from list_deletion import LIST_ROWS
+from models import ExpenseList, ListDeletionApproval, ListDeletionRequest
+
+# db.create_all() only creates missing tables. Anything that has to change
+# existing tables or backfill derived data is registered here and applied
+# once, in order; applied ids are recorded in the schema_migrations table.
+MIGRATIONS = []
+
+# Columns the models declare on tables older than this registry. Backfills
+# go through the models, so these are added before any migration runs, not
+# just by the migration that introduced them.
+ADDED_COLUMNS = (
+    ('expense_lists', 'version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('expenses', 'closing_id', 'INTEGER REFERENCES list_closings (id)'),
+    ('expense_lists', 'deleted_at', 'TIMESTAMP'),
+)
+
+def migration(migration_id):
+    def register(func):
+        MIGRATIONS.append((migration_id, func))
+        return func
+    return register
+
+def add_missing_columns():
+    inspector = db.inspect(db.session.connection())
+    for table, column, definition in ADDED_COLUMNS:
+        if column not in {existing['name'] for existing in inspector.get_columns(table)}:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {definition}'))
+            inspector.clear_cache()
+
+@migration('0001_backfill_list_balances')
+def backfill_list_balances():
+    for list_id in ledger_list_ids():
+        rebuild_list_balances(list_id)
+
+@migration('0002_backfill_expense_participants')
+def backfill_expense_participants():
+    # The stored balances are already right; only the per-participant
+    # shares they are rebuilt from are new
+    for list_id in ledger_list_ids():
+        rebuild_expense_participants(list_id)
+
+@migration('0003_create_hot_path_indexes')
+def create_hot_path_indexes():
+    # Indexes declared on the models are only created together with new
+    # tables, so add any that existing tables are missing
+    connection = db.session.connection()
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+@migration('0004_add_expense_list_version')
+def add_expense_list_version():
+    add_missing_columns()
+
+@migration('0005_backfill_expense_rollups')
+def backfill_expense_rollups():
+    for list_id in ledger_list_ids():
+        rebuild_list_rollups(list_id)
+
+@migration('0006_trash_listing_indexes')
+def create_trash_listing_indexes():
+    # ix_deleted_expense_username_list_deleted covers the old index's columns
+    db.session.execute(text('DROP INDEX IF EXISTS ix_deleted_expense_username_list'))
+    create_hot_path_indexes()
+
+@migration('0007_changelog_archival_index')
+def create_changelog_archival_index():
+    create_hot_path_indexes()
+
+@migration('0008_add_expense_closing_id')
+def add_expense_closing_id():
+    add_missing_columns()
+    create_hot_path_indexes()
+
+@migration('0009_list_deletion_cascades')
+def add_list_deletion_cascades():
+    add_missing_columns()
+    inspector = db.inspect(db.session.connection())
+    # Give existing foreign keys the ON DELETE action the models declare.
+    # SQLite cannot alter a constraint without rebuilding its table; list
+    # deletion removes every dependent row itself, so it does not need them.
+    if db.session.get_bind().dialect.name == 'postgresql':
+        for table in db.metadata.sorted_tables:
+            reflected = inspector.get_foreign_keys(table.name)
+            for constraint in table.foreign_key_constraints:
+                existing = next((fk for fk in reflected if fk['constrained_columns'] == list(constraint.column_keys)), None)
+                if constraint.ondelete is None or existing is None or existing['options'].get('ondelete') == constraint.ondelete:
+                    continue
+                db.session.execute(text(f'ALTER TABLE {table.name} DROP CONSTRAINT {existing["name"]}'))
+                db.session.execute(AddConstraint(constraint))
+    create_hot_path_indexes()
+
+@migration('0010_expense_search_index')
+def create_expense_search_index():
+    rebuild_search_index()
+
+@migration('0011_delete_orphaned_list_rows')
+def delete_orphaned_list_rows():
+    # Before list deletion removed every dependent row, deleting a list
+    # left its changelog, categories, trash and share requests behind. SQLite
+    # hands the highest expense_lists id out again, so a new list would
+    # inherit them. Rows without a list_id at all are not orphans.
+    lists = db.select(ExpenseList.id)
+    for model in LIST_ROWS:
+        if model is ListDeletionApproval:
+            criterion = ListDeletionApproval.request_id.not_in(
+                db.select(ListDeletionRequest.id).where(ListDeletionRequest.list_id.in_(lists))
+            )
+        else:
+            criterion = model.list_id.not_in(lists)
+        db.session.execute(db.delete(model).where(criterion), execution_options={'synchronize_session': False})
+
+def run_migrations():
+    db.session.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'id VARCHAR(100) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)'
+    ))
+    add_missing_columns()
+    db.session.commit()
+    applied = {row[0] for row in db.session.execute(text('SELECT id FROM schema_migrations'))}
+
+    for migration_id, func in MIGRATIONS:
+        if migration_id in applied:
+            continue
+        try:
+            func()
+            db.session.execute(
+                text('INSERT INTO schema_migrations (id, applied_at) VALUES (:id, :applied_at)'),
+                {'id': migration_id, 'applied_at': datetime.utcnow()}
+            )
+            db.session.commit()
+            print(f"Applied migration {migration_id}")
+        except Exception:
+            db.session.rollback()
+            raise
@@ -1,10 +1,32 @@
 from db import db
 from datetime import datetime
+from functools import lru_cache
 from flask import Flask, request, jsonify
 from sqlalchemy.exc import SQLAlchemyError
 
 app = Flask(__name__)
 
+@lru_cache(maxsize=4096)
+def parse_participants(participants):
+    """
+    Split a comma-joined participants column into a tuple. The same strings
+    repeat across many rows (most expenses of a list are split between the
+    same people), so parsed results are memoized.
+    """
+    return tuple(participants.split(',')) if participants else ()
+
+@lru_cache(maxsize=1024)
+def parse_list_participants(participants):
+    """(registered names, non-registered names) of a list's participants column."""
+    registered = []
+    non_registered = []
+    for participant in parse_participants(participants):
+        if participant.startswith('registered:'):
+            registered.append(participant.split(':')[1])
+        elif participant.startswith('nonRegistered:'):
+            non_registered.append(participant.split(':')[1])
+    return tuple(registered), tuple(non_registered)
+
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -22,9 +44,19 @@ class Expense(db.Model):
     username = db.Column(db.String(150), db.ForeignKey('users.username', ondelete='CASCADE'), nullable=False)
     participants = db.Column(db.String(500))
     list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    # Set by a settle-all; closed expenses are history and no longer change
+    closing_id = db.Column(db.Integer, db.ForeignKey('list_closings.id'), nullable=True)
 
     user = db.relationship('User', backref='expenses')
 
+    __table_args__ = (
+        db.Index('ix_expenses_list_date', 'list_id', 'date'),
+        db.Index('ix_expenses_date', 'date'),
+        db.Index('ix_expenses_list_amount', 'list_id', 'amount'),
+        # Serves the open period of a list, newest first
+        db.Index('ix_expenses_list_closing_date', 'list_id', 'closing_id', 'date'),
+    )
+
     def as_dict(self):
         return {
             'id': self.id,
@@ -33,15 +65,29 @@ class Expense(db.Model):
             'description': self.description,
             'category': self.category,
             'date': self.date.strftime('%Y-%m-%d'),
-            'participants': self.participants.split(',') if self.participants else [],
+            'participants': list(parse_participants(self.participants)),
             'list_id': self.list_id,
-            'username': self.username
+            'username': self.username,
+            'closing_id': self.closing_id
         }
 
+class ExpenseParticipant(db.Model):
+    __tablename__ = 'expense_participants'
+    id = db.Column(db.Integer, primary_key=True)
+    expense_id = db.Column(db.Integer, db.ForeignKey('expenses.id', ondelete='CASCADE'), nullable=False)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    participant = db.Column(db.String(150), nullable=False)
+    share = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_expense_participants_list_participant', 'list_id', 'participant'),
+        db.Index('ix_expense_participants_expense', 'expense_id'),
+    )
+
 class Payer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    username = db.Column(db.String(150), nullable=False)
+    username = db.Column(db.String(150), nullable=False, index=True)
 
     def as_dict(self):
         return {
@@ -53,7 +99,11 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     username = db.Column(db.String(150), nullable=False)
-    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id'))
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'))
+
+    __table_args__ = (
+        db.Index('ix_category_username_list', 'username', 'list_id'),
+    )
 
     def as_dict(self):
         return {
@@ -72,7 +122,17 @@ class DeletedExpense(db.Model):
     username = db.Column(db.String(150), nullable=False)
     deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
     participants = db.Column(db.String(500))
-    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id'))
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'))
+
+    __table_args__ = (
+        # Serve /trash newest first, with and without the list filter
+        db.Index('ix_deleted_expense_username_list_deleted', 'username', 'list_id', 'deleted_at'),
+        db.Index('ix_deleted_expense_username_deleted', 'username', 'deleted_at'),
+        # Lets a list deletion find the list's trash without a scan
+        db.Index('ix_deleted_expense_list', 'list_id'),
+        # Finds expired rows for the trash purge job
+        db.Index('ix_deleted_expense_deleted_at', 'deleted_at'),
+    )
 
     def as_dict(self):
         return {
@@ -84,7 +144,7 @@ class DeletedExpense(db.Model):
             'category': self.category,
             'date': self.date.strftime('%Y-%m-%d'),
             'deleted_at': self.deleted_at.strftime('%Y-%m-%d %H:%M:%S'),
-            'participants': self.participants.split(',') if self.participants else [],
+            'participants': list(parse_participants(self.participants)),
             'list_id': self.list_id
         }
     
@@ -92,27 +152,24 @@ class ExpenseList(db.Model):
     __tablename__ = 'expense_lists'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    created_by = db.Column(db.String(50), db.ForeignKey('users.username'), nullable=False)
+    created_by = db.Column(db.String(50), db.ForeignKey('users.username'), nullable=False, index=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     participants = db.Column(db.String(500))
+    # Bumped by every mutation of the list or its expenses
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set when a large list is tombstoned; its rows are reclaimed in the background
+    deleted_at = db.Column(db.DateTime, nullable=True)
     registered_participants = db.relationship('ListParticipant', backref='list', lazy=True)
 
     def as_dict(self):
-        registered_participants = [
-            username for username in 
-            self.participants.split(',') if username.startswith('registered:')
-        ]
-        non_registered_participants = [
-            username for username in 
-            self.participants.split(',') if username.startswith('nonRegistered:')
-        ]
-        
+        registered_participants, non_registered_participants = parse_list_participants(self.participants)
+
         return {
             'id': self.id,
             'name': self.name,
             'created_by': self.created_by,
-            'registered_participants': [p.split(':')[1] for p in registered_participants],
-            'non_registered_participants': [p.split(':')[1] for p in non_registered_participants],
+            'registered_participants': list(registered_participants),
+            'non_registered_participants': list(non_registered_participants),
             'participants': self.participants,
             'createdAt': self.created_at.isoformat() if self.created_at else None
         }
@@ -125,6 +182,11 @@ class ListParticipant(db.Model):
     role = db.Column(db.String(20), default='member')
     date_added = db.Column(db.DateTime, default=db.func.current_timestamp())
 
+    __table_args__ = (
+        db.Index('ix_list_participants_username_list', 'username', 'list_id'),
+        db.Index('ix_list_participants_list_username', 'list_id', 'username'),
+    )
+
 class ListShareRequest(db.Model):
     __tablename__ = 'list_share_requests'
     id = db.Column(db.Integer, primary_key=True)
@@ -134,13 +196,20 @@ class ListShareRequest(db.Model):
     status = db.Column(db.String(20), default='pending')  # pending, accepted, rejected
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     message = db.Column(db.String(500))
-    
+
+    # Load with db.joinedload when serializing many requests
+    expense_list = db.relationship('ExpenseList')
+
+    __table_args__ = (
+        db.Index('ix_list_share_requests_to_user_status', 'to_user', 'status'),
+        db.Index('ix_list_share_requests_list_to_user', 'list_id', 'to_user', 'status'),
+    )
+
     def as_dict(self):
-        expense_list = ExpenseList.query.get(self.list_id)
         return {
             'id': self.id,
             'list_id': self.list_id,
-            'list_name': expense_list.name if expense_list else None,
+            'list_name': self.expense_list.name if self.expense_list else None,
             'from_user': self.from_user,
             'to_user': self.to_user,
             'status': self.status,
@@ -151,11 +220,15 @@ class ListShareRequest(db.Model):
 class ListDeletionRequest(db.Model):
     __tablename__ = 'list_deletion_requests'
     id = db.Column(db.Integer, primary_key=True)
-    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id'), nullable=False)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
     requested_by = db.Column(db.String(50), db.ForeignKey('users.username'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
 
+    __table_args__ = (
+        db.Index('ix_list_deletion_requests_list', 'list_id'),
+    )
+
     def as_dict(self):
         return {
             'id': self.id,
@@ -168,7 +241,7 @@ class ListDeletionRequest(db.Model):
 class ListDeletionApproval(db.Model):
     __tablename__ = 'list_deletion_approvals'
     id = db.Column(db.Integer, primary_key=True)
-    request_id = db.Column(db.Integer, db.ForeignKey('list_deletion_requests.id'), nullable=False)
+    request_id = db.Column(db.Integer, db.ForeignKey('list_deletion_requests.id', ondelete='CASCADE'), nullable=False)
     username = db.Column(db.String(50), db.ForeignKey('users.username'), nullable=False)
     approved = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -191,6 +264,163 @@ class Changelog(db.Model):
     username = db.Column(db.String(150), db.ForeignKey('users.username', ondelete='CASCADE'), nullable=False)
     details = db.Column(db.JSON, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_changelog_list_timestamp', 'list_id', 'timestamp'),
+        # Finds rows due for archival
+        db.Index('ix_changelog_timestamp', 'timestamp'),
+    )
+
+class ChangelogSegment(db.Model):
+    """Index entry for one compressed file of archived changelog entries."""
+    __tablename__ = 'changelog_segments'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    # Oldest and newest timestamp in the segment
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('list_id', 'period', name='uq_changelog_segments_list_period'),
+        db.Index('ix_changelog_segments_list_ends', 'list_id', 'ends_at'),
+    )
+
+class ExpenseRollup(db.Model):
+    __tablename__ = 'expense_rollups'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    month = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday
+    category = db.Column(db.String(100), nullable=False, default='')
+    payer = db.Column(db.String(100), nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('list_id', 'month', 'weekday', 'category', 'payer', name='uq_expense_rollups_key'),
+    )
+
+class Settlement(db.Model):
+    """A payment from one participant to another that settles debt in a list."""
+    __tablename__ = 'settlements'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    # Prefixed participants, like Expense.payer
+    from_participant = db.Column(db.String(150), nullable=False)
+    to_participant = db.Column(db.String(150), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    date = db.Column(db.DateTime, default=datetime.utcnow)
+    created_by = db.Column(db.String(150), db.ForeignKey('users.username', ondelete='CASCADE'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closing_id = db.Column(db.Integer, db.ForeignKey('list_closings.id'), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_settlements_list_date', 'list_id', 'date'),
+        db.Index('ix_settlements_list_closing', 'list_id', 'closing_id'),
+    )
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'list_id': self.list_id,
+            'from': self.from_participant,
+            'to': self.to_participant,
+            'amount': self.amount,
+            'date': self.date.strftime('%Y-%m-%d'),
+            'created_by': self.created_by,
+            'closing_id': self.closing_id
+        }
+
+class ListClosing(db.Model):
+    """
+    A settle-all of a list. balances is what remained right after the
+    settlement payments (zero up to rounding); balances are recomputed from
+    the latest closing plus the expenses and settlements still open.
+    """
+    __tablename__ = 'list_closings'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    closed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    closed_by = db.Column(db.String(150), db.ForeignKey('users.username', ondelete='CASCADE'), nullable=False)
+    balances = db.Column(db.JSON, nullable=False)  # {participant: balance}
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    settlement_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_list_closings_list', 'list_id', 'id'),
+    )
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'list_id': self.list_id,
+            'closed_at': self.closed_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'closed_by': self.closed_by,
+            'balances': self.balances,
+            'expense_count': self.expense_count,
+            'settlement_count': self.settlement_count
+        }
+
+class ListTombstone(db.Model):
+    """
+    A large list that was deleted and is being reclaimed in the background.
+    list_id has no foreign key so the tombstone outlives the list and keeps
+    the final progress.
+    """
+    __tablename__ = 'list_tombstones'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, nullable=False, index=True)
+    list_name = db.Column(db.String(100))
+    requested_by = db.Column(db.String(150))
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow)
+    total_rows = db.Column(db.Integer)  # Counted by the first reclaim run
+    deleted_rows = db.Column(db.Integer, nullable=False, default=0)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_list_tombstones_pending', 'completed_at', 'requested_at'),
+    )
+
+    def as_dict(self):
+        return {
+            'list_id': self.list_id,
+            'list_name': self.list_name,
+            'requested_by': self.requested_by,
+            'requested_at': self.requested_at.isoformat() if self.requested_at else None,
+            'status': 'deleted' if self.completed_at else 'deleting',
+            'total_rows': self.total_rows,
+            'deleted_rows': self.deleted_rows,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+class BalanceCheckpoint(db.Model):
+    """Net balances of a list over every expense dated before as_of."""
+    __tablename__ = 'balance_checkpoints'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    as_of = db.Column(db.DateTime, nullable=False)
+    # Highest expense id and number of expenses folded into the balances
+    last_expense_id = db.Column(db.Integer)
+    expense_count = db.Column(db.Integer, nullable=False, default=0)
+    balances = db.Column(db.JSON, nullable=False)  # {participant: balance}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('list_id', 'as_of', name='uq_balance_checkpoints_list_as_of'),
+    )
+
+class ListBalance(db.Model):
+    __tablename__ = 'list_balances'
+    id = db.Column(db.Integer, primary_key=True)
+    list_id = db.Column(db.Integer, db.ForeignKey('expense_lists.id', ondelete='CASCADE'), nullable=False)
+    participant = db.Column(db.String(150), nullable=False)
+    balance = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('list_id', 'participant', name='uq_list_balances_list_participant'),
+    )
+
 def log_action(list_id, action, username):
     new_log = Changelog(
         list_id=list_id,
@@ -0,0 +1,112 @@
+import base64
+from datetime import datetime
+from flask import request, jsonify, current_app, stream_with_context
+from db import db
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Rows fetched per round trip while streaming
+STREAM_BATCH_SIZE = 500
+
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def page_args(decode=decode_cursor):
+    """
+    Read the limit and cursor query parameters, decoding the cursor with
+    decode. Returns (limit, cursor); both are None when the client did not
+    ask for pagination. Raises ValueError for invalid values.
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError("limit must be a positive integer")
+        limit = min(limit, MAX_PAGE_SIZE)
+    elif cursor:
+        limit = DEFAULT_PAGE_SIZE
+    return limit, decode(cursor) if cursor else None
+
+def wants_ndjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def listing_variant():
+    """The request parameters that select a listing's representation, for its ETag."""
+    return request.args.get('limit'), request.args.get('cursor'), wants_ndjson()
+
+def keyset_page(query, time_column, id_column, cursor):
+    """
+    Order a query newest first by (time_column, id_column) and start it
+    right after the cursor position. Seeking on the indexed sort key keeps
+    every page as cheap as the first one, unlike OFFSET.
+    """
+    query = query.order_by(None).order_by(time_column.desc(), id_column.desc())
+    if cursor:
+        timestamp, row_id = cursor
+        query = query.filter(db.or_(
+            time_column < timestamp,
+            db.and_(time_column == timestamp, id_column < row_id)
+        ))
+    return query
+
+def list_response(query, time_column, id_column, serialize):
+    """
+    Respond with the rows of a listing query.
+
+    Without pagination parameters the full result is returned as one JSON
+    array, as before. With ?limit= and/or ?cursor= a single page is
+    returned, newest first, and the X-Next-Cursor header carries the cursor
+    of the following page when there is one. Clients that send
+    Accept: application/x-ndjson get the rows streamed one JSON object per
+    line, fetched from the database in batches so memory use does not grow
+    with the size of the list.
+    """
+    try:
+        limit, cursor = page_args()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if wants_ndjson():
+        next_cursor = None
+        if limit:
+            query = keyset_page(query, time_column, id_column, cursor)
+            # Read the page's last key and whether a row follows it from
+            # the index, so the rows themselves can still be streamed
+            boundary = query.with_entities(time_column, id_column).offset(limit - 1).limit(2).all()
+            if len(boundary) > 1:
+                next_cursor = encode_cursor(*boundary[0])
+            query = query.limit(limit)
+        rows = query.yield_per(STREAM_BATCH_SIZE)
+
+        def generate():
+            for row in rows:
+                yield current_app.json.dumps(serialize(row)) + '\n'
+
+        response = current_app.response_class(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+
+    if not limit:
+        return jsonify([serialize(row) for row in query.all()])
+
+    rows = keyset_page(query, time_column, id_column, cursor).limit(limit + 1).all()
+    response = jsonify([serialize(row) for row in rows[:limit]])
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        response.headers['X-Next-Cursor'] = encode_cursor(
+            getattr(last, time_column.key), getattr(last, id_column.key)
+        )
+    return response
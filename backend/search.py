@@ -0,0 +1,143 @@
+import base64
+import re
+from sqlalchemy import text
+from db import db
+from models import Expense
+from listings import EXPENSE_COLUMNS
+
+SEARCH_TABLE = 'expense_search'
+# Words of a search query; anything else (quotes, operators) is dropped
+SEARCH_TERM = re.compile(r'\w+', re.UNICODE)
+MAX_SEARCH_TERMS = 16
+# Result orders, the default first: recently_added walks the list's matches
+# in the index by descending expense id, i.e. the order they were added in
+# rather than their date, and stops at the page limit, so it stays fast at
+# any list size; relevance scores every match, so its cost grows with how
+# many rows a query matches. A by-date order would have to sort every match
+# too; /expenses already pages a list by date.
+SEARCH_ORDERS = ('recently_added', 'relevance')
+
+# PostgreSQL indexes this expression with GIN; queries must repeat it
+# verbatim for the planner to use the index. The weights rank description
+# hits above category ones above payer ones, as bm25 does for SQLite.
+SEARCH_DOCUMENT = "(" + " || ".join(
+    f"setweight(to_tsvector('simple', coalesce(expenses.{column}, '')), '{weight}')"
+    for column, weight in (('description', 'A'), ('category', 'B'), ('payer', 'C'))
+) + ")"
+
+# SQLite: a contentless FTS5 table kept in step with expenses by triggers,
+# so every write path (endpoints, imports, batches, list deletion) updates
+# it. list_key holds one "list<id>" token per row, letting a MATCH narrow
+# to a single list inside the full-text index itself. Prefix indexes let
+# terms of up to six letters match as a prefix without merging the doclists
+# of every word they start.
+SQLITE_SEARCH_SCHEMA = [
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    "list_key, description, category, payer, content='', prefix='2 3 4 5 6')",
+    # Rank by description first, then category, then payer; list_key never counts
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rank) VALUES ('rank', 'bm25(0.0, 10.0, 5.0, 2.0)')",
+    f"""CREATE TRIGGER expense_search_insert AFTER INSERT ON expenses BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, list_key, description, category, payer)
+        VALUES (new.id, 'list' || new.list_id, new.description, new.category, new.payer);
+    END""",
+    f"""CREATE TRIGGER expense_search_delete AFTER DELETE ON expenses BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, list_key, description, category, payer)
+        VALUES ('delete', old.id, 'list' || old.list_id, old.description, old.category, old.payer);
+    END""",
+    f"""CREATE TRIGGER expense_search_update AFTER UPDATE OF list_id, description, category, payer ON expenses BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, list_key, description, category, payer)
+        VALUES ('delete', old.id, 'list' || old.list_id, old.description, old.category, old.payer);
+        INSERT INTO {SEARCH_TABLE}(rowid, list_key, description, category, payer)
+        VALUES (new.id, 'list' || new.list_id, new.description, new.category, new.payer);
+    END""",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, list_key, description, category, payer)
+        SELECT id, 'list' || list_id, description, category, payer FROM expenses""",
+]
+
+def rebuild_search_index():
+    """(Re)create the full-text search index over the expenses table."""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_expenses_search ON expenses USING gin ({SEARCH_DOCUMENT})"
+        ))
+        return
+    # A contentless index cannot be diffed against the table, so start over
+    for trigger in ('expense_search_insert', 'expense_search_delete', 'expense_search_update'):
+        db.session.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+    db.session.execute(text(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+    for statement in SQLITE_SEARCH_SCHEMA:
+        db.session.execute(text(statement))
+
+def search_terms(query):
+    return [term.lower() for term in SEARCH_TERM.findall(query or '')][:MAX_SEARCH_TERMS]
+
+def encode_search_cursor(score, row_id):
+    raw = f"{score!r}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_search_cursor(cursor):
+    """Inverse of encode_search_cursor. Raises ValueError for malformed cursors."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        score, row_id = raw.rsplit('|', 1)
+        return float(score), int(row_id)
+    except (UnicodeError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def search_query(list_id, terms, order='recently_added'):
+    """
+    Expense columns plus a score, lower is more relevant, of the list's
+    expenses matching every term as a word prefix. Also returns the score
+    and the id column to order and page on, which for SQLite is the index's
+    own rowid so that newest-first scans can stop early.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        document = db.literal_column(SEARCH_DOCUMENT)
+        tsquery = db.func.to_tsquery(db.literal_column("'simple'"), ' & '.join(f'{term}:*' for term in terms))
+        # ts_rank returns a real, whose text form would not round-trip through a cursor
+        score = db.cast(-db.func.ts_rank(document, tsquery), db.Float).label('score')
+        return db.session.query(*EXPENSE_COLUMNS, score).filter(
+            Expense.list_id == list_id, document.op('@@')(tsquery)
+        ), score, Expense.id
+
+    match = ' AND '.join(f'"{term}"*' for term in terms)
+    score = db.literal_column(f'{SEARCH_TABLE}.rank').label('score')
+    if order == 'recently_added':
+        # bm25 weighs each phrase by reading its whole doclist, and a list's
+        # key is in every row of the list, so only unranked scans narrow by it
+        match = f'list_key:"list{int(list_id)}" AND {match}'
+        score = db.literal_column('0.0').label('score')
+    row_id = db.literal_column(f'{SEARCH_TABLE}.rowid')
+    return db.session.query(*EXPENSE_COLUMNS, score).select_from(
+        db.table(SEARCH_TABLE)
+    ).join(
+        Expense, Expense.id == row_id
+    ).filter(
+        text(f'{SEARCH_TABLE} MATCH :match').bindparams(match=match), Expense.list_id == list_id
+    ), score, row_id
+
+def search_expenses(list_id, terms, filters=(), limit=100, cursor=None, order='recently_added'):
+    """
+    One page of a list's expenses matching terms, most recently added or
+    most relevant first, continuing after cursor. Returns (rows, next_cursor) where rows
+    are expense column tuples followed by their score.
+    """
+    query, score, row_id = search_query(list_id, terms, order)
+    query = query.filter(*filters)
+    if order == 'recently_added':
+        if cursor:
+            query = query.filter(row_id < cursor[1])
+        query = query.order_by(row_id.desc())
+    else:
+        if cursor:
+            cursor_score, cursor_id = cursor
+            query = query.filter(db.or_(
+                score > cursor_score,
+                db.and_(score == cursor_score, row_id < cursor_id)
+            ))
+        query = query.order_by(score, row_id.desc())
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        return rows[:limit], encode_search_cursor(last.score, last.id)
+    return rows, None
@@ -0,0 +1,80 @@
+import math
+from datetime import datetime
+from db import db
+from models import Expense, ListBalance, ListClosing, Settlement
+from ledger import get_net_balances, settle_debts, record_settlement
+from debt_cache import bump_list_version
+from imports import participant_lookup, resolve_participant
+
+def parse_settlement(data, expense_list, username):
+    """
+    Settlement built from a request body with from, to, amount and an
+    optional date. Both participants must be in the list, given prefixed or
+    by bare name as in imports. Raises ValueError for invalid input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Invalid data format')
+    missing = [field for field in ('from', 'to', 'amount') if not data.get(field)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    lookup = participant_lookup(expense_list)
+    from_participant, to_participant = (
+        resolve_participant(str(data[field]), lookup) for field in ('from', 'to')
+    )
+    if from_participant == to_participant:
+        raise ValueError('A settlement needs two different participants')
+    amount = float(data['amount'])
+    if not math.isfinite(amount) or amount <= 0:
+        raise ValueError('Amount must be a positive number')
+    date = datetime.strptime(data['date'], '%Y-%m-%d') if data.get('date') else datetime.utcnow()
+    return Settlement(
+        list_id=expense_list.id,
+        from_participant=from_participant,
+        to_participant=to_participant,
+        amount=amount,
+        date=date,
+        created_by=username
+    )
+
+def settle_list(list_id, username):
+    """
+    Settle every debt of a list: one settlement per payment settle_debts
+    suggests, then a ListClosing snapshot of the balances left (zero up to
+    rounding) that closes the list's open expenses and settlements. Runs
+    in the caller's session; returns the closing, or None when there was
+    nothing to settle.
+    """
+    # Taking the list row first serialises concurrent settle-alls and
+    # expense writes on a server database
+    bump_list_version(list_id)
+    payments = [
+        (debtor, creditor, amount)
+        for debtor, creditors in sorted(settle_debts(get_net_balances([list_id])).items())
+        for creditor, amount in sorted(creditors.items())
+    ]
+    open_expenses = Expense.query.filter(Expense.list_id == list_id, Expense.closing_id.is_(None))
+    open_settlements = Settlement.query.filter(Settlement.list_id == list_id, Settlement.closing_id.is_(None))
+    if not payments and not open_expenses.count() and not open_settlements.count():
+        return None
+
+    now = datetime.utcnow()
+    for debtor, creditor, amount in payments:
+        settlement = Settlement(
+            list_id=list_id,
+            from_participant=debtor,
+            to_participant=creditor,
+            amount=amount,
+            date=now,
+            created_by=username
+        )
+        db.session.add(settlement)
+        record_settlement(settlement)
+    db.session.flush()
+
+    balances = dict(db.session.query(ListBalance.participant, ListBalance.balance).filter(ListBalance.list_id == list_id))
+    closing = ListClosing(list_id=list_id, closed_at=now, closed_by=username, balances=balances)
+    db.session.add(closing)
+    db.session.flush()
+    closing.expense_count = open_expenses.update({Expense.closing_id: closing.id}, synchronize_session=False)
+    closing.settlement_count = open_settlements.update({Settlement.closing_id: closing.id}, synchronize_session=False)
+    return closing
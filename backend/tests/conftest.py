@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# The backend modules import each other by their flat names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('backend')
+    os.environ['DATABASE_URL'] = f"sqlite:///{workdir / 'test.db'}"
+    os.environ['TRASH_ARCHIVE_DIR'] = str(workdir / 'trash-archive')
+    os.environ['CHANGELOG_ARCHIVE_DIR'] = str(workdir / 'changelog-archive')
+    # Keep the periodic jobs off; they would run queries of their own
+    os.environ['TRASH_RETENTION_DAYS'] = '0'
+    os.environ['CHANGELOG_ARCHIVE_DAYS'] = '0'
+    os.environ['CHECKPOINT_INTERVAL'] = '0'
+    os.environ['LIST_RECLAIM_INTERVAL'] = '0'
+    os.environ['SLOW_REQUEST_MS'] = '0'
+
+    import app as app_module
+    from migrations import run_migrations
+    with app_module.app.app_context():
+        app_module.db.create_all()
+        run_migrations()
+    return app_module
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+@pytest.fixture
+def make_user(client):
+    """Factory registering a user with a unique name; returns the username."""
+    def make(prefix='user'):
+        username = f'{prefix}-{uuid.uuid4().hex[:8]}'
+        response = client.post('/register', json={'username': username, 'password': 'secret1'})
+        assert response.status_code == 201, response.get_json()
+        return username
+    return make
+
+@pytest.fixture
+def owner(make_user):
+    return make_user('owner')
+
+@pytest.fixture
+def make_list(client):
+    """Factory creating a list owned by a user; returns the list id."""
+    def make(owner, participants=('guest',), name='List', **fields):
+        response = client.post('/lists', json=dict(
+            {'name': name, 'createdBy': owner, 'participants': list(participants)}, **fields
+        ))
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['id']
+    return make
+
+@pytest.fixture
+def add_expense(client):
+    """Factory adding an expense through /add-expense; returns the created expense."""
+    def add(owner, list_id, amount=10, participants=('nonRegistered:guest',), payer='nonRegistered:guest',
+            description='Expense', category='Food', date='2024-05-01'):
+        response = client.post('/add-expense', json={
+            'payer': payer, 'amount': amount, 'description': description, 'category': category,
+            'date': date, 'username': owner, 'participants': list(participants), 'list_id': list_id
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    return add
+
+@pytest.fixture
+def count_queries(app_module):
+    """
+    Context manager counting the SQL statements run on the calling thread,
+    so the debt broadcaster's workers do not add to a request's count.
+    """
+    @contextmanager
+    def counter():
+        statements = []
+        thread = threading.get_ident()
+
+        def record(conn, cursor, statement, *args):
+            if threading.get_ident() == thread:
+                statements.append(statement)
+
+        with app_module.app.app_context():
+            engine = app_module.db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+    return counter
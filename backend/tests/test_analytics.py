@@ -0,0 +1,93 @@
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from analytics import WEEKDAYS, split_range
+
+GUEST, FRIEND = 'nonRegistered:guest', 'nonRegistered:friend'
+
+# amount, date, category, payer
+EXPENSES = [
+    (10, '2024-01-05', 'Food', GUEST),
+    (20, '2024-01-15', 'Travel', FRIEND),
+    (30, '2024-01-31', 'Food', FRIEND),
+    (40, '2024-02-01', 'Food', GUEST),
+    (50, '2024-02-20', 'Travel', GUEST),
+    (60, '2024-03-10', 'Food', FRIEND),
+    (70, '2024-04-10', 'Travel', GUEST),
+    (80, '2024-04-11', 'Food', GUEST),
+    (90, '2024-04-25', 'Food', FRIEND),
+]
+
+FILTERS = [{}, {'category': 'Food'}, {'payer': FRIEND}, {'category': 'Travel', 'payer': GUEST}]
+
+def test_split_range_mid_month_to_mid_month():
+    months, edges = split_range(datetime(2024, 1, 15), datetime(2024, 4, 11))
+    assert months == ('2024-02', '2024-03')
+    assert edges == [(datetime(2024, 1, 15), datetime(2024, 2, 1)), (datetime(2024, 4, 1), datetime(2024, 4, 11))]
+
+def test_split_range_within_one_month():
+    assert split_range(datetime(2024, 1, 10), datetime(2024, 1, 20)) == (None, [(datetime(2024, 1, 10), datetime(2024, 1, 20))])
+    assert split_range(datetime(2024, 1, 31), datetime(2024, 2, 2)) == (None, [(datetime(2024, 1, 31), datetime(2024, 2, 2))])
+
+def test_split_range_whole_months():
+    assert split_range(datetime(2024, 2, 1), datetime(2024, 4, 1)) == (('2024-02', '2024-03'), [])
+
+def expected_analytics(start, end, category=None, payer=None):
+    """The aggregates list_analytics should return, summed from EXPENSES directly."""
+    rows = [
+        (amount, datetime.strptime(date, '%Y-%m-%d'), row_category, row_payer)
+        for amount, date, row_category, row_payer in EXPENSES
+        if (not start or date >= start) and (not end or date <= end)
+        and category in (None, row_category) and payer in (None, row_payer)
+    ]
+    monthly, categories, payers, weekdays = defaultdict(float), defaultdict(float), defaultdict(float), defaultdict(float)
+    for amount, date, row_category, row_payer in rows:
+        monthly[date.strftime('%Y-%m')] += amount
+        categories[row_category] += amount
+        payers[row_payer] += amount
+        weekdays[WEEKDAYS[date.weekday()]] += amount
+    return {
+        'total_spent': sum(amount for amount, *_ in rows),
+        'expense_count': len(rows),
+        'monthly': dict(monthly),
+        'categories': dict(categories),
+        'payers': dict(payers),
+        'day_of_week': {day: weekdays.get(day, 0) for day in WEEKDAYS},
+        'max_expense': max((amount for amount, *_ in rows), default=0),
+    }
+
+@pytest.mark.parametrize('start, end', [
+    ('2024-01-15', '2024-04-10'),
+    ('2024-01-31', '2024-02-01'),
+    ('2024-01-16', '2024-01-30'),
+    ('2024-02-01', '2024-03-31'),
+    ('2024-01-20', '2024-03-05'),
+    (None, '2024-02-10'),
+    ('2024-03-05', None),
+])
+def test_list_analytics_matches_raw_expenses(client, owner, make_list, add_expense, start, end):
+    list_id = make_list(owner, ['guest', 'friend'])
+    for amount, date, category, payer in EXPENSES:
+        add_expense(owner, list_id, amount, [GUEST, FRIEND], payer=payer, category=category, date=date)
+
+    for filters in FILTERS:
+        params = dict(filters, username=owner)
+        if start:
+            params['start'] = start
+        if end:
+            params['end'] = end
+        response = client.get(f'/lists/{list_id}/analytics', query_string=params)
+        assert response.status_code == 200
+        analytics = response.get_json()
+        actual = {
+            'total_spent': analytics['total_spent'],
+            'expense_count': analytics['expense_count'],
+            'monthly': {row['month']: row['amount'] for row in analytics['monthly']},
+            'categories': {row['name']: row['value'] for row in analytics['categories']},
+            'payers': {row['payer']: row['value'] for row in analytics['payers']},
+            'day_of_week': {row['day']: row['total'] for row in analytics['day_of_week']},
+            'max_expense': analytics['max_expense'],
+        }
+        assert actual == expected_analytics(start, end, **filters), filters
@@ -0,0 +1,57 @@
+import pytest
+
+PARTICIPANTS = ['nonRegistered:guest']
+
+@pytest.fixture
+def expense_list(owner, make_list, add_expense):
+    list_id = make_list(owner)
+    expense = add_expense(owner, list_id, 20, PARTICIPANTS + [f'registered:{owner}'], description='Lunch')
+    return owner, list_id, expense
+
+def batch(client, owner, list_id, operations):
+    return client.post(f'/lists/{list_id}/expenses/batch?username={owner}', json=operations)
+
+@pytest.mark.parametrize('update', [
+    {'amount': 35},
+    {'payer': 'guest', 'amount': 35, 'description': 'Lunch', 'category': 'Food', 'date': '', 'participants': PARTICIPANTS},
+])
+def test_partial_update_is_rejected(client, expense_list, update):
+    owner, list_id, expense = expense_list
+    response = batch(client, owner, list_id, [dict(update, op='update', id=expense['id'])])
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['index'] == 0
+    assert 'Missing fields for update' in response.get_json()['errors'][0]['error']
+
+    stored = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()
+    assert [(row['amount'], row['date']) for row in stored] == [(20.0, '2024-05-01')]
+
+def test_full_update_replaces_the_expense(client, expense_list):
+    owner, list_id, expense = expense_list
+    response = batch(client, owner, list_id, [{
+        'op': 'update', 'id': expense['id'], 'payer': 'guest', 'payerType': 'nonRegistered', 'amount': 35,
+        'description': 'Dinner', 'category': 'Food', 'date': '2024-05-02', 'participants': PARTICIPANTS
+    }])
+    assert response.status_code == 200, response.get_json()
+
+    stored = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()
+    assert [(row['amount'], row['description'], row['date']) for row in stored] == [(35.0, 'Dinner', '2024-05-02')]
+
+@pytest.mark.parametrize('fields, error', [
+    ({'participants': 5}, 'participants must be a list of names'),
+    ({'participants': {'guest': True}}, 'participants must be a list of names'),
+    ({'amount': [20]}, 'Invalid amount'),
+    ({'amount': True}, 'Invalid amount'),
+])
+def test_malformed_add_is_rejected(client, expense_list, fields, error):
+    owner, list_id, expense = expense_list
+    operation = dict({
+        'op': 'add', 'payer': 'guest', 'payerType': 'nonRegistered', 'amount': 20,
+        'description': 'Taxi', 'category': 'Transport', 'date': '2024-05-02', 'participants': PARTICIPANTS
+    }, **fields)
+    response = batch(client, owner, list_id, [operation])
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['index'] == 0
+    assert error in response.get_json()['errors'][0]['error']
+
+    stored = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()
+    assert [row['id'] for row in stored] == [expense['id']]
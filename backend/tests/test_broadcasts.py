@@ -0,0 +1,83 @@
+import threading
+import time
+from contextlib import nullcontext
+
+from broadcasts import DebtBroadcaster
+
+WINDOW = 0.05
+
+class FakeSocketIO:
+    """Runs background tasks on daemon threads and records every emit."""
+
+    def __init__(self):
+        self.emits = []
+
+    def start_background_task(self, target):
+        threading.Thread(target=target, daemon=True).start()
+
+    def emit(self, event, data, to=None):
+        self.emits.append((event, data, to))
+
+class FakeApp:
+    def app_context(self):
+        return nullcontext()
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+def test_burst_of_changes_is_emitted_once():
+    socketio = FakeSocketIO()
+    broadcaster = DebtBroadcaster(socketio, FakeApp(), lambda list_id: {'total': list_id}, window=WINDOW)
+    for _ in range(5):
+        broadcaster.schedule(7)
+    wait_for(lambda: broadcaster.stats()['completed'] == 1)
+    # Nothing else was queued, so a second emit can only be a duplicate
+    time.sleep(WINDOW * 3)
+    assert socketio.emits == [('expensesUpdated', {'list_id': 7, 'debts': {'total': 7}}, 'list_7')]
+    assert broadcaster.stats()['coalesced'] == 4
+
+def test_change_during_broadcast_runs_after_it_and_is_emitted_last():
+    socketio = FakeSocketIO()
+    state = {'writes': 1, 'running': 0, 'max_running': 0}
+    lock = threading.Lock()
+    started, release = threading.Event(), threading.Event()
+
+    def compute_debts(list_id):
+        with lock:
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+            writes = state['writes']
+        started.set()
+        release.wait(5)
+        with lock:
+            state['running'] -= 1
+        return {'writes': writes}
+
+    broadcaster = DebtBroadcaster(socketio, FakeApp(), compute_debts, window=WINDOW, workers=2)
+    broadcaster.schedule(7)
+    assert started.wait(5)
+    # The first job is still computing; a free worker must not take this one
+    with lock:
+        state['writes'] = 2
+    broadcaster.schedule(7)
+    time.sleep(WINDOW * 3)
+    assert state['max_running'] == 1
+    release.set()
+    wait_for(lambda: broadcaster.stats()['completed'] == 2)
+
+    assert state['max_running'] == 1
+    assert [data['debts'] for _, data, _ in socketio.emits] == [{'writes': 1}, {'writes': 2}]
+
+def test_join_list_coerces_the_list_id(app_module, owner, make_list):
+    list_id = make_list(owner)
+    socket = app_module.socketio.test_client(app_module.app)
+    socket.emit('joinList', {'username': owner, 'list_id': 'not-a-list'})
+    socket.emit('joinList', {'username': owner, 'list_id': None})
+    assert socket.get_received() == []
+    socket.emit('joinList', {'username': owner, 'list_id': str(list_id)})
+    [received] = socket.get_received()
+    assert received['args'][0]['list_id'] == list_id
+    socket.disconnect()
@@ -0,0 +1,52 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from pagination import DEFAULT_PAGE_SIZE, NDJSON_MIMETYPE
+
+@pytest.fixture
+def archived_list(app_module, owner, make_list):
+    """A list with 250 changelog entries, those before April 2024 moved into archive segments."""
+    list_id = make_list(owner)
+
+    with app_module.app.app_context():
+        Changelog = app_module.Changelog
+        for i in range(250):
+            app_module.db.session.add(Changelog(
+                list_id=list_id, action=f'User: {owner} | Entry {i}', username=owner,
+                timestamp=datetime(2024, 1, 1) + timedelta(hours=12 * i)
+            ))
+        app_module.db.session.commit()
+        expected = [row.id for row in Changelog.query.filter_by(list_id=list_id).order_by(
+            Changelog.timestamp.desc(), Changelog.id.desc()
+        )]
+        assert app_module.changelog_archiver.archive_expired(now=datetime(2024, 4, 1)) > 0
+    return list_id, expected
+
+def test_changelog_pages_by_default(client, archived_list):
+    list_id, expected = archived_list
+    response = client.get(f'/changelog/{list_id}')
+    assert response.status_code == 200
+    assert [entry['id'] for entry in response.get_json()] == expected[:DEFAULT_PAGE_SIZE]
+    assert response.headers['X-Next-Cursor']
+
+@pytest.mark.parametrize('accept', ['application/json', NDJSON_MIMETYPE])
+def test_changelog_cursor_walks_hot_and_archived_entries(client, archived_list, accept):
+    list_id, expected = archived_list
+    seen = []
+    params = {'limit': 40}
+    while True:
+        response = client.get(f'/changelog/{list_id}', query_string=params, headers={'Accept': accept})
+        assert response.status_code == 200
+        if accept == NDJSON_MIMETYPE:
+            assert response.mimetype == NDJSON_MIMETYPE
+            page = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        else:
+            page = response.get_json()
+        seen.extend(entry['id'] for entry in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+        params['cursor'] = cursor
+    assert seen == expected
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+import pytest
+
+from models import BalanceCheckpoint
+
+GUEST, FRIEND = 'nonRegistered:guest', 'nonRegistered:friend'
+
+@pytest.fixture
+def checkpointed_list(owner, make_list, add_expense):
+    """A list where the guest paid 40, 60 and 100 in January to March 2024, split with a friend."""
+    list_id = make_list(owner, ['guest', 'friend'])
+    expenses = [
+        add_expense(owner, list_id, amount, [GUEST, FRIEND], description='Groceries', date=date)
+        for amount, date in [(40, '2024-01-10'), (60, '2024-02-10'), (100, '2024-03-10')]
+    ]
+    return owner, list_id, expenses
+
+def owed_by_friend(client, owner, list_id, as_of):
+    response = client.get('/calculate-debts', query_string={'username': owner, 'list_id': list_id, 'as_of': as_of})
+    assert response.status_code == 200
+    return response.get_json().get(FRIEND, {}).get(GUEST, 0)
+
+def checkpoint(app_module, list_id):
+    """Run the checkpoint job as of April 2024; returns the list's checkpoint dates."""
+    with app_module.app.app_context():
+        app_module.checkpoint_job.checkpoint_all(now=datetime(2024, 4, 10))
+        return checkpoint_dates(app_module, list_id)
+
+def checkpoint_dates(app_module, list_id):
+    with app_module.app.app_context():
+        return [row.as_of for row in BalanceCheckpoint.query.filter_by(list_id=list_id).order_by(BalanceCheckpoint.as_of)]
+
+MONTHS = [datetime(2024, 2, 1), datetime(2024, 3, 1), datetime(2024, 4, 1)]
+
+def test_debts_as_of_match_before_and_after_checkpoints(client, app_module, checkpointed_list):
+    owner, list_id, _ = checkpointed_list
+    dates = ['2024-01-09', '2024-01-31', '2024-02-15', '2024-03-20']
+    expected = [0, 20, 50, 100]
+    assert [owed_by_friend(client, owner, list_id, date) for date in dates] == expected
+
+    assert checkpoint(app_module, list_id) == MONTHS
+    # Checkpoints do not change the list version, so skip the cached results
+    with app_module.app.app_context():
+        app_module.debt_cache.clear()
+    assert [owed_by_friend(client, owner, list_id, date) for date in dates] == expected
+
+def test_update_drops_later_checkpoints(client, app_module, checkpointed_list):
+    owner, list_id, expenses = checkpointed_list
+    assert checkpoint(app_module, list_id) == MONTHS
+
+    response = client.put(f"/update-expense/{expenses[0]['id']}", json={
+        'payer': GUEST, 'amount': 80, 'description': 'Groceries', 'category': 'Food',
+        'date': '2024-01-10', 'participants': [GUEST, FRIEND]
+    })
+    assert response.status_code == 200
+    assert checkpoint_dates(app_module, list_id) == []
+    assert owed_by_friend(client, owner, list_id, '2024-02-15') == 70
+
+    assert checkpoint(app_module, list_id) == MONTHS
+    with app_module.app.app_context():
+        checkpoints = BalanceCheckpoint.query.filter_by(list_id=list_id).order_by(BalanceCheckpoint.as_of).all()
+        assert [row.balances[FRIEND] for row in checkpoints] == [-40, -70, -120]
+
+def test_delete_drops_only_checkpoints_after_the_expense(client, app_module, checkpointed_list):
+    owner, list_id, expenses = checkpointed_list
+    assert checkpoint(app_module, list_id) == MONTHS
+
+    assert client.delete(f"/delete-expense/{expenses[1]['id']}").status_code == 200
+    assert checkpoint_dates(app_module, list_id) == MONTHS[:1]
+    assert owed_by_friend(client, owner, list_id, '2024-03-20') == 70
+
+    assert checkpoint(app_module, list_id) == MONTHS
+    assert owed_by_friend(client, owner, list_id, '2024-02-15') == 20
+    assert owed_by_friend(client, owner, list_id, '2024-03-20') == 70
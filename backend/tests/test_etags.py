@@ -0,0 +1,58 @@
+import pytest
+
+GUEST, FRIEND = 'nonRegistered:guest', 'nonRegistered:friend'
+
+ENDPOINTS = ['/expenses', '/calculate-debts', '/lists/{list_id}/settlements']
+
+def fetch(client, owner, list_id, path, etag=None):
+    headers = {'If-None-Match': etag} if etag else {}
+    return client.get(path.format(list_id=list_id), query_string={'username': owner, 'list_id': list_id}, headers=headers)
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_matching_etag_is_not_modified(client, owner, make_list, add_expense, path):
+    list_id = make_list(owner, ['guest', 'friend'])
+    add_expense(owner, list_id, 20, [GUEST, FRIEND])
+
+    response = fetch(client, owner, list_id, path)
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'no-cache'
+    etag = response.headers['ETag']
+
+    cached = fetch(client, owner, list_id, path, etag)
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert cached.data == b''
+    assert fetch(client, owner, list_id, path, '"stale"').status_code == 200
+
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_etag_changes_with_every_write(client, owner, make_list, add_expense, path):
+    list_id = make_list(owner, ['guest', 'friend'])
+    expense = add_expense(owner, list_id, 20, [GUEST, FRIEND])
+
+    def update():
+        response = client.put(f"/update-expense/{expense['id']}", json={
+            'payer': GUEST, 'amount': 30, 'description': 'Expense', 'category': 'Food',
+            'date': '2024-05-01', 'participants': [GUEST, FRIEND]
+        })
+        assert response.status_code == 200
+
+    def settle():
+        response = client.post(f'/lists/{list_id}/settlements?username={owner}', json={'from': FRIEND, 'to': GUEST, 'amount': 5})
+        assert response.status_code == 201
+
+    def delete():
+        assert client.delete(f"/delete-expense/{expense['id']}").status_code == 200
+
+    writes = [
+        lambda: add_expense(owner, list_id, 10, [GUEST, FRIEND]),
+        update,
+        settle,
+        delete,
+    ]
+    etag = fetch(client, owner, list_id, path).headers['ETag']
+    for write in writes:
+        write()
+        response = fetch(client, owner, list_id, path, etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        etag = response.headers['ETag']
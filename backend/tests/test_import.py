@@ -0,0 +1,24 @@
+import pytest
+
+@pytest.fixture
+def expense_list(owner, make_list):
+    return owner, make_list(owner)
+
+def test_malformed_rows_are_reported_and_skipped(client, expense_list):
+    owner, list_id = expense_list
+    row = {'payer': 'guest', 'amount': 12.5, 'description': 'Coffee', 'date': '2024-05-01', 'participants': ['guest']}
+    response = client.post(f'/lists/{list_id}/import?username={owner}', json=[
+        row,
+        dict(row, participants=5),
+        dict(row, participants='guest'),
+        dict(row, amount={'value': 3}),
+    ])
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    assert (body['imported'], body['failed']) == (2, 2)
+    assert [error['row'] for error in body['errors']] == [2, 4]
+    assert 'participants must be a list of names' in body['errors'][0]['error']
+    assert 'Invalid amount' in body['errors'][1]['error']
+
+    stored = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()
+    assert [row['amount'] for row in stored] == [12.5, 12.5]
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from list_deletion import ListReclaimer, count_list_rows, exceeds_threshold
+from migrations import delete_orphaned_list_rows
+from models import Category, Changelog, DeletedExpense, ExpenseList, ListTombstone
+
+@pytest.fixture
+def chatty_list(app_module, owner, make_list, add_expense):
+    """A list with one expense but a changelog of 40 entries."""
+    list_id = make_list(owner)
+    add_expense(owner, list_id)
+    with app_module.app.app_context():
+        for i in range(40):
+            app_module.db.session.add(app_module.Changelog(
+                list_id=list_id, action=f'User: {owner} | Entry {i}', username=owner,
+                timestamp=datetime(2024, 1, 1) + timedelta(hours=i)
+            ))
+        app_module.db.session.commit()
+    return owner, list_id
+
+@pytest.fixture
+def threshold(app_module):
+    previous = app_module.app.config['LIST_DELETE_THRESHOLD']
+    app_module.app.config['LIST_DELETE_THRESHOLD'] = 20
+    yield 20
+    app_module.app.config['LIST_DELETE_THRESHOLD'] = previous
+
+def test_threshold_counts_every_list_table(app_module, chatty_list):
+    _, list_id = chatty_list
+    with app_module.app.app_context():
+        total = count_list_rows(list_id)
+        assert total > 40
+        assert exceeds_threshold(list_id, 20)
+        assert exceeds_threshold(list_id, total - 1)
+        assert not exceeds_threshold(list_id, total)
+
+def test_small_list_is_deleted_right_away(client, app_module, chatty_list):
+    owner, list_id = chatty_list
+    response = client.delete(f'/lists/{list_id}?username={owner}')
+    assert response.status_code == 200
+    assert 'deletion' not in response.get_json()
+    with app_module.app.app_context():
+        assert app_module.db.session.get(ExpenseList, list_id) is None
+        assert count_list_rows(list_id) == 0
+
+def test_large_list_is_tombstoned_and_reclaimed(client, app_module, chatty_list, threshold):
+    owner, list_id = chatty_list
+    response = client.delete(f'/lists/{list_id}?username={owner}')
+    assert response.status_code == 200
+    assert response.get_json()['deletion']['status'] == 'deleting'
+
+    # Hidden right away, though its rows are still there
+    assert client.get(f'/lists?username={owner}').get_json() == []
+    assert client.get(f'/expenses?username={owner}&list_id={list_id}').status_code == 403
+    assert client.delete(f'/lists/{list_id}?username={owner}').status_code == 404
+    with app_module.app.app_context():
+        remaining = count_list_rows(list_id)
+        assert remaining > 40
+
+        reclaimer = ListReclaimer(app_module.socketio, app_module.app, chunk_size=7, interval=0)
+        assert reclaimer.reclaim_all() == 1
+        assert reclaimer.deleted == remaining
+        assert count_list_rows(list_id) == 0
+        assert app_module.db.session.get(ExpenseList, list_id) is None
+        tombstone = ListTombstone.query.filter_by(list_id=list_id).one()
+        assert tombstone.completed_at is not None
+        assert tombstone.deleted_rows == tombstone.total_rows == remaining
+        # Finished tombstones are not picked up again
+        assert reclaimer.reclaim_all() == 0
+
+    deletion = client.get(f'/lists/{list_id}/deletion').get_json()
+    assert deletion['status'] == 'deleted'
+
+def test_tombstoned_list_rejects_writes(client, app_module, chatty_list, threshold):
+    owner, list_id = chatty_list
+    expense = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()[0]
+    assert client.delete(f'/lists/{list_id}?username={owner}').get_json()['deletion']['status'] == 'deleting'
+
+    row = {'payer': 'nonRegistered:guest', 'amount': 5, 'description': 'Late', 'category': 'Food',
+           'date': '2024-05-02', 'participants': ['nonRegistered:guest']}
+    assert client.post('/add-expense', json=dict(row, username=owner, list_id=list_id)).status_code == 404
+    assert client.post(f'/lists/{list_id}/import?username={owner}', json=[row]).status_code == 404
+    assert client.post(f'/lists/{list_id}/expenses/batch?username={owner}', json=[dict(row, op='add')]).status_code == 404
+    assert client.put(f"/update-expense/{expense['id']}", json=row).status_code == 404
+    assert client.delete(f"/delete-expense/{expense['id']}").status_code == 404
+    with app_module.app.app_context():
+        assert app_module.Expense.query.filter_by(list_id=list_id).count() == 1
+
+def test_migration_deletes_rows_of_deleted_lists(app_module, owner, make_list):
+    list_id = make_list(owner)
+    with app_module.app.app_context():
+        db = app_module.db
+        orphan = db.session.query(db.func.max(ExpenseList.id)).scalar() + 1000
+        # Rows left behind by the old delete_list, written the way it could
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            try:
+                for target in (orphan, list_id, None):
+                    connection.execute(db.insert(Category), {'name': 'Food', 'username': owner, 'list_id': target})
+                    connection.execute(db.insert(DeletedExpense), {
+                        'payer': 'nonRegistered:guest', 'amount': 1, 'description': 'Old', 'category': 'Food',
+                        'date': datetime(2024, 1, 1), 'username': owner, 'deleted_at': datetime(2024, 1, 2),
+                        'participants': 'nonRegistered:guest', 'list_id': target
+                    })
+                connection.execute(db.insert(Changelog), {
+                    'list_id': orphan, 'action': 'Deleted list', 'username': owner, 'timestamp': datetime(2024, 1, 1)
+                })
+                connection.commit()
+            finally:
+                connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+
+        delete_orphaned_list_rows()
+        db.session.commit()
+        for model in (Category, DeletedExpense, Changelog):
+            assert model.query.filter_by(list_id=orphan).count() == 0
+        for model in (Category, DeletedExpense):
+            assert model.query.filter_by(list_id=list_id, username=owner).count() == 1
+            assert model.query.filter(model.list_id.is_(None), model.username == owner).count() == 1
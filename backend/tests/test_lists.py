@@ -0,0 +1,47 @@
+import uuid
+
+import pytest
+
+def create_list(client, owner, **fields):
+    return client.post('/lists', json=dict({'name': 'Trip', 'createdBy': owner, 'participants': ['guest']}, **fields))
+
+def test_create_list_rejects_unknown_recipients(client, owner):
+    response = create_list(client, owner, sharedWith=['ghost'])
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unknown users: ghost'
+    assert client.get(f'/lists?username={owner}').get_json() == []
+
+def test_create_list_rejects_unknown_creator(client):
+    response = create_list(client, f'ghost-{uuid.uuid4().hex[:8]}')
+    assert response.status_code == 404
+
+def test_create_list_shares_with_known_recipients(client, owner, make_user):
+    friend = make_user('friend')
+    response = create_list(client, owner, sharedWith=[friend])
+    assert response.status_code == 201
+    requests = client.get(f'/share-requests?username={friend}').get_json()
+    assert [request['list_id'] for request in requests] == [response.get_json()['id']]
+
+def test_update_list_rejects_unknown_recipients(client, owner, make_list):
+    list_id = make_list(owner, name='Trip')
+    response = client.put(f'/lists/{list_id}', json={'name': 'Renamed', 'participants': ['guest'], 'sharedWith': ['ghost']})
+    assert response.status_code == 400
+    assert client.get(f'/lists/{list_id}?username={owner}').get_json()['name'] == 'Trip'
+
+@pytest.mark.parametrize('payload', [
+    {'username': 'ghost', 'from_username': 'OWNER'},
+    {'username': 'OWNER', 'from_username': 'ghost'},
+])
+def test_share_list_rejects_unknown_users(client, owner, make_list, payload):
+    list_id = make_list(owner)
+    payload = {key: owner if value == 'OWNER' else value for key, value in payload.items()}
+    response = client.post(f'/lists/{list_id}/share', json=payload)
+    assert response.status_code == 404
+
+def test_add_expense_rejects_unknown_list(client, owner):
+    response = client.post('/add-expense', json={
+        'payer': 'guest', 'payerType': 'nonRegistered', 'amount': 5, 'description': 'Coffee',
+        'category': 'Food', 'date': '2024-05-01', 'username': owner,
+        'participants': ['nonRegistered:guest'], 'list_id': 999999
+    })
+    assert response.status_code == 404
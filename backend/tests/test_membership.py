@@ -0,0 +1,33 @@
+from membership import MembershipIndex
+
+def test_invalidate_list_drops_only_users_of_that_list(app_module, make_user, make_list):
+    alice, bob = make_user(), make_user()
+    first, second = make_list(alice), make_list(bob)
+
+    index = MembershipIndex()
+    with app_module.app.app_context():
+        assert index.lists_for(alice) == {first}
+        assert index.lists_for(bob) == {second}
+        assert index.stats()['lists'] == 2
+
+        index.invalidate_list(first)
+        assert index.stats()['users'] == 1
+        index.lists_for(bob)
+        assert index.hits == 1
+        index.lists_for(alice)
+        assert index.misses == 3
+
+def test_evicted_users_leave_the_reverse_index(app_module, make_user, make_list):
+    alice, bob = make_user(), make_user()
+    first = make_list(alice)
+    make_list(bob)
+
+    index = MembershipIndex(maxsize=1)
+    with app_module.app.app_context():
+        index.lists_for(alice)
+        index.lists_for(bob)
+        assert index.stats()['users'] == 1
+        assert index.stats()['lists'] == 1
+        # Nothing cached includes the first list any more
+        index.invalidate_list(first)
+        assert index.stats()['users'] == 1
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+from pagination import NDJSON_MIMETYPE
+
+@pytest.fixture
+def paged_list(client, owner, make_list):
+    """A list with 25 expenses over a few days, ten of them in the trash."""
+    list_id = make_list(owner)
+    response = client.post(f'/lists/{list_id}/import?username={owner}', json=[
+        {'payer': 'guest', 'amount': i + 1, 'description': f'Expense {i}',
+         'date': f'2024-05-{i % 4 + 1:02d}', 'participants': ['guest']}
+        for i in range(25)
+    ])
+    assert response.get_json()['imported'] == 25
+    expenses = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()
+    for expense in expenses[::2][:10]:
+        assert client.delete(f"/delete-expense/{expense['id']}").status_code == 200
+    return owner, list_id
+
+def walk(client, path, params, accept):
+    seen = []
+    params = dict(params, limit=4)
+    while True:
+        response = client.get(path, query_string=params, headers={'Accept': accept})
+        assert response.status_code == 200
+        if accept == NDJSON_MIMETYPE:
+            assert response.mimetype == NDJSON_MIMETYPE
+            page = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        else:
+            page = response.get_json()
+        assert len(page) <= 4
+        seen.extend(row['id'] for row in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return seen
+        params['cursor'] = cursor
+
+@pytest.mark.parametrize('accept', ['application/json', NDJSON_MIMETYPE])
+@pytest.mark.parametrize('path, key', [('/expenses', 'date'), ('/trash', 'deleted_at')])
+def test_cursor_walks_every_row(client, paged_list, path, key, accept):
+    owner, list_id = paged_list
+    params = {'username': owner, 'list_id': list_id}
+    rows = client.get(path, query_string=params).get_json()
+    # Pages run newest first
+    expected = [row['id'] for row in sorted(rows, key=lambda row: (row[key], row['id']), reverse=True)]
+    assert len(expected) == (15 if path == '/expenses' else 10)
+    assert walk(client, path, params, accept) == expected
@@ -0,0 +1,40 @@
+import pytest
+
+@pytest.fixture
+def users_with_lists(make_user, make_list):
+    """Two (owner, recipient) pairs, one with a single shared list and one with many."""
+    pairs = {}
+    for count in (1, 12):
+        owner, recipient = make_user('owner'), make_user('recipient')
+        for i in range(count):
+            make_list(owner, name=f'List {i}', sharedWith=[recipient])
+        pairs[count] = (owner, recipient)
+    return pairs
+
+def statements_for(client, app_module, count_queries, url, expected_rows):
+    # Start every request from a cold membership index so both sizes do the same work
+    app_module.membership.clear()
+    with count_queries() as statements:
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.get_json()) == expected_rows
+    return statements
+
+@pytest.mark.parametrize('endpoint', ['/share-requests?username={recipient}', '/lists?username={owner}'])
+def test_query_count_does_not_grow_with_rows(client, app_module, count_queries, users_with_lists, endpoint):
+    counts = {}
+    for rows, (owner, recipient) in users_with_lists.items():
+        url = endpoint.format(owner=owner, recipient=recipient)
+        counts[rows] = statements_for(client, app_module, count_queries, url, rows)
+    assert len(counts[1]) == len(counts[12]), counts
+
+@pytest.mark.parametrize('scope', ['list', 'all'])
+def test_calculate_debts_reads_list_versions_once(client, app_module, count_queries, owner, make_list, add_expense, scope):
+    list_id = make_list(owner)
+    add_expense(owner, list_id)
+    params = {'username': owner, 'list_id': list_id} if scope == 'list' else {'username': owner}
+    app_module.debt_cache.clear()
+    with count_queries() as statements:
+        response = client.get('/calculate-debts', query_string=params)
+    assert response.status_code == 200
+    assert sum('expense_lists.version' in statement for statement in statements) == 1, statements
@@ -0,0 +1,46 @@
+import pytest
+
+@pytest.fixture
+def searchable_list(client, owner, make_list):
+    """A list whose last import row is backdated; returns the ids in the order they were added."""
+    list_id = make_list(owner)
+    rows = [
+        ('Groceries', '2024-05-01'), ('Taxi', '2024-05-02'), ('Grocery run', '2024-05-03'),
+        ('Groceries and taxi', '2024-05-04'), ('Old groceries', '2023-01-01'),
+    ]
+    response = client.post(f'/lists/{list_id}/import?username={owner}', json=[
+        {'payer': 'guest', 'amount': 10, 'description': description, 'date': date, 'participants': ['guest']}
+        for description, date in rows
+    ])
+    assert response.get_json()['imported'] == len(rows)
+    expenses = client.get(f'/expenses?username={owner}&list_id={list_id}').get_json()
+    return owner, list_id, sorted(expense['id'] for expense in expenses)
+
+def search(client, owner, list_id, **params):
+    response = client.get(f'/lists/{list_id}/expenses/search', query_string=dict(params, username=owner))
+    return response
+
+def test_default_order_is_most_recently_added(client, searchable_list):
+    owner, list_id, ids = searchable_list
+    response = search(client, owner, list_id, q='groc')
+    assert response.status_code == 200
+    # The backdated expense was added last, so it comes first
+    assert [row['id'] for row in response.get_json()] == [ids[4], ids[3], ids[2], ids[0]]
+
+def test_recently_added_pages_walk_every_match(client, searchable_list):
+    owner, list_id, ids = searchable_list
+    seen = []
+    params = {'q': 'groc', 'limit': 3}
+    while True:
+        response = search(client, owner, list_id, **params)
+        seen.extend(row['id'] for row in response.get_json())
+        if not response.headers.get('X-Next-Cursor'):
+            break
+        params['cursor'] = response.headers['X-Next-Cursor']
+    assert seen == [ids[4], ids[3], ids[2], ids[0]]
+
+def test_relevance_order_and_unknown_orders(client, searchable_list):
+    owner, list_id, ids = searchable_list
+    response = search(client, owner, list_id, q='taxi', order='relevance')
+    assert sorted(row['id'] for row in response.get_json()) == [ids[1], ids[3]]
+    assert search(client, owner, list_id, q='taxi', order='recent').status_code == 400
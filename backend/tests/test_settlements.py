@@ -0,0 +1,89 @@
+import pytest
+
+from ledger import verify_balances
+
+GUEST, FRIEND = 'nonRegistered:guest', 'nonRegistered:friend'
+
+@pytest.fixture
+def shared_list(owner, make_list, split_three_ways):
+    """A list where the guest paid 90 split three ways, so the friend and the owner each owe 30."""
+    list_id = make_list(owner, ['guest', 'friend'])
+    split_three_ways(owner, list_id, 90)
+    return owner, list_id
+
+@pytest.fixture
+def split_three_ways(add_expense):
+    def add(owner, list_id, amount):
+        return add_expense(owner, list_id, amount, [GUEST, FRIEND, f'registered:{owner}'], description='Cabin')
+    return add
+
+def debts(client, owner, list_id):
+    response = client.get('/calculate-debts', query_string={'username': owner, 'list_id': list_id})
+    assert response.status_code == 200
+    return response.get_json()
+
+def assert_ledger_consistent(app_module, list_id):
+    with app_module.app.app_context():
+        assert verify_balances([list_id]) == {}
+
+def test_deleting_a_settlement_restores_the_debt(client, app_module, shared_list):
+    owner, list_id = shared_list
+    response = client.post(f'/lists/{list_id}/settlements?username={owner}', json={'from': FRIEND, 'to': GUEST, 'amount': 30})
+    assert response.status_code == 201
+    settlement = response.get_json()
+    assert debts(client, owner, list_id) == {f'registered:{owner}': {GUEST: 30}}
+    assert_ledger_consistent(app_module, list_id)
+
+    assert client.delete(f"/settlements/{settlement['id']}?username={owner}").status_code == 200
+    assert debts(client, owner, list_id) == {f'registered:{owner}': {GUEST: 30}, FRIEND: {GUEST: 30}}
+    assert_ledger_consistent(app_module, list_id)
+
+def test_settle_all_closes_the_list_history(client, app_module, shared_list):
+    owner, list_id = shared_list
+    response = client.post(f'/lists/{list_id}/settle-all?username={owner}')
+    assert response.status_code == 201
+    closing = response.get_json()
+    assert (closing['settlement_count'], closing['expense_count']) == (2, 1)
+    assert all(abs(balance) < 0.01 for balance in closing['balances'].values())
+    assert debts(client, owner, list_id) == {}
+    assert_ledger_consistent(app_module, list_id)
+
+    # Closed rows are history: hidden by default and no longer editable
+    assert client.get(f'/expenses?username={owner}&list_id={list_id}').get_json() == []
+    closed = client.get(f'/expenses?username={owner}&list_id={list_id}&include_closed=true').get_json()
+    assert len(closed) == 1
+    assert client.delete(f"/delete-expense/{closed[0]['id']}").status_code == 409
+    settlements = client.get(f'/lists/{list_id}/settlements?username={owner}&include_closed=true').get_json()
+    assert len(settlements) == 2
+    assert client.delete(f"/settlements/{settlements[0]['id']}?username={owner}").status_code == 409
+
+    assert client.post(f'/lists/{list_id}/settle-all?username={owner}').get_json() == {'message': 'Nothing to settle'}
+
+def test_expenses_after_a_closing_start_from_its_balances(client, app_module, shared_list, split_three_ways):
+    owner, list_id = shared_list
+    assert client.post(f'/lists/{list_id}/settle-all?username={owner}').status_code == 201
+
+    split_three_ways(owner, list_id, 30)
+    assert debts(client, owner, list_id) == {f'registered:{owner}': {GUEST: 10}, FRIEND: {GUEST: 10}}
+    assert_ledger_consistent(app_module, list_id)
+
+@pytest.mark.parametrize('payment, error', [
+    ({'from': 'registered:xyz', 'to': GUEST, 'amount': 30}, 'Unknown participant: registered:xyz'),
+    ({'from': 'frend', 'to': GUEST, 'amount': 30}, 'Unknown participant: frend'),
+    ({'from': FRIEND, 'to': GUEST, 'amount': 'nan'}, 'Amount must be a positive number'),
+    ({'from': FRIEND, 'to': GUEST, 'amount': 'inf'}, 'Amount must be a positive number'),
+])
+def test_invalid_settlements_are_rejected(client, app_module, shared_list, payment, error):
+    owner, list_id = shared_list
+    response = client.post(f'/lists/{list_id}/settlements?username={owner}', json=payment)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == error
+    assert client.get(f'/lists/{list_id}/settlements?username={owner}').get_json() == []
+    assert debts(client, owner, list_id) == {f'registered:{owner}': {GUEST: 30}, FRIEND: {GUEST: 30}}
+    assert_ledger_consistent(app_module, list_id)
+
+def test_settlement_accepts_bare_participant_names(client, shared_list):
+    owner, list_id = shared_list
+    response = client.post(f'/lists/{list_id}/settlements?username={owner}', json={'from': owner, 'to': 'guest', 'amount': 30})
+    assert response.status_code == 201
+    assert (response.get_json()['from'], response.get_json()['to']) == (f'registered:{owner}', GUEST)
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from models import DeletedExpense
+from trash import archive_entry
+
+PURGED_AT = datetime(2021, 1, 1)
+
+@pytest.fixture
+def purged_list(app_module, client, owner, make_list, add_expense):
+    """A list whose three trashed expenses, deleted in 2020, were moved to the archive."""
+    list_id = make_list(owner)
+    for description in ['Taxi', 'Hotel', 'Museum']:
+        expense = add_expense(owner, list_id, description=description)
+        assert client.delete(f"/delete-expense/{expense['id']}").status_code == 200
+
+    with app_module.app.app_context():
+        trashed = DeletedExpense.query.filter_by(list_id=list_id).order_by(DeletedExpense.id).all()
+        for day, deleted in enumerate(trashed, start=1):
+            deleted.deleted_at = datetime(2020, 6, day, 12, 30)
+        app_module.db.session.commit()
+        assert app_module.trash_purger.purge(now=PURGED_AT) >= 3
+        assert DeletedExpense.query.filter_by(list_id=list_id).count() == 0
+    return owner, list_id
+
+def archived_trash(client, owner, list_id, **params):
+    response = client.get('/trash', query_string=dict(username=owner, list_id=list_id, archived='true', **params))
+    assert response.status_code == 200
+    return response
+
+def test_archived_trash_pages_newest_first(client, purged_list):
+    owner, list_id = purged_list
+    first = archived_trash(client, owner, list_id, limit=2)
+    assert [entry['description'] for entry in first.get_json()] == ['Museum', 'Hotel']
+    assert all(entry['archived'] for entry in first.get_json())
+
+    rest = archived_trash(client, owner, list_id, limit=2, cursor=first.headers['X-Next-Cursor'])
+    assert [entry['description'] for entry in rest.get_json()] == ['Taxi']
+    assert 'X-Next-Cursor' not in rest.headers
+
+def test_restore_archived_expense(client, purged_list):
+    owner, list_id = purged_list
+    hotel = next(entry for entry in archived_trash(client, owner, list_id).get_json() if entry['description'] == 'Hotel')
+
+    response = client.post(f"/restore/{hotel['id']}", query_string={'archived': 'true', 'list_id': list_id})
+    assert response.status_code == 400
+
+    params = {'archived': 'true', 'list_id': list_id, 'deleted_at': hotel['deleted_at']}
+    response = client.post(f"/restore/{hotel['id']}", query_string=params)
+    assert response.status_code == 200
+    assert response.get_json()['description'] == 'Hotel'
+    assert [entry['description'] for entry in archived_trash(client, owner, list_id).get_json()] == ['Museum', 'Taxi']
+    assert client.post(f"/restore/{hotel['id']}", query_string=params).status_code == 404
+
+def test_restore_archived_expense_picks_the_reused_id_by_deleted_at(app_module, client, purged_list):
+    owner, list_id = purged_list
+    taxi = next(entry for entry in archived_trash(client, owner, list_id).get_json() if entry['description'] == 'Taxi')
+    # SQLite hands a purged id out again; archive a second row under the same id
+    reused = DeletedExpense(
+        id=taxi['id'], original_id=1, payer='nonRegistered:guest', amount=7, description='Ferry',
+        category='Food', date=datetime(2020, 7, 1), username=owner,
+        deleted_at=datetime(2020, 7, 2, 8, 0), participants='nonRegistered:guest', list_id=list_id
+    )
+    app_module.trash_archive.append(list_id, [archive_entry(reused)])
+
+    params = {'archived': 'true', 'list_id': list_id, 'deleted_at': taxi['deleted_at']}
+    response = client.post(f"/restore/{taxi['id']}", query_string=params)
+    assert response.status_code == 200
+    assert response.get_json()['description'] == 'Taxi'
+    assert [entry['description'] for entry in archived_trash(client, owner, list_id).get_json()] == ['Ferry', 'Museum', 'Hotel']
+
+def test_purge_drops_trash_without_a_list(app_module, owner):
+    with app_module.app.app_context():
+        unlisted = DeletedExpense(
+            payer='nonRegistered:guest', amount=3, description='Stray', username=owner,
+            deleted_at=datetime(2020, 6, 1), participants='nonRegistered:guest'
+        )
+        app_module.db.session.add(unlisted)
+        app_module.db.session.commit()
+        app_module.trash_purger.purge(now=PURGED_AT)
+        assert DeletedExpense.query.filter_by(username=owner).count() == 0
@@ -0,0 +1,186 @@
+import gzip
+import heapq
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from itertools import groupby
+from db import db
+from jobs import BackgroundJob
+from models import DeletedExpense, parse_participants
+from pagination import DEFAULT_PAGE_SIZE
+
+# Expired trash rows moved to the archive per transaction
+PURGE_BATCH_SIZE = 500
+
+ARCHIVED_FIELDS = ('id', 'original_id', 'payer', 'amount', 'description', 'category', 'username', 'participants', 'list_id')
+
+def archive_entry(deleted):
+    """JSON-ready copy of a DeletedExpense row."""
+    entry = {field: getattr(deleted, field) for field in ARCHIVED_FIELDS}
+    entry['date'] = deleted.date.isoformat() if deleted.date else None
+    entry['deleted_at'] = deleted.deleted_at.isoformat() if deleted.deleted_at else None
+    return entry
+
+def entry_key(entry):
+    # SQLite can hand a purged id out again, so the id alone does not
+    # identify an archived row; a row archived twice has the same key
+    return entry['id'], entry['deleted_at']
+
+def sort_key(entry):
+    deleted_at = datetime.fromisoformat(entry['deleted_at']) if entry['deleted_at'] else datetime.min
+    return deleted_at, entry['id']
+
+def deleted_at_matches(entry, deleted_at):
+    # Listings show deleted_at to the second, which is what clients send back
+    return sort_key(entry)[0].replace(microsecond=0) == deleted_at.replace(microsecond=0)
+
+def archived_expense(entry):
+    """Transient DeletedExpense rebuilt from an archive entry."""
+    fields = {field: entry[field] for field in ARCHIVED_FIELDS}
+    fields['date'] = datetime.fromisoformat(entry['date']) if entry['date'] else None
+    fields['deleted_at'] = datetime.fromisoformat(entry['deleted_at']) if entry['deleted_at'] else None
+    return DeletedExpense(**fields)
+
+def serialize_archived_entry(entry):
+    """Same shape as serialize_deleted_expense_row, flagged as archived."""
+    return {
+        'id': entry['id'],
+        'original_id': entry['original_id'],
+        'payer': entry['payer'],
+        'amount': entry['amount'],
+        'description': entry['description'],
+        'category': entry['category'],
+        'date': entry['date'][:10],
+        'deleted_at': entry['deleted_at'].replace('T', ' ')[:19],
+        'participants': list(parse_participants(entry['participants'])),
+        'archived': True
+    }
+
+class TrashArchive:
+    """
+    Expired trash stored on disk as one gzip-compressed NDJSON file per
+    list. Each purge appends a new gzip member to the file, which gzip
+    readers treat as one continuous stream, so archiving never rewrites
+    existing data. Restoring an entry appends a removal record for its key
+    the same way, and reads skip the entries removed after them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def path(self, list_id):
+        return os.path.join(self.directory, f'list-{list_id}.ndjson.gz')
+
+    def _read(self, path):
+        if not os.path.exists(path):
+            return []
+        entries = {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    if 'removed' in record:
+                        entries.pop(tuple(record['removed']), None)
+                    else:
+                        entries[entry_key(record)] = record
+        return list(entries.values())
+
+    def append(self, list_id, entries):
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with gzip.open(self.path(list_id), 'at', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + '\n')
+
+    def entries(self, list_id, username=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        One page of a list's archived entries, most recently deleted first,
+        continuing after the (deleted_at, id) cursor. Returns (entries, more)
+        where more tells whether entries were cut off at limit.
+        """
+        with self._lock:
+            entries = self._read(self.path(list_id))
+        if username is not None:
+            entries = (entry for entry in entries if entry['username'] == username)
+        if cursor:
+            entries = (entry for entry in entries if sort_key(entry) < cursor)
+        page = heapq.nlargest(limit + 1, entries, key=sort_key)
+        return page[:limit], len(page) > limit
+
+    def find(self, list_id, entry_id, deleted_at):
+        """The archived entry with this id deleted at deleted_at, or None."""
+        with self._lock:
+            entries = self._read(self.path(list_id))
+        return next((
+            entry for entry in entries
+            if entry['id'] == entry_id and deleted_at_matches(entry, deleted_at)
+        ), None)
+
+    def remove(self, list_id, entry):
+        """Drop entry from the list's archive."""
+        self.append(list_id, [{'removed': list(entry_key(entry))}])
+
+    def remove_list(self, list_id):
+        with self._lock:
+            path = self.path(list_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+class TrashPurger(BackgroundJob):
+    """
+    Moves trash older than retention_days into the archive. Rows are
+    written to the archive before they are deleted, so a failed commit can
+    only leave a duplicate in the archive, which reads skip.
+    """
+
+    name = 'trash purge'
+
+    def __init__(self, socketio, app, archive, retention_days=30, interval=3600):
+        super().__init__(socketio, app, interval)
+        self.archive = archive
+        self.retention_days = retention_days
+        self.runs = 0
+        self.archived = 0
+        self.last_run_at = None
+
+    def enabled(self):
+        return self.retention_days > 0
+
+    def run_once(self):
+        self.purge()
+
+    def purge(self, now=None):
+        """Archive and delete every expired trash row; returns how many were moved."""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        moved = 0
+        while True:
+            rows = DeletedExpense.query.filter(
+                DeletedExpense.deleted_at < cutoff
+            ).order_by(DeletedExpense.deleted_at, DeletedExpense.id).limit(PURGE_BATCH_SIZE).all()
+            if not rows:
+                break
+            # Trash without a list can neither be listed nor restored, so
+            # it is deleted without being archived
+            by_list = sorted((row for row in rows if row.list_id is not None), key=lambda row: row.list_id)
+            for list_id, group in groupby(by_list, key=lambda row: row.list_id):
+                self.archive.append(list_id, [archive_entry(row) for row in group])
+            DeletedExpense.query.filter(
+                DeletedExpense.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            moved += len(rows)
+        self.runs += 1
+        self.archived += moved
+        self.last_run_at = datetime.utcnow()
+        return moved
+
+    def stats(self):
+        return {
+            'retention_days': self.retention_days,
+            'interval': self.interval,
+            'runs': self.runs,
+            'archived': self.archived,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None
+        }
@@ -278,7 +278,11 @@ function AppContent() {
 
           <Route path="/list/:listId/analytics" element={
             <ProtectedRoute>
-              <AnalyticsDashboard expenses={expenses} />
+              <AnalyticsDashboard
+                expenses={expenses}
+                currentUser={currentUser}
+                currentList={currentList}
+              />
             </ProtectedRoute>
           } />
 
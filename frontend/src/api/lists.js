@@ -13,4 +13,10 @@ export const fetchLists = async (username) => {
   export const updateList = async (listId, listData) => {
     const response = await API.put(`/lists/${listId}`, listData);
     return response.data;
-  };
\ No newline at end of file
+  };
+  export const fetchListAnalytics = async (username, listId, filters = {}) => {
+    const response = await API.get(`/lists/${listId}/analytics`, {
+      params: { username, ...filters }
+    });
+    return response.data;
+  };
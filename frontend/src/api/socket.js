@@ -5,23 +5,37 @@ const socket = io('http://localhost:5000', {
   autoConnect: true
 });
 
-export const initializeWebSocket = (username, listId, onDebtsUpdate) => {
-  socket.off(`expensesUpdated_${username}_${listId}`);
-  
-  socket.on('connect', () => {
-    console.log('Socket connected');
-  });
+// Debt updates are broadcast once per list change to a room per list.
+// Joins the room for listId and returns a function that leaves it again.
+export const joinListRoom = (username, listId, onDebtsUpdate) => {
+  const join = () => socket.emit('joinList', { username, list_id: listId });
 
-  socket.on(`expensesUpdated_${username}_${listId}`, (updatedDebts) => {
-    console.log('Received real-time debt update:', updatedDebts);
+  const handleUpdate = ({ list_id, debts }) => {
+    if (list_id !== Number(listId)) return;
+    console.log('Received real-time debt update:', debts);
     if (typeof onDebtsUpdate === 'function') {
-      onDebtsUpdate(updatedDebts);
+      onDebtsUpdate(debts);
     }
-  });
+  };
+
+  socket.on('expensesUpdated', handleUpdate);
+  // Rooms are per connection, so join again after a reconnect
+  socket.on('connect', join);
+  if (socket.connected) join();
 
+  return () => {
+    socket.emit('leaveList', { list_id: listId });
+    socket.off('expensesUpdated', handleUpdate);
+    socket.off('connect', join);
+  };
+};
+
+export const initializeWebSocket = (username, listId, onDebtsUpdate) => {
   socket.on('connect_error', (error) => {
     console.error('Socket connection error:', error);
   });
+
+  return joinListRoom(username, listId, onDebtsUpdate);
 };
 
 export { socket };
\ No newline at end of file
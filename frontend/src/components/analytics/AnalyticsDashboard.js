@@ -6,13 +6,13 @@ import {
   XAxis, YAxis, CartesianGrid, Tooltip, Legend,
   ResponsiveContainer
 } from 'recharts';
-import { format, parseISO, isWithinInterval } from 'date-fns';
+import { format, parseISO } from 'date-fns';
 import { FaUserCog, FaChartLine, FaTrophy } from 'react-icons/fa';
+import { fetchListAnalytics } from '../../api/lists';
 
-function AnalyticsDashboard({ expenses }) {
+function AnalyticsDashboard({ expenses, currentUser, currentList }) {
   const { theme } = useTheme();
   const { listCurrencies } = useCurrency();
-  const [filteredExpenses, setFilteredExpenses] = useState(expenses);
   const [dateRange, setDateRange] = useState({
     start: '',
     end: ''
@@ -20,6 +20,7 @@ function AnalyticsDashboard({ expenses }) {
   const [selectedCategory, setSelectedCategory] = useState('all');
   const [selectedPayerWithStatus, setSelectedPayerWithStatus] = useState('all');
   const [sortBy, setSortBy] = useState('date');
+  const [analytics, setAnalytics] = useState(null);
   const [monthlyData, setMonthlyData] = useState([]);
   const [categoryData, setCategoryData] = useState([]);
   const [payerData, setPayerData] = useState([]);
@@ -39,10 +40,11 @@ function AnalyticsDashboard({ expenses }) {
   };
   const COLORS = ['#2563eb', '#7c3aed', '#db2777', '#ea580c', '#65a30d', '#0891b2', '#6366f1'];
 
-  const uniqueCategories = [...new Set(expenses.map(e => e.category))];
+  const listId = currentList?.id || expenses[0]?.list_id;
 
-  // Update uniquePayers processing to handle duplicates properly
-  const uniquePayers = [...new Set(expenses.map(e => e.payer))].map(payer => {
+  const uniqueCategories = analytics?.available_categories || [];
+
+  const uniquePayers = (analytics?.available_payers || []).map(payer => {
     const [status, name] = payer.split(':');
     return {
       payerType: status,
@@ -51,145 +53,75 @@ function AnalyticsDashboard({ expenses }) {
     };
   });
 
-  // Filter expenses based on selected filters
+  // Aggregates are computed server-side from the list's monthly rollups.
+  // expenses is a dependency so the charts refresh after every change.
   useEffect(() => {
-    let filtered = [...expenses];
-
-    if (dateRange.start && dateRange.end) {
-      filtered = filtered.filter(expense => {
-        const expenseDate = parseISO(expense.date);
-        return isWithinInterval(expenseDate, {
-          start: parseISO(dateRange.start),
-          end: parseISO(dateRange.end)
-        });
-      });
-    }
-
-    if (selectedCategory !== 'all') {
-      filtered = filtered.filter(e => e.category === selectedCategory);
-    }
+    const loadAnalytics = async () => {
+      if (!currentUser || !listId) {
+        return;
+      }
 
-    if (selectedPayerWithStatus !== 'all') {
-      filtered = filtered.filter(e => e.payer === selectedPayerWithStatus);
-    }
+      const filters = {};
+      if (dateRange.start && dateRange.end) {
+        filters.start = dateRange.start;
+        filters.end = dateRange.end;
+      }
+      if (selectedCategory !== 'all') {
+        filters.category = selectedCategory;
+      }
+      if (selectedPayerWithStatus !== 'all') {
+        filters.payer = selectedPayerWithStatus;
+      }
 
-    filtered.sort((a, b) => {
-      switch (sortBy) {
-        case 'amount':
-          return Number(b.amount) - Number(a.amount);
-        case 'date':
-          return parseISO(b.date) - parseISO(a.date);
-        default:
-          return 0;
+      try {
+        setAnalytics(await fetchListAnalytics(currentUser, listId, filters));
+      } catch (error) {
+        console.error('Error fetching analytics:', error);
       }
-    });
+    };
 
-    setFilteredExpenses(filtered);
-  }, [expenses, dateRange, selectedCategory, selectedPayerWithStatus, sortBy]);
+    loadAnalytics();
+  }, [currentUser, listId, expenses, dateRange, selectedCategory, selectedPayerWithStatus]);
 
-  // Process data for charts
+  // Shape the server aggregates for the charts
   useEffect(() => {
-    if (filteredExpenses.length > 0) {
-      const monthlySpending = filteredExpenses.reduce((acc, expense) => {
-        const month = format(parseISO(expense.date), 'MMM yyyy');
-        acc[month] = (acc[month] || 0) + expense.amount;
-        return acc;
-      }, {});
-
-      // Category distribution
-      const categorySpending = filteredExpenses.reduce((acc, expense) => {
-        acc[expense.category] = (acc[expense.category] || 0) + expense.amount;
-        return acc;
-      }, {});
-
-      // Update payer distribution to prevent duplicates and keep status
-      const payerSpending = filteredExpenses.reduce((acc, expense) => {
-        const [status, name] = expense.payer.split(':');
-        const key = expense.payer;  // Use full identifier as key
-        if (!acc[key]) {
-          acc[key] = {
-            value: 0,
-            payerType: status,
-            name: name,
-            fullName: expense.payer  // Store full payer identifier
-          };
-        }
-        acc[key].value += expense.amount;
-        return acc;
-      }, {});
-
-      let sortedMonthlyData = Object.entries(monthlySpending)
-        .map(([month, amount]) => ({
-          month,
-          amount: Number(amount.toFixed(2))
-        }));
-
-      // Apply sorting based on sortBy
-      sortedMonthlyData.sort((a, b) => {
-        switch (sortBy) {
-          case 'amount':
-            return Number(b.amount) - Number(a.amount);
-          case 'date':
-            return parseISO(format(new Date(`${a.month} 01`), 'yyyy-MM-dd')) -
-              parseISO(format(new Date(`${b.month} 01`), 'yyyy-MM-dd'));
-          default:
-            return 0;
-        }
-      });
-
-      setMonthlyData(sortedMonthlyData);
-
-      setCategoryData(Object.entries(categorySpending).map(([name, value]) => ({
-        name,
-        value: Number(value.toFixed(2))
-      })));
-
-      setPayerData(Object.values(payerSpending).map(({ value, payerType, name }) => ({
-        name,
-        value: Number(value.toFixed(2)),
-        payerType,
-        fullIdentifier: `${payerType}:${name}`
-      })));
-
-      const totalSpent = filteredExpenses.reduce((sum, exp) => sum + exp.amount, 0);
-      setStats({
-        totalSpent: totalSpent.toFixed(2),
-        avgExpense: (totalSpent / filteredExpenses.length).toFixed(2),
-        maxExpense: Math.max(...filteredExpenses.map(exp => exp.amount)).toFixed(2),
-        totalExpenses: filteredExpenses.length
-      });
+    if (!analytics) {
+      return;
     }
-  }, [filteredExpenses, sortBy]);
 
-  useEffect(() => {
-    if (filteredExpenses.length > 0) {
-      // Get top 5 expenses
-      const sortedExpenses = [...filteredExpenses]
-        .sort((a, b) => b.amount - a.amount)
-        .slice(0, 5);
-
-      // Calculate total spending per day of week (not average)
-      const daySpending = filteredExpenses.reduce((acc, expense) => {
-        const day = format(parseISO(expense.date), 'EEEE');
-        if (!acc[day]) {
-          acc[day] = 0;
-        }
-        acc[day] += expense.amount;
-        return acc;
-      }, {});
-
-      const weekdayOrder = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'];
-
-      // Create ordered data array with totals
-      const orderedDayData = weekdayOrder.map(day => ({
-        day: day.slice(0, 3), // Use three-letter abbreviations
-        total: daySpending[day] ? Number(daySpending[day].toFixed(2)) : 0
-      }));
-
-      setTopExpenses(sortedExpenses);
-      setDayOfWeekData(orderedDayData);
+    const sortedMonthlyData = analytics.monthly.map(({ month, amount }) => ({
+      month: format(parseISO(`${month}-01`), 'MMM yyyy'),
+      amount
+    }));
+
+    // The server returns months in date order
+    if (sortBy === 'amount') {
+      sortedMonthlyData.sort((a, b) => Number(b.amount) - Number(a.amount));
     }
-  }, [filteredExpenses]);
+
+    setMonthlyData(sortedMonthlyData);
+    setCategoryData(analytics.categories);
+
+    setPayerData(analytics.payers.map(({ payer, value }) => {
+      const [status, name] = payer.split(':');
+      return {
+        name,
+        value,
+        payerType: status,
+        fullIdentifier: payer
+      };
+    }));
+
+    setStats({
+      totalSpent: analytics.total_spent.toFixed(2),
+      avgExpense: analytics.average_expense.toFixed(2),
+      maxExpense: analytics.max_expense.toFixed(2),
+      totalExpenses: analytics.expense_count
+    });
+
+    setTopExpenses(analytics.top_expenses);
+    setDayOfWeekData(analytics.day_of_week);
+  }, [analytics, sortBy]);
 
   // Update the renderPayer function to correctly identify registered users
   const renderPayer = (payer, payerType) => {
@@ -370,8 +302,7 @@ function AnalyticsDashboard({ expenses }) {
     'GBP': '£'
   };
 
-  // Get the current list's currency (extract list_id from first expense)
-  const listId = expenses[0]?.list_id;
+  // Get the current list's currency
   const currentCurrency = listCurrencies[listId] || 'EUR';
   const currencySymbol = currencySymbols[currentCurrency];
 
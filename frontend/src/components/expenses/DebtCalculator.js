@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { calculateDebtsRealTime } from '../../api';
-import { socket } from '../../api';
+import { joinListRoom } from '../../api';
 import { useTheme } from '../../context/ThemeContext';
 import { useCurrency } from '../../context/CurrencyContext';
 import { FaUserCog } from 'react-icons/fa';
@@ -41,16 +41,10 @@ function DebtCalculator({ expenses, currentUser, currentList }) {
     fetchDebts();
 
     if (currentUser && currentList?.id) {
-      const eventName = `expensesUpdated_${currentUser}_${currentList.id}`;
-      
-      socket.on(eventName, (updatedDebts) => {
+      return joinListRoom(currentUser, currentList.id, (updatedDebts) => {
         console.log('Received socket update:', updatedDebts);
         setDebts(updatedDebts);
       });
-
-      return () => {
-        socket.off(eventName);
-      };
     }
   }, [currentUser, currentList]);
 
@@ -2,22 +2,29 @@ import React, { useEffect, useState } from 'react';
 import { API } from '../../api/config';
 import { useTheme } from '../../context/ThemeContext';
 
+// Entries loaded per request; older ones are fetched on demand
+const PAGE_SIZE = 100;
+
 const Changelog = ({ listId }) => {
   const [changelog, setChangelog] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [showLog, setShowLog] = useState(false);
   const [filter, setFilter] = useState('ALL');
   const { theme } = useTheme();
 
-  useEffect(() => {
-    const fetchChangelog = async () => {
-      try {
-        const response = await API.get(`/changelog/${listId}`);
-        setChangelog(response.data);
-      } catch (error) {
-        console.error('Error fetching changelog:', error);
-      }
-    };
+  const fetchChangelog = async (cursor = null) => {
+    try {
+      const params = { limit: PAGE_SIZE };
+      if (cursor) params.cursor = cursor;
+      const response = await API.get(`/changelog/${listId}`, { params });
+      setChangelog(previous => (cursor ? [...previous, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error fetching changelog:', error);
+    }
+  };
 
+  useEffect(() => {
     if (showLog) {
       fetchChangelog();
     }
@@ -140,6 +147,21 @@ const Changelog = ({ listId }) => {
               </li>
             ))}
           </ul>
+          {nextCursor && (
+            <button
+              onClick={() => fetchChangelog(nextCursor)}
+              style={{
+                padding: '8px',
+                borderRadius: '4px',
+                border: `1px solid ${theme.border}`,
+                backgroundColor: theme.background,
+                color: theme.text,
+                cursor: 'pointer'
+              }}
+            >
+              Load older entries
+            </button>
+          )}
         </div>
       )}
     </div>